@@ -0,0 +1,47 @@
+"""
+backend/aio.py — background event loop for the async search pipeline
+
+Flask (WSGI) views stay thin adapters: they hand their coroutine to one
+shared event loop running in a daemon thread and block only the calling
+worker thread until it finishes. All upstream I/O from every worker is
+multiplexed on that loop. Under ASGI (asgi.py) the same coroutines are
+awaited directly on the server's loop instead.
+"""
+import asyncio, threading
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def loop():
+    """Return the shared background loop, starting it on first use."""
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                lp = asyncio.new_event_loop()
+                _thread = threading.Thread(target=lp.run_forever, name='spark-aio', daemon=True)
+                _thread.start()
+                _loop = lp
+    return _loop
+
+
+def run(coro, timeout=None):
+    """Run `coro` on the shared loop and wait for its result from a sync thread."""
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError('aio.run() called from the aio loop thread; await the coroutine instead')
+    return asyncio.run_coroutine_threadsafe(coro, loop()).result(timeout)
+
+
+def iterate(agen, timeout=None):
+    """Drive an async generator on the shared loop as a sync iterator (for streamed Flask responses)."""
+    try:
+        while True:
+            try:
+                yield run(agen.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        run(agen.aclose())
@@ -5,10 +5,34 @@ Migrated from Overpass → Google Places API (New)
 - Text Search for user queries
 - Google Geocoding replaces Nominatim
 - Real photos, ratings, reviews, hours from Google
-- In-memory cache for performance
+- Bounded in-memory LRU/TTL cache (see cache.py)
+- Pooled keep-alive upstream clients (see upstream.py)
+- Async search/deals pipeline: Flask routes adapt via aio.py, asgi.py serves it natively
+- Cached result sets re-ranked as NumPy column batches (see resultset.py)
+- /api/search/stream emits results per upstream page (NDJSON or SSE)
+- Deal merchant photos: persistent lookup cache, resolved in the background
+- Deals pages cached per snapped location / filters / page, next page prefetched
+- Image proxy for deal images and Google photos: on-disk cache, streamed
+  misses, ETag / 304, background warming (see images.py)
+- Geocodes cached per normalised query in a bounded LRU + persistent tier
+- City names and reverse lookups resolved in-process from a bundled gazetteer
+  (see gazetteer.py); Google Geocoding only for addresses it can't answer
+- /api/suggest completes categories, business names and past queries from
+  an in-memory prefix index ranked by decayed search traffic (see suggest.py)
+- Upstream failures are never cached as results: short negative cache, and
+  the last good copy is served while Google is down (see breaker.py)
 """
-import os, math, logging, time, threading
-import requests as req
+import os, json, math, time, base64, secrets, logging, asyncio
+from urllib.parse import urlsplit, parse_qs
+import upstream, aio, singleflight, refresh, chains, quota, images, gazetteer
+from cache import cache, Cache
+from search_coverage import CoverageIndex, grid_step, snap
+from singleflight import SingleFlight
+from refresh import Refresher
+from places import PlaceStore
+from resultset import ResultSet, SORTS
+from breaker import CircuitOpen
+from suggest import CompletionIndex
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -20,7 +44,8 @@ log = logging.getLogger('spark')
 app = Flask(__name__)
 from digital_routes import digital_bp
 app.register_blueprint(digital_bp)
-CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET","POST","OPTIONS"],
+# Public API only: /api/admin/* never gets CORS headers, so browsers won't expose it cross-origin
+CORS(app, resources={r"/api/(?!admin/).*": {"origins": "*", "methods": ["GET","POST","OPTIONS"],
      "allow_headers": ["Content-Type","Authorization"]}})
 
 GOOGLE_API_KEY = os.environ.get('GOOGLE_PLACES_API_KEY', '')
@@ -28,26 +53,80 @@ GOOGLE_API_KEY = os.environ.get('GOOGLE_PLACES_API_KEY', '')
 # DiscountAPI — free tier for local deals (https://discountapi.com)
 DISCOUNT_API_KEY = os.environ.get('DISCOUNT_API_KEY', '')
 
+# Origin of this API as the browser sees it; image URLs handed out point at its proxy
+# Origin image URLs are built on; empty: the host each request came in on
+PUBLIC_API_URL = os.environ.get('PUBLIC_API_URL', '').rstrip('/')
+
 if not GOOGLE_API_KEY:
     log.warning("⚠️  GOOGLE_PLACES_API_KEY not set! Add it to backend/.env")
 
 # ─── Cache ─────────────────────────────────────────────────────
-_cache = {}
-_cache_lock = threading.Lock()
-CACHE_TTL = 600
+# Entries are fresh for CACHE_TTL; until CACHE_STALE_TTL they are still served
+# (stale-while-revalidate) while a background refresh fetches a new copy.
+CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 600))
+CACHE_STALE_TTL = int(os.environ.get('SEARCH_CACHE_STALE_TTL', 6 * 3600))
+_search_cache = cache.namespace('search', ttl=CACHE_TTL, persist=True, stale_ttl=CACHE_STALE_TTL)
+# Columnar ResultSets for search entries (in-process only, rebuilt from the place store)
+_columns = cache.namespace('search_columns', ttl=CACHE_STALE_TTL)
+
+place_store = PlaceStore(l2=cache.l2)
+_search_flight = SingleFlight('search')
+_search_refresh = Refresher('search')
+
+# Failed loads go to their own short-lived namespace, so they never replace
+# good data and repeat requests don't each wait out a failing upstream.
+SEARCH_NEGATIVE_TTL = int(os.environ.get('SEARCH_NEGATIVE_TTL', 30))
+_search_failures = cache.namespace('search_failed', ttl=SEARCH_NEGATIVE_TTL)
+
+
+def drop_uncovered(keys):
+    """Circles evicted from the coverage index take their in-memory entries with them
+    (the persistent copies stay, for exact-key hits and last-good fallback)."""
+    for key in keys:
+        cache.delete(_search_cache.name, key)
+        _columns.delete(key)
+
+_coverage = CoverageIndex(on_evict=drop_uncovered)
+
+
+class RecentFailure(Exception):
+    """The same search failed upstream less than SEARCH_NEGATIVE_TTL ago."""
+
+
+def upstream_error(e):
+    """(payload, status) for a request upstream couldn't serve: 429 while our quota for it is
+    drained, 503 while its circuit is open (both with retryAfter seconds), else 502."""
+    if isinstance(e, quota.QuotaExceeded):
+        return {'error': 'Too many requests right now. Please try again shortly.',
+                'retryAfter': max(1, math.ceil(e.wait))}, 429
+    if isinstance(e, CircuitOpen):
+        return {'error': 'Service temporarily unavailable. Please try again shortly.',
+                'retryAfter': max(1, math.ceil(e.retry_in))}, 503
+    return {'error': 'Upstream request failed. Please try again.'}, 502
+
+
+def respond(payload, status):
+    """Flask response for a handler's (payload, status); retryAfter becomes a Retry-After header."""
+    resp = jsonify(payload)
+    if 'retryAfter' in payload:
+        resp.headers['Retry-After'] = str(payload['retryAfter'])
+    return resp, status
+
 
 def cache_key(lat, lng, radius, q='', cat=''):
-    return f"{round(lat*200)/200},{round(lng*200)/200},{radius},{q},{cat}"
+    # Snap the centre to a grid that scales with the radius (0.005° at 5 km)
+    step = grid_step(radius)
+    return f"{snap(lat, step)},{snap(lng, step)},{radius},{q},{cat}"
 
 def get_cached(key):
-    with _cache_lock:
-        if key in _cache and time.time() - _cache[key]['ts'] < CACHE_TTL:
-            return _cache[key]['data']
-    return None
+    return _search_cache.get(key)
+
+def lookup_cached(key):
+    """(entry, is_stale) or None."""
+    return _search_cache.lookup(key)
 
 def set_cached(key, data):
-    with _cache_lock:
-        _cache[key] = {'data': data, 'ts': time.time()}
+    _search_cache.set(key, data)
 
 
 # ─── Field mask for Google Places ──────────────────────────────
@@ -73,14 +152,66 @@ FIELD_MASK = ",".join([
 ])
 
 
-# ─── Google Places: Nearby Search ──────────────────────────────
-def google_nearby_search(lat, lng, radius, included_types=None):
-    url = "https://places.googleapis.com/v1/places:searchNearby"
+# ─── Google Places: paginated search (shared by Nearby + Text) ─
+# A query is {'url', 'body', 'label'}; a stream is a query plus its paging
+# state ('pages' fetched, next 'token'). Streams are plain JSON so a partly
+# fetched search can sit in the cache and be resumed by a later request.
+SEARCH_MAX_PAGES = 5  # Get up to 100 total (5 × 20)
+PAGE_DELAY = 0.5      # Brief delay before following a nextPageToken
+
+def places_stream(query):
+    return dict(query, pages=0, token=None)
+
+
+def stream_pending(stream):
+    return stream['pages'] == 0 or bool(stream['token'])
+
+
+async def _places_page(stream, on_page=None):
+    """Fetch a stream's next page, advancing it in place. An error on a later page ends
+    the stream; on the first page it is raised, since [] would read as "no places"."""
     headers = {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": GOOGLE_API_KEY,
         "X-Goog-FieldMask": FIELD_MASK,
     }
+    body = dict(stream['body'])
+    if stream['token']:
+        body["pageToken"] = stream['token']
+    try:
+        resp = await upstream.apost(stream['url'], json=body, headers=headers, timeout=12)
+        resp.raise_for_status()
+        data = resp.json()
+    except (quota.QuotaExceeded, CircuitOpen):
+        # Not the stream's fault: leave its page token for a later request
+        raise
+    except Exception as e:
+        log.error(f"{stream['label']} error: {e}")
+        if not stream['pages']:
+            raise
+        stream['pages'] += 1
+        stream['token'] = None
+        return []
+    stream['pages'] += 1
+    stream['token'] = data.get("nextPageToken") if stream['pages'] < SEARCH_MAX_PAGES else None
+    places = data.get("places", [])
+    if on_page:
+        on_page(places)
+    return places
+
+
+async def _places_search(query, on_page=None):
+    """All result pages for one query. on_page(places), if given, sees each page as it lands."""
+    stream = places_stream(query)
+    places = list(await _places_page(stream, on_page))
+    while stream['token']:
+        await asyncio.sleep(PAGE_DELAY)
+        places.extend(await _places_page(stream, on_page))
+    return places
+
+
+# ─── Google Places: Nearby Search ──────────────────────────────
+def nearby_query(lat, lng, radius, included_types=None):
     body = {
         "locationRestriction": {
             "circle": {
@@ -93,44 +224,15 @@ def google_nearby_search(lat, lng, radius, included_types=None):
     }
     if included_types:
         body["includedTypes"] = included_types
+    return {'url': "https://places.googleapis.com/v1/places:searchNearby", 'body': body, 'label': "Nearby search"}
 
-    try:
-        resp = req.post(url, json=body, headers=headers, timeout=12)
-        resp.raise_for_status()
-        data = resp.json()
-        places = data.get("places", [])
-
-        # Try to get more results with pagination if available
-        next_token = data.get("nextPageToken")
-        attempt = 0
-        while next_token and attempt < 4:  # Get up to 100 total (5 pages × 20)
-            attempt += 1
-            import time
-            time.sleep(0.5)  # Brief delay for pagination
-            body["pageToken"] = next_token
-            try:
-                resp = req.post(url, json=body, headers=headers, timeout=12)
-                resp.raise_for_status()
-                data = resp.json()
-                places.extend(data.get("places", []))
-                next_token = data.get("nextPageToken")
-            except:
-                break
-
-        return places
-    except Exception as e:
-        log.error(f"Nearby search error: {e}")
-        return []
+
+async def google_nearby_search(lat, lng, radius, included_types=None, on_page=None):
+    return await _places_search(nearby_query(lat, lng, radius, included_types), on_page)
 
 
 # ─── Google Places: Text Search ────────────────────────────────
-def google_text_search(query, lat, lng, radius):
-    url = "https://places.googleapis.com/v1/places:searchText"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": GOOGLE_API_KEY,
-        "X-Goog-FieldMask": FIELD_MASK,
-    }
+def text_query(query, lat, lng, radius):
     body = {
         "textQuery": query,
         "locationBias": {
@@ -142,34 +244,11 @@ def google_text_search(query, lat, lng, radius):
         "maxResultCount": 20,  # Google's max per request
         "languageCode": "en",
     }
+    return {'url': "https://places.googleapis.com/v1/places:searchText", 'body': body, 'label': "Text search"}
 
-    try:
-        resp = req.post(url, json=body, headers=headers, timeout=12)
-        resp.raise_for_status()
-        data = resp.json()
-        places = data.get("places", [])
-
-        # Try to get more results with pagination if available
-        next_token = data.get("nextPageToken")
-        attempt = 0
-        while next_token and attempt < 4:  # Get up to 100 total (5 pages × 20)
-            attempt += 1
-            import time
-            time.sleep(0.5)  # Brief delay for pagination
-            body["pageToken"] = next_token
-            try:
-                resp = req.post(url, json=body, headers=headers, timeout=12)
-                resp.raise_for_status()
-                data = resp.json()
-                places.extend(data.get("places", []))
-                next_token = data.get("nextPageToken")
-            except:
-                break
-
-        return places
-    except Exception as e:
-        log.error(f"Text search error: {e}")
-        return []
+
+async def google_text_search(query, lat, lng, radius, on_page=None):
+    return await _places_search(text_query(query, lat, lng, radius), on_page)
 
 
 # ─── Google Places: Get single place by ID ─────────────────────
@@ -181,46 +260,105 @@ def _looks_like_place_id(q):
     q = q.strip()
     return q.startswith("ChIJ") or q.startswith("places/")
 
-def google_get_place(place_id):
+async def google_get_place(place_id):
     raw = place_id.strip()
     if raw.startswith("places/"):
         raw = raw.replace("places/", "", 1)
     url = f"https://places.googleapis.com/v1/places/{raw}"
     headers = {"X-Goog-Api-Key": GOOGLE_API_KEY, "X-Goog-FieldMask": FIELD_MASK_GET}
     try:
-        resp = req.get(url, headers=headers, timeout=10)
+        resp = await upstream.aget(url, headers=headers, timeout=10)
+        if resp.status_code in (400, 404):
+            # Unknown or malformed id: a real miss, unlike an outage
+            return None
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
         log.error(f"Get place error: {e}")
-        return None
+        raise
 
 
 # ─── Photo URL builder ─────────────────────────────────────────
 FALLBACK_IMAGE = 'https://images.unsplash.com/photo-1441986300917-64674bd600d8?w=480&h=320&fit=crop'
 
 def get_photo_url(photo_ref):
+    """Proxied path for a Google photo: the browser never sees our API key. Kept relative in
+    stored records; public_images() roots it at the requesting host when responding."""
     if not photo_ref:
         return FALLBACK_IMAGE
-    return f"https://places.googleapis.com/v1/{photo_ref}/media?maxHeightPx=400&maxWidthPx=600&key={GOOGLE_API_KEY}"
+    return f"/api/photo/{photo_ref}?w=600&h=400"
+
+
+def public_image(url, base_url):
+    """Absolute URL of an image served by this API's proxy, rooted at PUBLIC_API_URL or else
+    base_url (the request's host). Also re-roots absolute proxy URLs stored under an older
+    host; anything else passes through."""
+    parts = urlsplit(url or '')
+    if not parts.path.startswith(('/api/photo/', '/api/deals/')):
+        return url
+    base = PUBLIC_API_URL or (base_url or '').rstrip('/')
+    return f"{base}{parts.path}" + (f"?{parts.query}" if parts.query else '')
+
+
+def public_images(items, base_url):
+    """public_image() over the 'image' of every dict in items, in place; returns items."""
+    for item in items:
+        if item.get('image'):
+            item['image'] = public_image(item['image'], base_url)
+    return items
+
+
+# ─── Merchant photos (deal enrichment) ────────────────────────
+# Merchant (normalised name + location rounded to ~100 m) → Google photo
+# resource name, '' when the best match has no photo. Persisted, so deal
+# pages stay enriched across restarts. Unknown merchants are looked up in
+# the background — one single-result Text Search page each — and show up
+# in later responses; the current one goes out with the fallback image.
+MERCHANT_PHOTO_TTL = int(os.environ.get('MERCHANT_PHOTO_TTL', 7 * 24 * 3600))
+MERCHANT_PHOTO_FIELD_MASK = "places.id,places.photos"
+_merchant_photos = cache.namespace('merchant_photo', ttl=MERCHANT_PHOTO_TTL, persist=True)
+_photo_enricher = Refresher('merchant_photo')
+# Background lookups queued per deals response
+DEAL_PHOTO_ENRICH_MAX = int(os.environ.get('DEAL_PHOTO_ENRICH_MAX', 5))
+
+def merchant_key(merchant_name, lat, lng):
+    return f"{' '.join(merchant_name.lower().split())}|{round(float(lat), 3)},{round(float(lng), 3)}"
+
+
+async def find_merchant_photo(merchant_name, lat, lng, radius=2000):
+    """Photo resource name of the top Text Search match for a merchant ('' if none). Raises on upstream errors."""
+    query = text_query(merchant_name.strip(), float(lat), float(lng), radius)
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": GOOGLE_API_KEY,
+        "X-Goog-FieldMask": MERCHANT_PHOTO_FIELD_MASK,
+    }
+    resp = await upstream.apost(query['url'], json=dict(query['body'], maxResultCount=1), headers=headers, timeout=8)
+    resp.raise_for_status()
+    places = resp.json().get("places") or []
+    photos = (places[0].get("photos") or []) if places else []
+    return (photos[0].get("name") or '') if photos else ''
 
 
-def get_place_photo_for_merchant(merchant_name, lat, lng, radius=2000):
-    """Try to get a real business photo from Google Places for a deal merchant. Returns URL or None."""
-    if not GOOGLE_API_KEY or not merchant_name or lat is None or lng is None:
-        return None
-    try:
-        places = google_text_search(merchant_name.strip(), lat, lng, radius)
-        if not places:
-            return None
-        photos = places[0].get("photos") or []
-        if not photos:
-            return None
-        ref = photos[0].get("name")
-        return get_photo_url(ref) if ref else None
-    except Exception as e:
-        log.debug(f"Deal photo enrichment failed for {merchant_name}: {e}")
-        return None
+def resolve_merchant_photo(key, merchant_name, lat, lng):
+    """Background job: look the merchant up and cache the result (errors are not cached)."""
+    ref = aio.run(find_merchant_photo(merchant_name, lat, lng))
+    _merchant_photos.set(key, ref)
+    log.info(f"Merchant photo for {merchant_name!r}: {'found' if ref else 'none'}")
+
+
+def merchant_photo(merchant_name, lat, lng):
+    """(known, url): whether the merchant has been looked up yet, and its cached photo URL or None."""
+    hit = _merchant_photos.lookup(merchant_key(merchant_name, lat, lng))
+    if hit is None:
+        return False, None
+    return True, (get_photo_url(hit[0]) if hit[0] else None)
+
+
+def enrich_merchant_photo(merchant_name, lat, lng):
+    """Schedule a background photo lookup for a merchant; False if one is already pending or the queue is full."""
+    key = merchant_key(merchant_name, lat, lng)
+    return _photo_enricher.submit(key, lambda: resolve_merchant_photo(key, merchant_name, lat, lng))
 
 
 # ─── Map Google types → your category system ───────────────────
@@ -399,86 +537,17 @@ EXTRA_QUERIES_BY_CATEGORY = {
     "Mexican": ["local mexican restaurant", "mexican food", "taqueria"],
 }
 
-# ─── Exclude large chains / big box — show only small businesses ─
-LARGE_CHAIN_NAMES = frozenset([
-    "costco", "costco wholesale", "sam's club", "sams club", "bj's", "bjs wholesale",
-    "walmart", "wal-mart", "target", "kmart", "meijer", "fred meyer",
-    "mcdonald's", "mcdonalds", "burger king", "wendy's", "wendys", "sonic",
-    "taco bell", "chipotle", "qdoba", "del taco", "moe's southwest grill",
-    "kfc", "kentucky fried chicken", "popeyes", "chick-fil-a", "chick fil a",
-    "panda express", "panda inn", "five guys", "in-n-out", "in n out",
-    "whataburger", "jack in the box", "carl's jr", "carls jr", "hardee's", "hardees",
-    "arbys", "arby's", "subway", "jimmy john's", "jimmy johns", "firehouse subs",
-    "pizza hut", "domino's", "dominos", "papa john's", "papa johns", "little caesars",
-    "wingstop", "buffalo wild wings", "bdubs", "applebees", "applebee's",
-    "olive garden", "red lobster", "outback", "outback steakhouse",
-    "texas roadhouse", "chili's", "chilis", "longhorn steakhouse",
-    "ihop", "i hop", "denny's", "dennys", "cracker barrel", "waffle house",
-    "starbucks", "dunkin'", "dunkin", "dunkin donuts", "caribou coffee",
-    "panera", "panera bread", "jamba juice", "smoothie king", "tropical smoothie",
-    "home depot", "lowes", "lowes's", "menards", "ace hardware",
-    "best buy", "staples", "office depot", "office max",
-    "cvs", "walgreens", "rite aid", "duane reade",
-    "kroger", "safeway", "albertsons", "publix", "whole foods", "whole foods market",
-    "trader joe's", "trader joes", "aldi", "lidl", "sprouts",
-    "dollar general", "dollar tree", "family dollar", "99 cents only",
-    "7-eleven", "7 eleven", "circle k", "speedway", "wawa", "sheetz", "quik trip", "qt",
-    "shell", "exxon", "chevron", "bp", "mobil", "conoco", "phillips 66", "valero",
-    "marriott", "hilton", "hyatt", "holiday inn", "best western", "hampton inn",
-    "fedex", "ups", "ups store", "u.s. postal service", "usps", "dhl",
-    "autozone", "oreilly", "oreilly auto", "advance auto", "napa auto",
-    "jiffy lube", "take 5 oil change", "valvoline", "firestone", "goodyear",
-    "gamestop", "petco", "petsmart", "bed bath & beyond", "bed bath and beyond",
-    "mattress firm", "ashley furniture", "la-z-boy", "lazy boy",
-    "att store", "verizon", "verizon wireless", "t-mobile", "tmobile", "sprint", "at&t",
-    "h&r block", "hr block", "jackson hewitt", "liberty tax",
-    "massage envy", "european wax center", "hand & stone", "hand and stone",
-    "great clips", "supercuts", "sport clips", "fantastic sams",
-    "dentistry", "aspen dental", "heartland dental", "comfort dental",
-    "concentra", "urgent care", "minute clinic", "cvs minute clinic",
-    "america's best", "americas best", "lenscrafters", "pearle vision",
-    "enterprise", "enterprise rent-a-car", "hertz", "avis", "budget", "national car rental",
-    "hobby lobby", "michaels", "joann", "jo-ann", "joann fabrics",
-    "dave & buster's", "dave and busters", "main event", "topgolf", "top golf",
-    "amc", "amc theatres", "regal", "cinemark", "movie tavern",
-    "planet fitness", "la fitness", "24 hour fitness", "equinox", "anytime fitness",
-    "big lots", "ross", "tj maxx", "t.j. maxx", "marshalls", "homegoods", "burlington",
-    "j.c. penney", "jcpenney", "kohl's", "kohls",
-    "dicks sporting goods", "dick's sporting goods", "academy sports", "rei ",
-    "bass pro", "cabela's", "cabelas", "scheels",
-    "apple store", "microsoft store", "samsung",
-    "ikea", "wayfair", "pottery barn", "west elm", "crate and barrel",
-    "bath & body works", "victoria's secret", "victorias secret", "ulta",
-    "sephora", "lush", "body shop",
-    "dairy queen", "dq ", "baskin-robbins", "baskin robbins", "cold stone", "ben & jerry's",
-    "cinnabon", "auntie anne's", "pretzel maker", "wetzel's", "jamba",
-    "jersey mike's", "jersey mikes", "blaze pizza", "mod pizza", "&pizza",
-    "raising cane's", "raising canes", "zaxby's", "zaxbys", "bojangles",
-    "cava", "sweetgreen", "salata", "corelife", "freshii",
-    "first watch", "another broken egg", "snooze", "black bear diner",
-    "red robin", "red robin gourmet burgers", "famous dave's", "famous daves",
-    "texas roadhouse", "longhorn", "outback steakhouse", "bloomin brands",
-    "cracker barrel", "bob evans", "perkins", "village inn", "ihop",
-    "costa vida", "cafe rio", "mo' bettahs", "mo bettahs", "swig", "fiiz",
-    "crumbl", "insomnia cookies", "great american cookies", "potbelly",
-])
-
+# ─── Chain classification ──────────────────────────────────────
+# Name lists and the compiled trie / Aho-Corasick matcher live in chains.py
 def is_large_chain(display_name):
     """Return True if this business appears to be a large chain / big box (exclude from results)."""
-    if not display_name or not display_name.strip():
-        return False
-    n = display_name.lower().strip()
-    # Exact match
-    if n in LARGE_CHAIN_NAMES:
-        return True
-    # Name starts with a known chain (e.g. "McDonald's #1234", "Costco Wholesale")
-    for chain in LARGE_CHAIN_NAMES:
-        if n == chain or n.startswith(chain + " ") or n.startswith(chain + "#") or n.startswith(chain + "'") or n.startswith(chain + "-"):
-            return True
-        # Whole-word match: " ... chain ... " or start/end
-        if n.startswith(chain) and (len(n) == len(chain) or n[len(chain):len(chain)+1] in " #'-"):
-            return True
-    return False
+    return chains.classify(display_name) == chains.EXCLUDE
+
+
+def is_big_chain(name):
+    """Return True for a big chain that stays in results but ranks after small businesses."""
+    return chains.classify(name) == chains.DEPRIORITISE
+
 
 
 def map_google_type(primary_type, types):
@@ -490,6 +559,13 @@ def map_google_type(primary_type, types):
     return ("More", "Thrift Stores")
 
 
+def distance_m(clat, clng, lat, lng):
+    """Equirectangular distance in metres (accurate at search-radius scale)."""
+    dx = (lat - clat) * 111320
+    dy = (lng - clng) * 111320 * math.cos(math.radians(clat))
+    return math.sqrt(dx * dx + dy * dy)
+
+
 # ─── Parse a Google Place into business dict ───────────────────
 def parse_google_place(place, clat=0, clng=0):
     loc = place.get("location", {})
@@ -508,9 +584,7 @@ def parse_google_place(place, clat=0, clng=0):
         return None
 
     # Distance
-    dx = (lat - clat) * 111320
-    dy = (lng - clng) * 111320 * math.cos(math.radians(clat))
-    dist = math.sqrt(dx * dx + dy * dy)
+    dist = distance_m(clat, clng, lat, lng)
 
     # Photo
     photos = place.get("photos", [])
@@ -590,236 +664,924 @@ def parse_google_place(place, clat=0, clng=0):
     }
 
 
+# Sort: small businesses first (by distance), then big chains (by distance)
+# False sorts before True, so small businesses come first
+def rank_businesses(businesses):
+    businesses.sort(key=lambda biz: (is_big_chain(biz['name']), biz['distanceMeters']))
+    return businesses
+
+
+def result_set(ck, entry, last_good=False):
+    """Columnar view of a cached id-list entry, built once per entry object; None if unresolvable.
+    last_good: resolve places from persisted rows as old as the L2 tier keeps."""
+    if 'ids' not in entry:
+        return None
+    hit = _columns.get(ck)
+    if hit is not None and hit[0] is entry['ids']:
+        return hit[1]
+    records = place_store.get_many(entry['ids'], last_good)
+    if records is None:
+        return None
+    rs = ResultSet(records, is_big_chain, entry['lat'], entry['lng'], entry['dist'])
+    _columns.set(ck, (entry['ids'], rs), size=rs.nbytes())
+    return rs
+
+
+def relocate(ck, entry, lat, lng, radius, filters=None, sort='relevance', last_good=False):
+    """Rank a cached entry's places from (lat, lng) as a Ranking, or None if unresolvable.
+
+    From a different centre (or a smaller radius) distances are recomputed,
+    places outside `radius` dropped and the rows filtered and re-ranked — all
+    as NumPy / bitmap batch operations over the entry's ResultSet.
+    """
+    rs = result_set(ck, entry, last_good)
+    if rs is None:
+        return None
+    return rs.rank(lat, lng, radius, filters, sort, facets=True)
+
+
+PRICE_SYMBOLS = {'0': 'Free', '1': '$', '2': '$$', '3': '$$$', '4': '$$$$'}
+
+def _csv_arg(args, name):
+    return [v.strip() for v in args.get(name, '', type=str).split(',') if v.strip()]
+
+
+def search_filters(args):
+    """Filter params evaluated against the cached set: minRating, price ($..$$$$ or 1-4),
+    features (all of), subcategory (any of)."""
+    price = [PRICE_SYMBOLS.get(p, p) for p in _csv_arg(args, 'price')]
+    return {
+        'minRating': args.get('minRating', type=float),
+        'price': price,
+        'features': _csv_arg(args, 'features'),
+        'subcategory': _csv_arg(args, 'subcategory'),
+    }
+
+
+# ─── Search pipeline ───────────────────────────────────────────
+# Independent upstream query streams (primary + EXTRA_QUERIES_BY_CATEGORY) are
+# awaited concurrently; each request keeps at most SEARCH_FANOUT_PER_REQUEST
+# streams in flight. Process-wide concurrency is bounded by the upstream pools.
+SEARCH_FANOUT_PER_REQUEST = int(os.environ.get('SEARCH_FANOUT_PER_REQUEST', 4))
+
+async def fan_out(calls, limit=SEARCH_FANOUT_PER_REQUEST):
+    """Await zero-arg coroutine factories concurrently, at most `limit` at once. Results keep input order."""
+    gate = asyncio.Semaphore(max(1, limit))
+
+    async def gated(fn):
+        async with gate:
+            return await fn()
+
+    return await asyncio.gather(*(gated(fn) for fn in calls))
+
+
+def search_queries(lat, lng, radius, q='', category=''):
+    """Upstream queries for a search: the primary, plus extras for chain-heavy categories."""
+    if q:
+        search_q = f"{q} {category}" if category else q
+        return [text_query(search_q, lat, lng, radius)]
+    if not category:
+        # General explore
+        return [nearby_query(lat, lng, radius)]
+
+    # Category browsing — try to map to Google types
+    gtypes = SUBCAT_TO_GTYPE.get(category)
+    if gtypes:
+        queries = [nearby_query(lat, lng, radius, gtypes)]
+    else:
+        # Fallback to text search with category name
+        queries = [text_query(category, lat, lng, radius)]
+    # For chain-heavy categories, pull more results via "local" / "independent" queries
+    # (optional: dropped while Text Search quota is running low)
+    if category in CHAIN_HEAVY_CATEGORIES and quota.low('places_text'):
+        log.info(f"Text Search quota low, skipping extra queries for {category!r}")
+    elif category in CHAIN_HEAVY_CATEGORIES:
+        for extra_q in EXTRA_QUERIES_BY_CATEGORY.get(category, [])[:3]:
+            queries.append(text_query(extra_q, lat, lng, radius))
+    return queries
+
+
+async def fetch_round(streams, on_page=None):
+    """Next page of every pending stream, concurrently. on_page(places), if given, is
+    called with every page as it arrives (any stream, any order).
+
+    Returns (places, failed): a stream that was throttled, hit an open circuit or
+    failed its first page keeps its place and token, and the first such error is
+    handed back instead of raised so pages the other streams fetched are not lost.
+    """
+    failed = []
+
+    async def next_page(stream):
+        try:
+            return await _places_page(stream, on_page)
+        except Exception as e:
+            failed.append(e)
+            return []
+
+    pages = await fan_out([lambda s=s: next_page(s) for s in streams if stream_pending(s)])
+    # Merge in stream order (primary first, then extras) so dedupe is deterministic
+    places, seen_ids = [], set()
+    for page in pages:
+        for p in page:
+            pid = p.get("id")
+            if pid and pid not in seen_ids:
+                seen_ids.add(pid)
+                places.append(p)
+    return places, (failed[0] if failed else None)
+
+
+def build_businesses(places, lat, lng, seen_names=None):
+    """Parse, dedupe (also against seen_names, which is updated), drop large chains and rank
+    (small businesses first, then by distance)."""
+    businesses = []
+    seen_names = set() if seen_names is None else seen_names
+    for p in places:
+        biz = parse_google_place(p, lat, lng)
+        if not biz:
+            continue
+        # Deduplicate
+        nk = biz['name'].lower().strip()
+        if nk in seen_names:
+            continue
+        seen_names.add(nk)
+        if is_large_chain(biz['name']):
+            continue
+        businesses.append(biz)
+
+    return rank_businesses(businesses)
+
+
 # ═══════════════════════════════════════════════════════════════
 # ROUTES
 # ═══════════════════════════════════════════════════════════════
 
-@app.route('/api/search', methods=['GET'])
-def search_businesses():
-    lat = request.args.get('lat', type=float)
-    lng = request.args.get('lng', type=float)
-    q = request.args.get('q', '', type=str).strip()
-    radius = min(request.args.get('radius', 5000, type=int), 50000)
-    category = request.args.get('category', '', type=str).strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 15, type=int)
+# ─── Search cache entries ──────────────────────────────────────
+# An entry is {'lat', 'lng', 'radius', 'ids', 'dist', 'pending'}: the ranked
+# places materialised so far plus the upstream streams that still have pages
+# ('pending', resumable page tokens). /api/search only fetches rounds of
+# pages until the requested page can be filled; later pages extend the entry.
+
+def new_entry(lat, lng, radius, streams=()):
+    return {'lat': lat, 'lng': lng, 'radius': radius, 'ids': [], 'dist': [], 'pending': list(streams)}
+
+
+def add_places(entry, places):
+    """Copy of `entry` with new raw places parsed, deduped against it, chain-filtered and the set re-ranked."""
+    records = place_store.get_many(entry['ids'])
+    if records is None:
+        log.info("Cached places no longer resolvable, restarting entry from new pages")
+        records, entry = [], dict(entry, ids=[], dist=[])
+    seen_ids = set(entry['ids'])
+    seen_names = {r.name.lower().strip() for r in records}
+    fresh = [b for b in build_businesses(places, entry['lat'], entry['lng'], seen_names)
+             if b['id'] and b['id'] not in seen_ids]
+    place_store.put_many(fresh)
+    _completions.add((b['name'] for b in fresh if b['name']), 'business')
+    rows = [(r.id, d, r.name) for r, d in zip(records, entry['dist'])]
+    rows += [(b['id'], b['distanceMeters'], b['name']) for b in fresh]
+    rows.sort(key=lambda row: (is_big_chain(row[2]), row[1]))
+    return dict(entry, ids=[row[0] for row in rows], dist=[row[1] for row in rows])
+
+
+async def grow_search(ck, entry, q='', category='', enough=None, on_page=None):
+    """Fetch rounds of pages into a copy of `entry` until enough(entry) holds (None: until
+    every stream is exhausted), then cache it. Returns the new entry."""
+    entry = dict(entry)
+    streams = [dict(s) for s in entry.get('pending') or ()]
+    rounds = 0
+    while any(stream_pending(s) for s in streams):
+        if enough is not None and enough(entry):
+            break
+        if rounds:
+            await asyncio.sleep(PAGE_DELAY)
+        places, failed = await fetch_round(streams, on_page)
+        entry = add_places(entry, places)
+        rounds += 1
+        if failed:
+            if not any(s['pages'] for s in streams):
+                raise failed  # nothing fetched at all: don't cache an empty set
+            log.warning(f"Search paging stopped early: {failed}")
+            break
+    entry['pending'] = [s for s in streams if stream_pending(s)]
+    set_cached(ck, entry)
+    # Partial sets stand in for other circles too; covered requests deepen them
+    _coverage.add((q, category), entry['lat'], entry['lng'], entry['radius'], ck, partial=bool(entry['pending']))
+    pending = f" ({len(entry['pending'])} streams pending)" if entry['pending'] else ''
+    log.info(f"Fetched & cached {len(entry['ids'])} businesses{pending}")
+    return entry
+
+
+async def load_search(ck, lat, lng, radius, q='', category='', on_page=None, enough=None):
+    """Fetch, build and cache a search result set; returns the cache entry.
+
+    A failed load is remembered in the negative cache; until that expires the
+    key fails again at once, without an upstream call.
+    """
+    failed = _search_failures.get(ck)
+    if failed is not None:
+        raise RecentFailure(failed)
+    try:
+        if _looks_like_place_id(q):
+            place = await google_get_place(q)
+            if place and on_page:
+                on_page([place])
+            return await grow_search(ck, add_places(new_entry(lat, lng, radius), [place] if place else []), q, category)
+        streams = [places_stream(query) for query in search_queries(lat, lng, radius, q, category)]
+        return await grow_search(ck, new_entry(lat, lng, radius, streams), q, category, enough, on_page)
+    except (quota.QuotaExceeded, CircuitOpen):
+        # Already fail fast without an upstream call; keep the type for a 429/503
+        raise
+    except Exception as e:
+        _search_failures.set(ck, f"{type(e).__name__}: {e}")
+        raise
+
+
+async def deepen_search(ck, entry, q, category, enough, on_page=None):
+    """Extend a partial entry until enough(entry) or it is complete. Concurrent extensions
+    of one key share a single upstream fetch; a follower re-checks against its own need."""
+    while entry.get('pending') and not enough(entry):
+        entry = await _search_flight.do_async(
+            f"{ck}+more", lambda e=entry: grow_search(ck, e, q, category, enough, on_page))
+    return entry
+
+
+def refresh_search(ck, entry, q='', category=''):
+    """Re-fetch a stale entry in the background (to the same depth); shares the single-flight slot with foreground misses."""
+    if quota.low('places_nearby') or quota.low('places_text'):
+        log.info(f"Places quota low, serving {ck!r} stale without refresh")
+        return
+    lat, lng, radius = entry['lat'], entry['lng'], entry['radius']
+    depth = len(entry['ids'])
+    enough = (lambda e: len(e['ids']) >= depth) if entry.get('pending') else None
+    _search_refresh.submit(ck, lambda: aio.run(_search_flight.do_async(
+        ck, lambda: load_search(ck, lat, lng, radius, q, category, enough=enough))))
+
+
+def last_good_search(*keys):
+    """(key, entry) for the newest persisted entry under any of `keys`, however old; else None."""
+    for key in dict.fromkeys(keys):
+        hit = _search_cache.last_good(key)
+        if hit is not None:
+            log.warning(f"Serving last good copy of {key!r} ({(time.time() - hit[1]) / 60:.0f} min old)")
+            return key, hit[0]
+    return None
 
-    if lat is None or lng is None:
-        return jsonify({'error': 'lat and lng required'}), 400
 
-    log.info(f"Search: q={q!r} cat={category!r} r={radius} p={page}")
+def find_cached(ck, lat, lng, radius, q='', category=''):
+    """Exact grid cell first, then any cached circle that covers this one. Returns (key, (entry, stale)|None)."""
+    group = (q, category)
+    hit = lookup_cached(ck)
+    if hit is None and not _looks_like_place_id(q):
+        for cover_key in _coverage.covering(group, lat, lng, radius):
+            hit = lookup_cached(cover_key)
+            if hit is not None:
+                _coverage.mark_reused()
+                log.info(f"Coverage hit: {cover_key!r} r={hit[0]['radius']} serves r={radius}")
+                return cover_key, hit
+            _coverage.discard(group, cover_key)
+    return ck, hit
 
-    # Check cache
-    ck = cache_key(lat, lng, radius, q, category)
-    cached = get_cached(ck)
-    if cached is not None:
-        log.info(f"Cache hit: {len(cached)} businesses")
-        businesses = cached
-    else:
-        try:
-            places = []
-            if q:
-                if _looks_like_place_id(q):
-                    place = google_get_place(q)
-                    places = [place] if place else []
-                else:
-                    search_q = f"{q} {category}" if category else q
-                    places = google_text_search(search_q, lat, lng, radius)
-            elif category:
-                # Category browsing — try to map to Google types
-                gtypes = SUBCAT_TO_GTYPE.get(category)
-                if gtypes:
-                    places = google_nearby_search(lat, lng, radius, included_types=gtypes)
-                else:
-                    # Fallback to text search with category name
-                    places = google_text_search(category, lat, lng, radius)
-                # For chain-heavy categories, pull more results via "local" / "independent" queries
-                if category in CHAIN_HEAVY_CATEGORIES:
-                    seen_ids = {p.get("id") for p in places if p.get("id")}
-                    for extra_q in EXTRA_QUERIES_BY_CATEGORY.get(category, [])[:3]:
-                        more = google_text_search(extra_q, lat, lng, radius)
-                        for p in more:
-                            pid = p.get("id")
-                            if pid and pid not in seen_ids:
-                                seen_ids.add(pid)
-                                places.append(p)
-            else:
-                # General explore
-                places = google_nearby_search(lat, lng, radius)
-
-            businesses = []
-            seen_names = set()
-            for p in places:
-                biz = parse_google_place(p, lat, lng)
-                if not biz:
-                    continue
-                # Deduplicate
-                nk = biz['name'].lower().strip()
-                if nk in seen_names:
-                    continue
-                seen_names.add(nk)
-                if is_large_chain(biz['name']):
-                    continue
-                businesses.append(biz)
-
-            # Define big business chains to deprioritize
-            BIG_CHAINS = {
-                'walmart', 'costco', 'target', 'home depot', 'lowes', "lowe's",
-                'best buy', 'kroger', 'safeway', 'whole foods', 'albertsons',
-                'cvs', 'walgreens', 'rite aid', 'mcdonalds', "mcdonald's",
-                'burger king', 'wendys', "wendy's", 'taco bell', 'kfc',
-                'subway', 'starbucks', 'dunkin', "dunkin'", 'chipotle',
-                'panera', 'chick-fil-a', 'pizza hut', 'dominos', "domino's",
-                'papa johns', "papa john's", 'little caesars', 'olive garden',
-                'applebees', "applebee's", 'chilis', "chili's", 'red lobster',
-                'outback steakhouse', 'buffalo wild wings', 'ihop', 'dennys', "denny's",
-                'waffle house', 'panda express', 'five guys', 'in-n-out',
-                'shake shack', 'popeyes', 'arbys', "arby's", 'sonic',
-                'dairy queen', 'baskin robbins', 'cold stone', '7-eleven',
-                "7 eleven", 'circle k', 'shell', 'chevron', 'exxon', 'bp',
-                'mobil', 'marathon', 'speedway', 'sams club', "sam's club",
-                'kohls', "kohl's", 'jcpenney', 'macys', "macy's", 'nordstrom',
-                'tjmaxx', 'tj maxx', 'marshalls', 'ross', 'burlington',
-                'petco', 'petsmart', 'autozone', 'oreilly', "o'reilly",
-                'napa', 'jiffy lube', 'valvoline', 'discount tire',
-                'firestone', 'goodyear', 'pep boys', 'home goods',
-                'bed bath', 'bath & body', 'ulta', 'sephora', 'sally beauty',
-                'great clips', 'supercuts', 'sport clips', 'fantastic sams',
-                '24 hour fitness', 'la fitness', 'planet fitness', 'anytime fitness',
-                'gold gym', "gold's gym", 'marriott', 'hilton', 'hyatt',
-                'holiday inn', 'best western', 'comfort inn', 'hampton inn',
-                'courtyard', 'residence inn', 'springhill', 'fairfield inn',
-            }
 
-            # Sort: small businesses first (by distance), then big chains (by distance)
-            def sort_key(biz):
-                name_lower = biz['name'].lower()
-                is_big_chain = any(chain in name_lower for chain in BIG_CHAINS)
-                # Return tuple: (is_big_chain, distance)
-                # False sorts before True, so small businesses come first
-                return (is_big_chain, biz['distanceMeters'])
+# ─── Snapshot cursors ──────────────────────────────────────────
+# A search response with more to come carries an opaque cursor naming a
+# snapshot of the ranked id list it was cut from. Later pages are served
+# from that snapshot — extended at the end when more upstream pages are
+# fetched, never reordered — so pages stay consistent even if the entry
+# behind them is refreshed or re-ranked in the meantime.
+SEARCH_CURSOR_TTL = int(os.environ.get('SEARCH_CURSOR_TTL', 1800))
+_cursors = cache.namespace('search_cursor', ttl=SEARCH_CURSOR_TTL)
 
-            businesses.sort(key=sort_key)
-            set_cached(ck, businesses)
-            log.info(f"Fetched & cached {len(businesses)} businesses")
+def encode_cursor(snap_id, offset):
+    return base64.urlsafe_b64encode(f"{snap_id}:{offset}".encode()).decode().rstrip('=')
 
-        except Exception as e:
-            log.error(f"Search error: {e}")
-            return jsonify({
+
+def decode_cursor(token):
+    try:
+        snap_id, offset = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().rsplit(':', 1)
+        return snap_id, max(0, int(offset))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def save_snapshot(snap):
+    snap_id = secrets.token_urlsafe(12)
+    _cursors.set(snap_id, snap)
+    return snap_id
+
+
+async def search_cursor_async(token, per_page, base_url=''):
+    """Next page of a snapshot cursor. Returns (payload, status)."""
+    decoded = decode_cursor(token)
+    snap = _cursors.get(decoded[0]) if decoded else None
+    if snap is None:
+        return {'error': 'Cursor expired or invalid; start the search again'}, 410
+    snap_id, offset = decoded
+    need = offset + per_page
+    pending = False
+    hit = lookup_cached(snap['key'])
+    if hit is not None:
+        entry = hit[0]
+        if len(snap['ids']) < need and entry.get('pending'):
+            frozen = set(snap['ids'])
+
+            def unseen(e):
+                ranked = relocate(snap['key'], e, snap['lat'], snap['lng'], snap['radius'], snap['filters'], snap['sort'])
+                return [(pid, d) for pid, d in zip(ranked.ids(), ranked.distances()) if pid not in frozen] if ranked else []
+
+            entry = await deepen_search(snap['key'], entry, snap['q'], snap['category'],
+                                        lambda e: len(snap['ids']) + len(unseen(e)) >= need)
+            extra = unseen(entry)
+            if extra:
+                snap = dict(snap, ids=snap['ids'] + [pid for pid, _ in extra], dist=snap['dist'] + [d for _, d in extra])
+                _cursors.set(snap_id, snap)
+        pending = bool(entry.get('pending'))
+
+    items = []
+    for pid, d in zip(snap['ids'][offset:need], snap['dist'][offset:need]):
+        record = place_store.get(pid)
+        if record is not None:
+            items.append(record.to_business(d))
+    warm_images(b['image'] for b in items)
+    public_images(items, base_url)
+    total = len(snap['ids'])
+    has_more = total > need or pending
+    page = offset // per_page + 1
+    tp = max(1, math.ceil(total / per_page), page + 1 if has_more else 1)
+    return {
+        'businesses': items, 'total': total, 'page': page,
+        'perPage': per_page, 'totalPages': tp,
+        'center': {'lat': snap['lat'], 'lng': snap['lng']}, 'radius': snap['radius'],
+        'sort': snap['sort'], 'facets': snap['facets'],
+        'hasMore': has_more, 'cursor': encode_cursor(snap_id, need) if has_more else None,
+    }, 200
+
+
+@quota.tracked('/api/search')
+async def search_async(args, base_url=''):
+    """/api/search handler shared by the Flask route and the ASGI app. Returns (payload, status).
+    Proxied image URLs are rooted at base_url (the request's host).
+
+    Pages come from ?page= or, for a consistent walk through one result set,
+    from the ?cursor= returned with the previous page.
+    """
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    q = args.get('q', '', type=str).strip()
+    radius = min(args.get('radius', 5000, type=int), 50000)
+    category = args.get('category', '', type=str).strip()
+    page = max(1, args.get('page', 1, type=int))
+    per_page = max(1, min(args.get('per_page', 15, type=int), 50))
+    sort = args.get('sort', 'relevance', type=str)
+    filters = search_filters(args)
+    cursor = args.get('cursor', '', type=str)
+
+    if cursor:
+        return await search_cursor_async(cursor, per_page, base_url)
+    if lat is None or lng is None:
+        return {'error': 'lat and lng required'}, 400
+    if sort not in SORTS:
+        return {'error': f"sort must be one of {', '.join(SORTS)}"}, 400
+
+    log.info(f"Search: q={q!r} cat={category!r} r={radius} p={page} sort={sort}")
+
+    # Only fetch as many upstream pages as it takes to fill the requested page of the
+    # unfiltered set: filters are answered from what is materialised, never by paging on
+    def enough(key):
+        return lambda e: len(relocate(key, e, lat, lng, radius) or ()) >= page * per_page
+
+    ck = cache_key(lat, lng, radius, q, category)
+    hit_key, hit = find_cached(ck, lat, lng, radius, q, category)
+    ranked, stale = None, False
+    try:
+        if hit is not None:
+            cached, stale = hit
+            ranked = relocate(hit_key, cached, lat, lng, radius, filters, sort)
+            if ranked is None:
+                log.info(f"Cache entry {hit_key!r} no longer resolvable, refetching")
+            else:
+                log.info(f"Cache hit: {len(ranked)} businesses{' (stale)' if stale else ''}")
+                if stale:
+                    refresh_search(hit_key, cached, q, category)
+        if ranked is None:
+            # Concurrent misses for the same key share one upstream fetch
+            hit_key, stale = ck, False
+            cached = await _search_flight.do_async(
+                ck, lambda: load_search(ck, lat, lng, radius, q, category, enough=enough(ck)))
+        cached = await deepen_search(hit_key, cached, q, category, enough(hit_key))
+        ranked = relocate(hit_key, cached, lat, lng, radius, filters, sort)
+    except Exception as e:
+        log.error(f"Search error: {e}")
+        good = last_good_search(hit_key, ck)
+        ranked = relocate(*good, lat, lng, radius, filters, sort, last_good=True) if good else None
+        if ranked is None:
+            failed = {
                 'error': 'Search failed. Please try again.',
                 'businesses': [], 'total': 0, 'page': 1,
                 'totalPages': 1, 'perPage': per_page,
                 'center': {'lat': lat, 'lng': lng}, 'radius': radius,
-            })
-
-    # Pagination
-    total = len(businesses)
+            }
+            if isinstance(e, (quota.QuotaExceeded, CircuitOpen)):
+                payload, status = upstream_error(e)
+                return dict(failed, **payload), status
+            return failed, 200
+        hit_key, cached = good
+        stale = True
+
+    # Pagination: only the returned page is materialised as dicts
+    total = len(ranked) if ranked is not None else 0
     tp = max(1, math.ceil(total / per_page))
     page = max(1, min(page, tp))
-    items = businesses[(page - 1) * per_page: page * per_page]
+    items = ranked.page((page - 1) * per_page, page * per_page) if ranked else []
+    warm_images(b['image'] for b in items)
+    public_images(items, base_url)
+    if page == 1 and total:
+        record_search(q, category)
+    facets = getattr(ranked, 'facets', None) or {}
+    has_more = total > page * per_page or bool(cached.get('pending'))
+    next_cursor = None
+    if has_more:
+        snap_id = save_snapshot({
+            'key': hit_key, 'q': q, 'category': category,
+            'lat': lat, 'lng': lng, 'radius': radius, 'filters': filters, 'sort': sort,
+            'ids': ranked.ids() if ranked else [], 'dist': ranked.distances() if ranked else [], 'facets': facets,
+        })
+        next_cursor = encode_cursor(snap_id, page * per_page)
 
-    log.info(f"Returning {len(items)} of {total}, page {page}/{tp}")
-    return jsonify({
+    if has_more:
+        # Lower bound while upstream pages are still pending; keeps the next page reachable
+        tp = max(tp, page + 1)
+
+    log.info(f"Returning {len(items)} of {total}{'+' if has_more else ''}, page {page}/{tp}")
+    return {
         'businesses': items, 'total': total, 'page': page,
         'perPage': per_page, 'totalPages': tp,
-        'center': {'lat': lat, 'lng': lng}, 'radius': radius
-    })
+        'center': {'lat': lat, 'lng': lng}, 'radius': radius,
+        'sort': sort, 'facets': facets, 'stale': stale,
+        'hasMore': has_more, 'cursor': next_cursor,
+    }, 200
+
+
+@app.route('/api/search', methods=['GET'])
+def search_businesses():
+    payload, status = aio.run(search_async(request.args, request.host_url))
+    return respond(payload, status)
+
+
+# ─── Streaming search ──────────────────────────────────────────
+# /api/search/stream emits businesses as each upstream page (of any stream)
+# lands instead of after all of them: NDJSON by default, SSE with
+# ?format=sse or Accept: text/event-stream. Frames:
+#   {"type": "businesses", "businesses": [...]}   parsed, deduped, chain-filtered
+#   {"type": "done", "total", "ids", "facets", ...}   ids = final ranked order
+#   {"type": "error", "error": "..."}
+# The completed set is cached exactly like /api/search (same single-flight slot).
+
+def matches_filters(biz, filters):
+    """search_filters() applied to one business dict (the streamed, pre-ResultSet path)."""
+    if filters['minRating'] is not None and (biz['rating'] or 0) < filters['minRating']:
+        return False
+    if filters['price'] and biz['priceLevel'] not in filters['price']:
+        return False
+    if filters['subcategory'] and biz['subcategory'] not in filters['subcategory']:
+        return False
+    return all(f in biz['features'] for f in filters['features'])
+
+
+def stream_format(args, accept=''):
+    fmt = args.get('format', '', type=str)
+    if fmt in ('sse', 'ndjson'):
+        return fmt
+    return 'sse' if 'text/event-stream' in (accept or '') else 'ndjson'
+
+
+def encode_frame(frame, fmt):
+    data = json.dumps(frame)
+    if fmt == 'sse':
+        return f"event: {frame['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+STREAM_CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+
+async def search_stream(args, base_url=''):
+    """Async generator of /api/search/stream frames."""
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    q = args.get('q', '', type=str).strip()
+    radius = min(args.get('radius', 5000, type=int), 50000)
+    category = args.get('category', '', type=str).strip()
+    sort = args.get('sort', 'relevance', type=str)
+    filters = search_filters(args)
+
+    if lat is None or lng is None:
+        yield {'type': 'error', 'error': 'lat and lng required'}
+        return
+    if sort not in SORTS:
+        yield {'type': 'error', 'error': f"sort must be one of {', '.join(SORTS)}"}
+        return
+
+    log.info(f"Stream search: q={q!r} cat={category!r} r={radius} sort={sort}")
+    ck = cache_key(lat, lng, radius, q, category)
+    hit_key, hit = find_cached(ck, lat, lng, radius, q, category)
+    ranked, stale, emitted = None, False, set()
+    if hit is not None:
+        cached, stale = hit
+        ranked = relocate(hit_key, cached, lat, lng, radius, filters, sort)
+        if ranked is not None and stale:
+            refresh_search(hit_key, cached, q, category)
+    from_cache = ranked is not None
+
+    frames = asyncio.Queue()
+    seen_ids, seen_names = set(), set()
+
+    def on_page(places):
+        fresh = []
+        for p in places:
+            biz = parse_google_place(p, lat, lng)
+            if not biz or not biz['id'] or biz['id'] in seen_ids:
+                continue
+            seen_ids.add(biz['id'])
+            nk = biz['name'].lower().strip()
+            if nk in seen_names or is_large_chain(biz['name']):
+                continue
+            seen_names.add(nk)
+            if biz['distanceMeters'] <= radius and matches_filters(biz, filters):
+                fresh.append(biz)
+        if fresh:
+            frames.put_nowait(fresh)
+
+    def complete(e):
+        return False
+
+    async def load():
+        # As single-flight leader this request's pages stream; as a follower it
+        # only gets the finished entry, emitted in one frame below
+        entry = await _search_flight.do_async(
+            ck, lambda: load_search(ck, lat, lng, radius, q, category, on_page))
+        return ck, await deepen_search(ck, entry, q, category, complete, on_page)
+
+    async def finish(entry):
+        return hit_key, await deepen_search(hit_key, entry, q, category, complete, on_page)
+
+    task = None
+    if ranked is None:
+        task = asyncio.ensure_future(load())
+    elif cached.get('pending'):
+        # Partly fetched entry: send what is cached now, stream the remaining pages
+        batch = ranked.page(0, len(ranked))
+        if batch:
+            emitted.update(b['id'] for b in batch)
+            yield {'type': 'businesses', 'businesses': public_images(batch, base_url)}
+        seen_ids.update(cached['ids'])
+        seen_names.update(r.name.lower().strip() for r in place_store.get_many(cached['ids']) or ())
+        task = asyncio.ensure_future(finish(cached))
+
+    if task is not None:
+        while not task.done() or not frames.empty():
+            if frames.empty():
+                waiter = asyncio.ensure_future(frames.get())
+                await asyncio.wait({waiter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if not waiter.done():
+                    waiter.cancel()
+                    continue
+                batch = waiter.result()
+            else:
+                batch = frames.get_nowait()
+            emitted.update(b['id'] for b in batch)
+            yield {'type': 'businesses', 'businesses': public_images(batch, base_url)}
+        try:
+            key, entry = task.result()
+            ranked = relocate(key, entry, lat, lng, radius, filters, sort) or []
+        except Exception as e:
+            log.error(f"Stream search error: {e}")
+            good = last_good_search(hit_key, ck)
+            ranked = relocate(*good, lat, lng, radius, filters, sort, last_good=True) if good else None
+            if ranked is None:
+                frame = {'type': 'error', 'error': 'Search failed. Please try again.'}
+                if isinstance(e, (quota.QuotaExceeded, CircuitOpen)):
+                    frame['retryAfter'] = upstream_error(e)[0]['retryAfter']
+                yield frame
+                return
+            from_cache = stale = True
+
+    # Whatever the final set holds that wasn't streamed (cache hits, followers)
+    rest = [b for b in (ranked.page(0, len(ranked)) if ranked else []) if b['id'] not in emitted]
+    if rest:
+        yield {'type': 'businesses', 'businesses': public_images(rest, base_url)}
+    ids = ranked.ids() if ranked else []
+    yield {
+        'type': 'done', 'total': len(ids), 'ids': ids,
+        'facets': getattr(ranked, 'facets', None) or {}, 'sort': sort,
+        'cached': from_cache, 'stale': stale,
+        'center': {'lat': lat, 'lng': lng}, 'radius': radius,
+    }
+
+
+@app.route('/api/search/stream', methods=['GET'])
+def search_businesses_stream():
+    fmt = stream_format(request.args, request.headers.get('Accept', ''))
+    frames = (encode_frame(frame, fmt) for frame in aio.iterate(search_stream(request.args, request.host_url)))
+    return Response(frames, mimetype=STREAM_CONTENT_TYPES[fmt], headers={'Cache-Control': 'no-cache'})
+
+
+# ─── Place detail ──────────────────────────────────────────────
+# Detail views resolve against the place store (L1, then the persistent
+# tier); only ids it doesn't know are fetched from Google, concurrently.
+PLACES_BATCH_MAX = int(os.environ.get('PLACES_BATCH_MAX', 50))
+_place_flight = SingleFlight('place')
+
+def _normalize_place_id(place_id):
+    pid = (place_id or '').strip()
+    return pid.replace("places/", "", 1) if pid.startswith("places/") else pid
+
+
+async def fetch_place(place_id):
+    """One place from Google, parsed and stored; None if unknown or closed. Upstream errors
+    (transport, QuotaExceeded, CircuitOpen) are raised."""
+    raw = await google_get_place(place_id)
+    biz = parse_google_place(raw) if raw else None
+    if not biz or not biz['id']:
+        return None
+    return place_store.put_many([biz])[0]
+
+
+async def resolve_places(place_ids):
+    """Place id → PlaceRecord (or None if not found), store first; misses fetched concurrently.
+    Returns (found, failed): failed maps ids whose fetch errored upstream to the error."""
+    found = {pid: place_store.get(pid) for pid in place_ids}
+    misses = [pid for pid, r in found.items() if r is None]
+    failed = {}
+
+    async def fetch(pid):
+        try:
+            return await _place_flight.do_async(pid, lambda: fetch_place(pid))
+        except Exception as e:
+            log.error(f"Place {pid!r} fetch failed: {e}")
+            failed[pid] = e
+            return None
+
+    if misses:
+        log.info(f"Place store miss: fetching {len(misses)} of {len(found)}")
+        fetched = await fan_out([lambda pid=pid: fetch(pid) for pid in misses])
+        found.update(zip(misses, fetched))
+    return found, failed
+
+
+def place_payload(record, lat=None, lng=None, base_url=''):
+    """Business dict for a detail view; distanceMeters only when a centre is given."""
+    if lat is None or lng is None:
+        biz = record.to_business(0)
+        biz['distanceMeters'] = None
+    else:
+        biz = record.to_business(distance_m(lat, lng, record.lat, record.lng))
+    return public_images([biz], base_url)[0]
+
+
+@quota.tracked('/api/place')
+async def place_async(place_id, args, base_url=''):
+    """/api/place/<id> handler. Returns (payload, status)."""
+    pid = _normalize_place_id(place_id)
+    if not pid:
+        return {'error': 'place id required'}, 400
+    found, failed = await resolve_places([pid])
+    if pid in failed:
+        return upstream_error(failed[pid])
+    if found[pid] is None:
+        return {'error': 'Place not found'}, 404
+    record = found[pid]
+    return {'business': place_payload(record, args.get('lat', type=float), args.get('lng', type=float), base_url)}, 200
+
+
+@quota.tracked('/api/places')
+async def places_async(args, base_url=''):
+    """/api/places?ids=a,b,c handler. Returns (payload, status); order follows `ids`."""
+    ids = list(dict.fromkeys(
+        pid for pid in (_normalize_place_id(p) for p in args.get('ids', '', type=str).split(',')) if pid))
+    if not ids:
+        return {'error': 'ids required'}, 400
+    if len(ids) > PLACES_BATCH_MAX:
+        return {'error': f'at most {PLACES_BATCH_MAX} ids per request'}, 400
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    found, failed = await resolve_places(ids)
+    if failed and len(failed) == len(ids):
+        return upstream_error(next(iter(failed.values())))
+    return {
+        'businesses': [place_payload(found[pid], lat, lng, base_url) for pid in ids if found[pid] is not None],
+        'missing': [pid for pid in ids if found[pid] is None and pid not in failed],
+        'unavailable': [pid for pid in ids if pid in failed],
+    }, 200
+
+
+@app.route('/api/place/<path:place_id>', methods=['GET'])
+def place_detail(place_id):
+    payload, status = aio.run(place_async(place_id, request.args, request.host_url))
+    return respond(payload, status)
+
+
+@app.route('/api/places', methods=['GET'])
+def places_batch():
+    payload, status = aio.run(places_async(request.args, request.host_url))
+    return respond(payload, status)
+
+
+# ─── Search suggestions ────────────────────────────────────────
+# Categories, subcategories, business names seen in results and queries
+# users run repeatedly, completed by prefix and ranked by decayed search
+# frequency (see suggest.py). The popular categories carry a small prior so an empty box
+# shows them until real traffic outranks them.
+POPULAR_CATEGORIES = [
+    'Restaurants', 'Coffee & Cafes', 'Takeout', 'Plumbers', 'Auto Repair', 'Dentists',
+    'Hair Salons', 'Gyms', 'Hotels', 'Pizza', 'Contractors', 'Delivery',
+]
+SUGGEST_LIMIT = 7
+
+_completions = CompletionIndex()
+_completions.add(sorted({c for pair in GTYPE_MAP.values() for c in pair} | set(SUBCAT_TO_GTYPE)), 'category', pinned=True)
+for i, label in enumerate(POPULAR_CATEGORIES):
+    _completions.add([label], 'category', pinned=True, prior=(len(POPULAR_CATEGORIES) - i) / 100)
+
+
+def record_search(q, category):
+    """Count a first-page search towards suggestion ranking (a new query is held back until
+    it has been searched SUGGEST_MIN_QUERY_COUNT times)."""
+    for label in {q, category} - {''}:
+        _completions.record(label)
 
 
 @app.route('/api/suggest', methods=['GET'])
 def suggest():
     q = request.args.get('q', '').strip().lower()
-    pops = [
-        {'label': 'Restaurants', 'type': 'category'},
-        {'label': 'Coffee & Cafes', 'type': 'category'},
-        {'label': 'Takeout', 'type': 'category'},
-        {'label': 'Plumbers', 'type': 'category'},
-        {'label': 'Auto Repair', 'type': 'category'},
-        {'label': 'Dentists', 'type': 'category'},
-        {'label': 'Hair Salons', 'type': 'category'},
-        {'label': 'Gyms', 'type': 'category'},
-        {'label': 'Hotels', 'type': 'category'},
-        {'label': 'Pizza', 'type': 'category'},
-        {'label': 'Contractors', 'type': 'category'},
-        {'label': 'Delivery', 'type': 'category'},
-    ]
     if not q:
-        return jsonify({'suggestions': pops[:7]})
-
-    ms = [p for p in pops if q in p['label'].lower()]
-    seen = {m['label'] for m in ms}
+        return jsonify({'suggestions': [{'label': label, 'type': kind}
+                                        for label, kind in _completions.complete('', SUGGEST_LIMIT)]})
 
-    # Search through all subcategories
-    for sub in SUBCAT_TO_GTYPE:
-        if q in sub.lower() and sub not in seen:
-            ms.append({'label': sub, 'type': 'category'})
-            seen.add(sub)
-
-    if len(q) >= 2:
+    ms = [{'label': label, 'type': kind} for label, kind in _completions.complete(q, SUGGEST_LIMIT - 1)]
+    if len(q) >= 2 and not any(m['label'].lower() == q for m in ms):
         ms.append({'label': f'Search for "{q}"', 'type': 'name_search', 'query': q})
 
-    return jsonify({'suggestions': ms[:7]})
+    return jsonify({'suggestions': ms})
+
+
+# ─── Geocoding cache ───────────────────────────────────────────
+# Normalised query → up to GEOCODE_RESULTS results ({lat, lng, displayName});
+# [] for ZERO_RESULTS. Geocodes live in their own small LRU, so per-keystroke
+# lookups can't evict search results, and write through to the shared
+# persistent tier. Location suggestions seed their own labels, so searching a
+# picked suggestion doesn't geocode it again. Upstream errors aren't cached.
+GEOCODE_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+GEOCODE_CACHE_TTL         = int(os.environ.get('GEOCODE_CACHE_TTL', 7 * 24 * 3600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.environ.get('GEOCODE_CACHE_MAX_ENTRIES', 20000))
+GEOCODE_RESULTS = 5
+_geocode_store = Cache(max_entries=GEOCODE_CACHE_MAX_ENTRIES, max_bytes=16 * 1024 * 1024, shards=4, l2=cache.l2)
+_geocodes = _geocode_store.namespace('geocode', ttl=GEOCODE_CACHE_TTL, persist=True)
+_geocode_flight = SingleFlight('geocode')
+
+def geocode_key(q):
+    """'  Salt Lake City,UT ' and 'salt lake city, ut' share one entry."""
+    return ', '.join(' '.join(part.split()) for part in q.lower().split(',') if part.strip())
+
+
+def _fetch_geocode(q, timeout=10):
+    r = upstream.get(GEOCODE_URL, params={'address': q, 'key': GOOGLE_API_KEY}, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+        raise RuntimeError(f"Geocoding status {data.get('status')}: {data.get('error_message', '')}")
+    return [{
+        'lat': res['geometry']['location']['lat'],
+        'lng': res['geometry']['location']['lng'],
+        'displayName': res.get('formatted_address', ''),
+    } for res in data.get('results', [])[:GEOCODE_RESULTS]]
+
+
+def geocode_lookup(q, timeout=10):
+    """Geocode results for a query (possibly []), cached; concurrent misses share one call."""
+    key = geocode_key(q)
+    results = _geocodes.get(key)
+    if results is not None:
+        return results
+
+    def load():
+        fetched = _fetch_geocode(q, timeout)
+        _geocodes.set(key, fetched)
+        return fetched
+
+    return _geocode_flight.do(key, load)
+
+
+def seed_geocode(label, result):
+    """Remember a suggestion's coordinates under its label unless that query is cached already."""
+    key = geocode_key(label)
+    if key and _geocodes.get(key) is None:
+        _geocodes.set(key, [result])
+
+
+DEFAULT_LOCATIONS = [
+    ('South Jordan, UT', 'recent'),
+    ('Salt Lake City, UT', 'city'),
+    ('West Valley City, UT', 'city'),
+    ('Sandy, UT', 'city'),
+    ('Murray, UT', 'city'),
+    ('Midvale, UT', 'city'),
+]
+
+def gazetteer_location(place, type_='city'):
+    return {'label': place['label'], 'type': type_, 'lat': place['lat'], 'lng': place['lng']}
+
+
+def current_location(args):
+    """'Current Location' entry, named after the nearest gazetteer place when ?lat=&lng= are given."""
+    entry = {'label': 'Current Location', 'type': 'current'}
+    lat, lng = args.get('lat', type=float), args.get('lng', type=float)
+    if lat is not None and lng is not None:
+        near = gazetteer.get().nearest(lat, lng)
+        if near is not None:
+            entry['near'] = near['label']
+    return entry
 
 
 @app.route('/api/locations', methods=['GET'])
+@quota.tracked('/api/locations')
 def location_suggestions():
     q = request.args.get('q', '').strip()
-    defs = [
-        {'label': 'Current Location', 'type': 'current'},
-        {'label': 'South Jordan, UT', 'type': 'recent'},
-        {'label': 'Salt Lake City, UT', 'type': 'city'},
-        {'label': 'West Valley City, UT', 'type': 'city'},
-        {'label': 'Sandy, UT', 'type': 'city'},
-        {'label': 'Murray, UT', 'type': 'city'},
-        {'label': 'Midvale, UT', 'type': 'city'},
-    ]
+    gaz = gazetteer.get()
     if not q:
+        defs = [current_location(request.args)]
+        for label, type_ in DEFAULT_LOCATIONS:
+            place = gaz.lookup(label)
+            defs.append(gazetteer_location(place, type_) if place else {'label': label, 'type': type_})
         return jsonify({'locations': defs})
 
-    # Use Google Geocoding for location autocomplete
+    # City / town names resolve in-process. Unless the whole query names a gazetteer
+    # place, Google Geocoding results are merged in after them: a prefix or later-word
+    # match ("park" → Park City) may not be the place meant, and addresses and
+    # landmarks aren't in the gazetteer at all
+    places = [] if any(c.isdigit() for c in q) else gaz.suggest(q, limit=6)
+    locs = [current_location(request.args)] + [gazetteer_location(p) for p in places]
+    if places and gaz.lookup(q) is not None:
+        return jsonify({'locations': locs})
+    if places and quota.low('geocode'):
+        log.info(f"Geocoding quota low, serving gazetteer suggestions only for {q!r}")
+        return jsonify({'locations': locs})
     try:
-        r = req.get('https://maps.googleapis.com/maps/api/geocode/json',
-                     params={'address': q, 'key': GOOGLE_API_KEY}, timeout=8)
-        r.raise_for_status()
-        data = r.json()
-    except:
-        return jsonify({'locations': defs})
-
-    locs = [{'label': 'Current Location', 'type': 'current'}]
-    for res in data.get('results', [])[:5]:
-        loc = res.get('geometry', {}).get('location', {})
-        addr = res.get('formatted_address', '')
+        results = geocode_lookup(q, timeout=8)
+    except Exception:
+        return jsonify({'locations': locs})
+
+    locs = locs[:5]  # leave Google at least two of the seven slots
+    seen = {geocode_key(loc['label']) for loc in locs}
+    for res in results:
+        addr = res['displayName']
         short = ', '.join(addr.split(', ')[:2]) if addr else ''
+        label = short or addr[:50]
+        seed_geocode(label, res)
+        if geocode_key(label) in seen:
+            continue
+        seen.add(geocode_key(label))
         locs.append({
-            'label': short or addr[:50],
+            'label': label,
             'type': 'result',
-            'lat': loc.get('lat'),
-            'lng': loc.get('lng')
+            'lat': res['lat'],
+            'lng': res['lng']
         })
 
     return jsonify({'locations': locs[:7]})
 
 
 @app.route('/api/geocode', methods=['GET'])
+@quota.tracked('/api/geocode')
 def geocode():
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify({'error': 'q required'}), 400
+    place = gazetteer.get().lookup(q)
+    if place is not None:
+        return jsonify({'lat': place['lat'], 'lng': place['lng'], 'displayName': place['label']})
     try:
-        r = req.get('https://maps.googleapis.com/maps/api/geocode/json',
-                     params={'address': q, 'key': GOOGLE_API_KEY}, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        if data['status'] != 'OK' or not data['results']:
-            return jsonify({'error': f'Could not find "{q}"'}), 404
-        loc = data['results'][0]['geometry']['location']
-        return jsonify({
-            'lat': loc['lat'],
-            'lng': loc['lng'],
-            'displayName': data['results'][0].get('formatted_address', q)
-        })
+        results = geocode_lookup(q)
     except Exception as e:
         return jsonify({'error': f'Geocoding failed: {str(e)}'}), 502
+    if not results:
+        return jsonify({'error': f'Could not find "{q}"'}), 404
+    return jsonify({
+        'lat': results[0]['lat'],
+        'lng': results[0]['lng'],
+        'displayName': results[0]['displayName'] or q
+    })
+
+
+@app.route('/api/locations/reverse', methods=['GET'])
+def reverse_location():
+    """Nearest gazetteer place to ?lat=&lng= (404 if none within GAZETTEER_REVERSE_MAX_KM)."""
+    lat, lng = request.args.get('lat', type=float), request.args.get('lng', type=float)
+    if lat is None or lng is None:
+        return jsonify({'error': 'lat and lng required'}), 400
+    place = gazetteer.get().nearest(lat, lng)
+    if place is None:
+        return jsonify({'error': 'No known place nearby'}), 404
+    return jsonify(place)
 
 
 # ─── DiscountAPI: map category to our dashboard categories ─────
@@ -864,8 +1626,48 @@ def _map_deal_category(category_name, category_slug):
     ) or 'Activities'
 
 
-def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=None, page=1, per_page=20):
-    """Call DiscountAPI v2/deals and return normalized deals for the frontend."""
+# ─── Deals cache ───────────────────────────────────────────────
+# Raw DiscountAPI pages are cached per (snapped location, radius, category
+# slugs, query, page, per_page) and normalised per response, so merchant
+# photos resolved since the page was fetched still show up. Concurrent
+# misses share one upstream call; serving page N prefetches page N+1.
+DEALS_CACHE_TTL       = int(os.environ.get('DEALS_CACHE_TTL', 900))
+DEALS_CACHE_STALE_TTL = int(os.environ.get('DEALS_CACHE_STALE_TTL', 6 * 3600))
+_deals_cache = cache.namespace('deals', ttl=DEALS_CACHE_TTL, persist=True, stale_ttl=DEALS_CACHE_STALE_TTL)
+_deals_flight = SingleFlight('deals')
+_deals_refresh = Refresher('deals')
+
+def deals_location(location, radius):
+    """Canonical location: "lat,lng" snapped to a radius-scaled grid, else the place text lower-cased."""
+    try:
+        lat, lng = (float(v) for v in location.split(','))
+    except ValueError:
+        return ' '.join(location.lower().split())
+    step = grid_step(radius * 1609.344)
+    return f"{snap(lat, step)},{snap(lng, step)}"
+
+
+def deals_cache_key(location, radius, category_slugs, query, page, per_page):
+    return f"{location}|{radius}|{category_slugs or ''}|{(query or '').lower()}|{page}|{per_page}"
+
+
+async def load_deals(key, location, radius, category_slugs, query, page, per_page):
+    """Fetch one raw deals page; successful pages are cached. Returns (raw_deals, err)."""
+    raw_deals, err = await fetch_discount_api_deals(location, radius, category_slugs, query, page, per_page)
+    if err is None:
+        _deals_cache.set(key, raw_deals)
+    return raw_deals, err
+
+
+def refresh_deals(key, *params):
+    """Load a deals page in the background (stale refresh or next-page prefetch), sharing the single-flight slot."""
+    if quota.low('discountapi'):
+        return False
+    return _deals_refresh.submit(key, lambda: aio.run(_deals_flight.do_async(key, lambda: load_deals(key, *params))))
+
+
+async def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=None, page=1, per_page=20):
+    """Call DiscountAPI v2/deals. Returns (raw deals, err); see normalize_deals()."""
     if not DISCOUNT_API_KEY or DISCOUNT_API_KEY == 'your_discount_api_key_here':
         return [], 'no_api_key'
     url = 'https://api.discountapi.com/v2/deals'
@@ -882,7 +1684,7 @@ def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=Non
     if query:
         params['query'] = query
     try:
-        r = req.get(url, params=params, timeout=12)
+        r = await upstream.aget(url, params=params, timeout=12)
         if r.status_code == 401:
             return [], 'invalid_key'
         r.raise_for_status()
@@ -890,10 +1692,13 @@ def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=Non
     except Exception as e:
         log.error(f"DiscountAPI error: {e}")
         return [], 'api_error'
-    raw_deals = data.get('deals') or []
+    return data.get('deals') or [], None
+
+
+def normalize_deals(raw_deals):
+    """DiscountAPI deals → frontend deal dicts."""
     out = []
     place_photo_enrich_count = 0
-    max_place_photo_enrich = 5
     for i, item in enumerate(raw_deals):
         d = item.get('deal') or item
         merchant = d.get('merchant') or {}
@@ -915,14 +1720,16 @@ def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=Non
             image_url = f"https://api.discountapi.com/v2/deals/{d.get('id')}/image?geometry=480x320C"
         if image_url and 'discountapi.com' in image_url and 'geometry=' not in image_url:
             image_url = image_url + ('&' if '?' in image_url else '?') + 'geometry=480x320C'
-        if not image_url and place_photo_enrich_count < max_place_photo_enrich:
-            m_lat = merchant.get('latitude')
-            m_lng = merchant.get('longitude')
-            if m_lat is not None and m_lng is not None:
-                place_photo = get_place_photo_for_merchant(merchant.get('name'), m_lat, m_lng)
-                if place_photo:
-                    image_url = place_photo
-                    place_photo_enrich_count += 1
+        # Google photo for the merchant if already resolved; otherwise queue a background
+        # lookup (optional: skipped while Text Search quota is running low)
+        m_name, m_lat, m_lng = merchant.get('name'), merchant.get('latitude'), merchant.get('longitude')
+        if not image_url and GOOGLE_API_KEY and m_name and m_lat is not None and m_lng is not None:
+            known, place_photo = merchant_photo(m_name, m_lat, m_lng)
+            if place_photo:
+                image_url = place_photo
+            elif (not known and place_photo_enrich_count < DEAL_PHOTO_ENRICH_MAX
+                  and not quota.low('places_text') and enrich_merchant_photo(m_name, m_lat, m_lng)):
+                place_photo_enrich_count += 1
         if not image_url:
             image_url = FALLBACK_IMAGE
         out.append({
@@ -944,24 +1751,24 @@ def fetch_discount_api_deals(location, radius=15, category_slugs=None, query=Non
             'popular': (d.get('number_sold') or 0) > 10,
             'url': d.get('url'),
         })
-    return out, None
+    return out
 
 
-@app.route('/api/deals', methods=['GET'])
-def deals():
-    """Proxy to DiscountAPI for local deals. Keeps API key server-side."""
-    location = request.args.get('location', '').strip()
-    lat = request.args.get('lat', type=float)
-    lng = request.args.get('lng', type=float)
+@quota.tracked('/api/deals')
+async def deals_async(args, base_url):
+    """/api/deals handler shared by the Flask route and the ASGI app. Returns (payload, status)."""
+    location = args.get('location', '').strip()
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
     if not location and (lat is not None and lng is not None):
         location = f"{lat},{lng}"
     if not location:
         location = "40.5622,-111.9297"
-    radius = request.args.get('radius', 15)
-    category = request.args.get('category', '').strip()
-    query = request.args.get('q', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 20, type=int), 20)
+    radius = args.get('radius', 15)
+    category = args.get('category', '').strip()
+    query = args.get('q', '').strip()
+    page = args.get('page', 1, type=int)
+    per_page = min(args.get('per_page', 20, type=int), 20)
     category_slugs = None
     if category:
         category_slugs = OUR_CATEGORY_TO_API_SLUGS.get(category)
@@ -970,42 +1777,148 @@ def deals():
             category_slugs = [slug] if slug else None
         if category_slugs:
             category_slugs = ','.join(category_slugs)
-    deals_list, err = fetch_discount_api_deals(
-        location=location, radius=radius, category_slugs=category_slugs,
-        query=query or None, page=page, per_page=per_page
-    )
+    try:
+        radius = max(1, min(int(radius), 25))
+    except (TypeError, ValueError):
+        radius = 15
+    page = max(1, page)
+    location = deals_location(location, radius)
+    params = (location, radius, category_slugs, query or None)
+    key = deals_cache_key(*params, page, per_page)
+    hit = _deals_cache.lookup(key)
+    if hit is not None:
+        raw_deals, stale = hit
+        err = None
+        log.info(f"Deals cache hit: {len(raw_deals)} deals{' (stale)' if stale else ''}")
+        if stale:
+            refresh_deals(key, *params, page, per_page)
+    else:
+        # Concurrent misses (a burst of users in one area) share one DiscountAPI call
+        raw_deals, err = await _deals_flight.do_async(
+            key, lambda: load_deals(key, *params, page, per_page))
+        if err == 'api_error':
+            good = _deals_cache.last_good(key)
+            if good is not None:
+                log.warning(f"Serving last good deals for {key!r}")
+                raw_deals, err = good[0], None
+    if err is None and len(raw_deals) >= per_page:
+        # A full page: the user is likely to flip to the next one
+        next_key = deals_cache_key(*params, page + 1, per_page)
+        if _deals_cache.lookup(next_key) is None:
+            refresh_deals(next_key, *params, page + 1, per_page)
+    deals_list = normalize_deals(raw_deals)
     if err == 'no_api_key':
-        return jsonify({
+        return {
             'deals': [], 'total': 0, 'page': page, 'perPage': per_page,
             'error': 'Deals API key not configured. Add DISCOUNT_API_KEY to backend/.env',
             'source': 'placeholder'
-        })
+        }, 200
     if err == 'invalid_key':
-        return jsonify({
+        return {
             'deals': [], 'total': 0, 'page': page, 'perPage': per_page,
             'error': 'Invalid deals API key.', 'source': 'api'
-        })
+        }, 200
     if err == 'api_error':
-        return jsonify({
+        return {
             'deals': [], 'total': 0, 'page': page, 'perPage': per_page,
             'error': 'Could not load deals. Try again later.', 'source': 'api'
-        })
+        }, 200
     # Replace DiscountAPI image URLs with our proxy so the browser can load them (their API requires auth)
-    base = request.host_url.rstrip('/')
     for deal in deals_list:
         img = deal.get('image') or ''
         if 'discountapi.com' in img:
             raw_id = deal.get('id', '')
             if isinstance(raw_id, str) and raw_id.startswith('api_'):
                 num_id = raw_id.replace('api_', '', 1)
-                deal['image'] = f'{base}/api/deals/{num_id}/image'
-    return jsonify({
+                deal['image'] = f'/api/deals/{num_id}/image'
+    warm_images(deal['image'] for deal in deals_list)
+    public_images(deals_list, base_url)
+    return {
         'deals': deals_list,
         'total': len(deals_list),
         'page': page,
         'perPage': per_page,
         'source': 'api'
-    })
+    }, 200
+
+
+@app.route('/api/deals', methods=['GET'])
+def deals():
+    """Proxy to DiscountAPI for local deals. Keeps API key server-side."""
+    payload, status = aio.run(deals_async(request.args, request.host_url))
+    return jsonify(payload), status
+
+
+# ─── Image proxy ───────────────────────────────────────────────
+# Deal images (DiscountAPI wants the key) and Google place photos (billable
+# per fetch, key in the URL) are served from here: disk-cached, streamed on
+# a miss, with long-lived Cache-Control and ETag / 304 for the browser.
+IMAGE_MAX_AGE = int(os.environ.get('IMAGE_MAX_AGE', 7 * 24 * 3600))
+PHOTO_MAX_PX = 1600
+
+def deal_image_source(deal_id, geometry='480x320C'):
+    """(cache key, upstream url, request kwargs) for a DiscountAPI deal image."""
+    url = f'https://api.discountapi.com/v2/deals/{deal_id}/image'
+    return f"deal:{deal_id}:{geometry}", url, {'params': {'api_key': DISCOUNT_API_KEY, 'geometry': geometry}}
+
+
+def photo_source(photo_ref, width=600, height=400):
+    """(cache key, upstream url, request kwargs) for a Google place photo."""
+    url = f"https://places.googleapis.com/v1/{photo_ref}/media"
+    params = {'maxWidthPx': width, 'maxHeightPx': height, 'key': GOOGLE_API_KEY}
+    return f"photo:{photo_ref}:{width}x{height}", url, {'params': params, 'follow_redirects': True}
+
+
+def _valid_photo_ref(ref):
+    parts = ref.split('/')
+    return len(parts) == 4 and parts[0] == 'places' and parts[2] == 'photos' and all(parts)
+
+
+def proxy_source(url):
+    """Source of an image URL handed out by this API (proxied photo or deal image), else None."""
+    parts = urlsplit(url or '')
+    path = parts.path
+    if path.startswith('/api/photo/') and _valid_photo_ref(path[len('/api/photo/'):]):
+        query = parse_qs(parts.query)
+        return photo_source(path[len('/api/photo/'):], _px(query.get('w', [''])[0], 600), _px(query.get('h', [''])[0], 400))
+    if path.startswith('/api/deals/') and path.endswith('/image') and DISCOUNT_API_KEY:
+        return deal_image_source(path.split('/')[3])
+    return None
+
+
+def _px(value, default):
+    try:
+        return max(1, min(int(value), PHOTO_MAX_PX))
+    except (TypeError, ValueError):
+        return default
+
+
+def warm_images(urls):
+    """Start fetching the images of the page being returned into the proxy cache."""
+    for url in urls:
+        src = proxy_source(url)
+        if src is not None:
+            key, upstream_url, kwargs = src
+            sku = quota.sku_for('GET', upstream_url)
+            if sku and quota.low(sku):
+                continue  # optional: the browser's own request fetches it if it still wants it
+            images.warm(key, upstream_url, **kwargs)
+
+
+def image_response(key, url, **kwargs):
+    headers = {'ETag': images.etag(key), 'Cache-Control': f'public, max-age={IMAGE_MAX_AGE}, immutable'}
+    if request.if_none_match.contains(headers['ETag'].strip('"')):
+        return Response(status=304, headers=headers)
+    try:
+        status, content_type, body = images.fetch(key, url, **kwargs)
+    except Exception as e:
+        log.debug(f"Image proxy error for {key!r}: {e}")
+        payload, status = upstream_error(e)
+        retry = {'Retry-After': str(payload['retryAfter'])} if 'retryAfter' in payload else {}
+        return Response('', status=status, headers=retry)
+    if status != 200:
+        return Response('', status=status)
+    return Response(body, mimetype=content_type, headers=headers)
 
 
 @app.route('/api/deals/<deal_id>/image')
@@ -1013,17 +1926,17 @@ def deal_image(deal_id):
     """Proxy deal image from DiscountAPI (API requires auth; browser cannot load their URL directly)."""
     if not DISCOUNT_API_KEY:
         return Response('', status=404)
-    url = f'https://api.discountapi.com/v2/deals/{deal_id}/image'
-    params = {'api_key': DISCOUNT_API_KEY, 'geometry': request.args.get('geometry', '480x320C')}
-    try:
-        r = req.get(url, params=params, timeout=10)
-        if r.status_code != 200:
-            return Response('', status=r.status_code)
-        ct = r.headers.get('Content-Type', 'image/jpeg')
-        return Response(r.content, mimetype=ct)
-    except Exception as e:
-        log.debug(f"Deal image proxy error: {e}")
-        return Response('', status=502)
+    key, url, kwargs = deal_image_source(deal_id, request.args.get('geometry', '480x320C'))
+    return image_response(key, url, **kwargs)
+
+
+@app.route('/api/photo/<path:photo_ref>')
+def place_photo(photo_ref):
+    """Proxy a Google place photo (places/<id>/photos/<ref>) sized by ?w= / ?h=."""
+    if not GOOGLE_API_KEY or not _valid_photo_ref(photo_ref):
+        return Response('', status=404)
+    key, url, kwargs = photo_source(photo_ref, _px(request.args.get('w'), 600), _px(request.args.get('h'), 400))
+    return image_response(key, url, **kwargs)
 
 
 @app.route('/api/health')
@@ -1032,6 +1945,68 @@ def health():
     return jsonify({'status': 'ok', 'google_api_key_set': has_key})
 
 
+# ─── Admin ─────────────────────────────────────────────────────
+# Set ADMIN_TOKEN to require "Authorization: Bearer <token>" on /api/admin/*. Without
+# one the admin routes fail closed: only direct loopback requests (no proxy in front,
+# no browser Origin from another site) get through.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+LOOPBACK_ADDRS = {'127.0.0.1', '::1'}
+
+
+def _cross_origin(req):
+    origin = req.headers.get('Origin')
+    return bool(origin) and urlsplit(origin).netloc != req.host
+
+
+@app.before_request
+def _check_admin_token():
+    if not request.path.startswith('/api/admin/') or request.method == 'OPTIONS':
+        return None
+    if ADMIN_TOKEN:
+        if request.headers.get('Authorization', '') != f'Bearer {ADMIN_TOKEN}':
+            return jsonify({'error': 'unauthorized'}), 401
+        return None
+    if (request.remote_addr not in LOOPBACK_ADDRS or 'X-Forwarded-For' in request.headers
+            or _cross_origin(request)):
+        return jsonify({'error': 'admin routes need ADMIN_TOKEN unless called from localhost'}), 403
+    return None
+
+
+@app.route('/api/admin/upstream')
+def upstream_stats():
+    """Connection-pool and request stats for every upstream host."""
+    return jsonify(upstream.stats())
+
+
+@app.route('/api/admin/quota')
+def quota_stats():
+    """Token buckets, degrade state and the upstream call / cost ledger."""
+    return jsonify(quota.stats())
+
+
+@app.route('/api/admin/cache')
+def cache_stats():
+    """Budget, occupancy and per-namespace counters for the shared cache."""
+    return jsonify(dict(cache.stats(), searchCoverage=_coverage.stats(), places=place_store.stats(),
+                        singleflight=singleflight.stats(), refresh=refresh.stats(),
+                        chainVerdicts=chains.stats(), images=images.stats(),
+                        geocode=_geocode_store.stats()['namespaces'].get('geocode'),
+                        suggest=_completions.stats()))
+
+
+@app.route('/api/admin/cache/<namespace>/invalidate', methods=['POST'])
+def cache_invalidate(namespace):
+    """Drop a namespace's entries (optionally only keys starting with ?prefix=)."""
+    prefix = request.args.get('prefix', '')
+    ns = None if namespace == '*' else namespace
+    dropped = cache.invalidate(ns, prefix)
+    if ns in (None, 'geocode'):
+        # geocodes keep their own L1 (see _geocode_store)
+        dropped += _geocode_store.invalidate(ns, prefix)
+    log.info(f"Cache invalidate: ns={namespace!r} prefix={prefix!r} dropped={dropped}")
+    return jsonify({'namespace': namespace, 'prefix': prefix, 'dropped': dropped})
+
+
 if __name__ == '__main__':
     log.info("Starting Spark API v6 (Google Places) on port 5001...")
     if not GOOGLE_API_KEY:
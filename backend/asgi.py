@@ -0,0 +1,214 @@
+"""
+backend/asgi.py — ASGI entry point for the async search pipeline
+
+    uvicorn asgi:app --port 5001
+
+GET /api/search, /api/deals, /api/digital/search, /api/places and
+/api/place/<id> are awaited directly on the server's event loop
+(search_async / deals_async / digital_search_async / places_async /
+place_async), so thousands of in-flight upstream requests share
+a few OS threads. GET /api/search/stream is sent frame by frame as
+search_stream yields. Every other path falls through to the Flask app,
+run in a worker thread; its body is passed on chunk by chunk (streamed
+image proxy responses stay streamed).
+"""
+import io, sys, json, asyncio, logging
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import MultiDict
+
+import upstream
+from app import (app as flask_app, search_async, deals_async, place_async, places_async,
+                 search_stream, stream_format, encode_frame, STREAM_CONTENT_TYPES)
+from digital_routes import digital_search_async
+
+log = logging.getLogger('spark.asgi')
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+def _base_url(scope):
+    headers = dict(scope.get('headers') or [])
+    host = headers.get(b'host', b'').decode('latin-1')
+    if not host and scope.get('server'):
+        host = '%s:%s' % tuple(scope['server'])
+    return f"{scope.get('scheme', 'http')}://{host}/"
+
+
+async def _search(scope, args):
+    return await search_async(args, _base_url(scope))
+
+async def _deals(scope, args):
+    return await deals_async(args, _base_url(scope))
+
+async def _digital_search(scope, args):
+    return await digital_search_async(args)
+
+async def _places(scope, args):
+    return await places_async(args, _base_url(scope))
+
+async def _place(scope, args):
+    return await place_async(scope['path'][len(PLACE_PREFIX):], args, _base_url(scope))
+
+ASYNC_ROUTES = {
+    '/api/search': _search,
+    '/api/deals': _deals,
+    '/api/digital/search': _digital_search,
+    '/api/places': _places,
+}
+# Async generators of frames, sent as NDJSON / SSE
+STREAM_ROUTES = {
+    '/api/search/stream': search_stream,
+}
+PLACE_PREFIX = '/api/place/'
+
+
+def _route(scope):
+    if scope['method'] != 'GET':
+        return None
+    path = scope['path']
+    if path.startswith(PLACE_PREFIX):
+        return _place
+    return ASYNC_ROUTES.get(path)
+
+
+async def _send_json(send, payload, status):
+    body = json.dumps(payload).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    if 'retryAfter' in payload:
+        headers.append((b'retry-after', str(payload['retryAfter']).encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers + CORS_HEADERS,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_stream(scope, send, stream, args):
+    headers = dict(scope.get('headers') or [])
+    fmt = stream_format(args, headers.get(b'accept', b'').decode('latin-1'))
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', STREAM_CONTENT_TYPES[fmt].encode()),
+                    (b'cache-control', b'no-cache')] + CORS_HEADERS,
+    })
+    frames = stream(args, _base_url(scope))
+    try:
+        async for frame in frames:
+            await send({'type': 'http.response.body', 'body': encode_frame(frame, fmt).encode(), 'more_body': True})
+    except Exception as e:
+        log.error(f"{scope['path']} failed: {e}")
+    finally:
+        await frames.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# ─── WSGI fallback (everything that is not an async route) ─────
+def _wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers') or []:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _call_wsgi(environ):
+    """Run the Flask app up to its first body chunk. Returns (status, headers, first chunk, iterator)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    result = flask_app(environ, start_response)
+    chunks = iter(result)
+    try:
+        first = next(chunks, None)
+    except BaseException:
+        _close_wsgi(result)
+        raise
+    return started['status'], started['headers'], first, result, chunks
+
+
+def _close_wsgi(result):
+    if hasattr(result, 'close'):
+        result.close()
+
+
+async def _wsgi_fallback(scope, receive, send):
+    """Flask responses are passed on chunk by chunk, so streamed bodies (image proxy) stay streamed."""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    status, headers, chunk, result, rest = await asyncio.to_thread(
+        _call_wsgi, _wsgi_environ(scope, b''.join(chunks)))
+    try:
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await asyncio.to_thread(next, rest, None)
+    finally:
+        await asyncio.to_thread(_close_wsgi, result)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# ─── ASGI app ──────────────────────────────────────────────────
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await upstream.aclose_all()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    stream = STREAM_ROUTES.get(scope['path']) if scope['method'] == 'GET' else None
+    handler = None if stream else _route(scope)
+    if stream is None and handler is None:
+        return await _wsgi_fallback(scope, receive, send)
+
+    args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    if stream is not None:
+        return await _send_stream(scope, send, stream, args)
+    try:
+        payload, status = await handler(scope, args)
+    except Exception as e:
+        log.error(f"{scope['path']} failed: {e}")
+        payload, status = {'error': 'Internal server error'}, 500
+    await _send_json(send, payload, status)
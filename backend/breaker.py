@@ -0,0 +1,82 @@
+"""
+backend/breaker.py — per-upstream circuit breakers
+
+Each upstream host gets a breaker that counts consecutive failed attempts
+(transport errors, 429 / 5xx, and calls slower than BREAKER_SLOW_MS). After
+BREAKER_FAILURES in a row it opens: calls fail immediately with CircuitOpen
+instead of each request waiting out the full timeouts. After
+BREAKER_COOLDOWN seconds one probe call is let through (half-open); its
+outcome closes the breaker or re-opens it for another cooldown. A probe
+that never reports back (cancelled, or rejected by the quota governor)
+stops blocking others after one more cooldown.
+"""
+import os, time, logging, threading
+
+log = logging.getLogger('spark.breaker')
+
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_SLOW_MS  = float(os.environ.get('BREAKER_SLOW_MS', 5000))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 30))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit open (retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name, failures=BREAKER_FAILURES, slow_ms=BREAKER_SLOW_MS, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = failures
+        self.slow_ms = slow_ms
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('successes', 'failures', 'slow', 'rejected', 'trips'), 0)
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            retry_in = self.opened_at + self.cooldown - now
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and (self._probe_at is None or now - self._probe_at > self.cooldown):
+                self._probe_at = now
+                return
+            self.counters['rejected'] += 1
+        raise CircuitOpen(self.name, max(0.0, retry_in))
+
+    def record(self, ok, ms):
+        """Outcome of an attempt that allow() let through."""
+        slow = ok and ms > self.slow_ms
+        with self._lock:
+            self._probe_at = None
+            if ok and not slow:
+                self.counters['successes'] += 1
+                self.failures = 0
+                if self.state != CLOSED:
+                    log.info(f"{self.name}: circuit closed")
+                self.state = CLOSED
+                return
+            self.counters['slow' if slow else 'failures'] += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.counters['trips'] += 1
+                log.warning(f"{self.name}: circuit open after {self.failures} failed/slow calls "
+                            f"(cooldown {self.cooldown:.0f}s)")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, state=self.state, consecutiveFailures=self.failures)
@@ -0,0 +1,371 @@
+"""
+backend/cache.py — shared in-memory LRU + TTL cache
+
+- One process-wide cache with an entry and byte budget (CACHE_MAX_ENTRIES /
+  CACHE_MAX_BYTES), split across CACHE_SHARDS independently locked shards
+- LRU eviction per shard once its share of the budget is exceeded
+- Namespaces ('search', 'digital', …) each carry their own TTL, plus an
+  optional longer stale_ttl: entries between the two are still returned by
+  lookup() but flagged stale so callers can serve them while refreshing
+- Per-namespace hit / stale / miss / expiry / eviction / byte counters
+- Optional SQLite second tier (CACHE_DB_PATH) for namespaces created with
+  persist=True: writes go through to disk, L1 misses fall back to it and
+  promote still-valid rows, so a restarted worker starts warm
+- last_good() reads a persisted row of any age (up to CACHE_L2_MAX_AGE),
+  the fallback served while an upstream's circuit breaker is open
+"""
+import os, json, time, sqlite3, logging, threading
+from collections import OrderedDict
+
+log = logging.getLogger('spark.cache')
+
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+CACHE_MAX_BYTES   = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_SHARDS      = int(os.environ.get('CACHE_SHARDS', 16))
+
+# Set CACHE_DB_PATH= (empty) to disable the on-disk tier
+CACHE_DB_PATH     = os.environ.get('CACHE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'spark_cache.sqlite3'))
+CACHE_L2_MAX_AGE  = int(os.environ.get('CACHE_L2_MAX_AGE', 7 * 24 * 3600))
+
+COUNTERS = ('hits', 'stale', 'misses', 'expired', 'evictions', 'sets')
+
+
+def approx_size(value):
+    """Rough byte cost of a cached value (its JSON encoding)."""
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return 256
+
+
+class _Entry:
+    __slots__ = ('value', 'ts', 'size')
+
+    def __init__(self, value, ts, size):
+        self.value = value
+        self.ts = ts
+        self.size = size
+
+
+class _Shard:
+    def __init__(self, max_entries, max_bytes):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()      # (ns, key) → _Entry, oldest first
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.counters = {}                # ns → {counter: n, 'entries': n, 'bytes': n}
+
+    def _count(self, ns, name, n=1):
+        c = self.counters.get(ns)
+        if c is None:
+            c = self.counters[ns] = dict.fromkeys(COUNTERS + ('entries', 'bytes'), 0)
+        c[name] += n
+
+    def _drop(self, k, entry):
+        del self.entries[k]
+        self.bytes -= entry.size
+        self._count(k[0], 'entries', -1)
+        self._count(k[0], 'bytes', -entry.size)
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            k, entry = next(iter(self.entries.items()))
+            self._drop(k, entry)
+            self._count(k[0], 'evictions')
+
+
+class PersistentTier:
+    """SQLite-backed L2: (namespace, key) → JSON value + timestamp."""
+
+    def __init__(self, path, max_age=CACHE_L2_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'misses', 'writes', 'errors'), 0)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._conn() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS entries (
+                ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, ts REAL NOT NULL,
+                PRIMARY KEY (ns, key))''')
+            db.execute('DELETE FROM entries WHERE ts < ?', (time.time() - max_age,))
+
+    def _conn(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, ns, key, ttl):
+        """Return (value, ts) if a row younger than `ttl` exists, else None."""
+        try:
+            row = self._conn().execute(
+                'SELECT value, ts FROM entries WHERE ns = ? AND key = ? AND ts > ?',
+                (ns, str(key), time.time() - ttl)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"L2 read failed: {e}")
+            self._count('errors')
+            return None
+        if row is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(row[0]), row[1]
+
+    def set(self, ns, key, value, ts, encoded=None):
+        try:
+            self._conn().execute(
+                'INSERT OR REPLACE INTO entries (ns, key, value, ts) VALUES (?, ?, ?, ?)',
+                (ns, str(key), encoded if encoded is not None else json.dumps(value, default=str), ts))
+            self._count('writes')
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            log.warning(f"L2 write failed: {e}")
+            self._count('errors')
+
+    def set_many(self, ns, items, ts):
+        """Write (key, value) pairs in one transaction."""
+        try:
+            rows = [(ns, str(k), json.dumps(v, default=str), ts) for k, v in items]
+            db = self._conn()
+            with db:
+                db.execute('BEGIN')
+                db.executemany('INSERT OR REPLACE INTO entries (ns, key, value, ts) VALUES (?, ?, ?, ?)', rows)
+            self._count('writes')
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            log.warning(f"L2 write failed: {e}")
+            self._count('errors')
+
+    def delete(self, ns, key):
+        try:
+            self._conn().execute('DELETE FROM entries WHERE ns = ? AND key = ?', (ns, str(key)))
+        except sqlite3.Error as e:
+            log.warning(f"L2 delete failed: {e}")
+            self._count('errors')
+
+    def invalidate(self, ns=None, prefix=''):
+        clauses, params = ['substr(key, 1, ?) = ?'], [len(prefix), prefix]
+        if ns is not None:
+            clauses.append('ns = ?')
+            params.append(ns)
+        try:
+            return self._conn().execute(
+                f"DELETE FROM entries WHERE {' AND '.join(clauses)}", params).rowcount
+        except sqlite3.Error as e:
+            log.warning(f"L2 invalidate failed: {e}")
+            self._count('errors')
+            return 0
+
+    def stats(self):
+        try:
+            rows = dict(self._conn().execute('SELECT ns, COUNT(*) FROM entries GROUP BY ns').fetchall())
+            size = os.path.getsize(self.path)
+        except (sqlite3.Error, OSError):
+            rows, size = {}, 0
+        with self._lock:
+            return dict(self.counters, path=self.path, bytes=size, rows=rows)
+
+
+def _open_l2(path):
+    if not path:
+        return None
+    try:
+        return PersistentTier(path)
+    except (sqlite3.Error, OSError) as e:
+        log.warning(f"Persistent cache disabled ({path}): {e}")
+        return None
+
+
+class Cache:
+    """Sharded LRU cache. Use namespace() to get a TTL-scoped view."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, shards=CACHE_SHARDS, l2=None):
+        shards = max(1, shards)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.l2 = l2
+        self._shards = [_Shard(max(1, max_entries // shards), max(1, max_bytes // shards))
+                        for _ in range(shards)]
+        self._namespaces = {}
+        self._ns_lock = threading.Lock()
+
+    def _shard(self, k):
+        return self._shards[hash(k) % len(self._shards)]
+
+    def namespace(self, name, ttl, persist=False, stale_ttl=None):
+        with self._ns_lock:
+            ns = self._namespaces.get(name)
+            if ns is None:
+                ns = self._namespaces[name] = Namespace(self, name, ttl, persist and self.l2 is not None, stale_ttl)
+            else:
+                ns.ttl = ttl
+                ns.stale_ttl = max(ttl, stale_ttl or ttl)
+            return ns
+
+    def lookup(self, ns, key, ttl, soft_ttl=None):
+        """Return (value, ts) for an entry younger than `ttl`, else None.
+
+        Entries older than `soft_ttl` are still returned but counted as stale.
+        """
+        k = (ns, key)
+        shard = self._shard(k)
+        with shard.lock:
+            entry = shard.entries.get(k)
+            if entry is None:
+                shard._count(ns, 'misses')
+                return None
+            age = time.time() - entry.ts
+            if age >= ttl:
+                shard._drop(k, entry)
+                shard._count(ns, 'expired')
+                shard._count(ns, 'misses')
+                return None
+            shard.entries.move_to_end(k)
+            shard._count(ns, 'stale' if soft_ttl is not None and age >= soft_ttl else 'hits')
+            return entry.value, entry.ts
+
+    def get(self, ns, key, ttl):
+        hit = self.lookup(ns, key, ttl)
+        return hit[0] if hit is not None else None
+
+    def set(self, ns, key, value, size=None, ts=None):
+        k = (ns, key)
+        entry = _Entry(value, time.time() if ts is None else ts, approx_size(value) if size is None else size)
+        shard = self._shard(k)
+        with shard.lock:
+            old = shard.entries.get(k)
+            if old is not None:
+                shard._drop(k, old)
+            shard.entries[k] = entry
+            shard.bytes += entry.size
+            shard._count(ns, 'entries')
+            shard._count(ns, 'bytes', entry.size)
+            shard._count(ns, 'sets')
+            shard._evict()
+
+    def delete(self, ns, key):
+        k = (ns, key)
+        shard = self._shard(k)
+        with shard.lock:
+            entry = shard.entries.get(k)
+            if entry is None:
+                return False
+            shard._drop(k, entry)
+            return True
+
+    def items(self, ns, ttl):
+        """Snapshot of live (key, value) pairs in a namespace. Does not touch LRU order."""
+        now = time.time()
+        out = []
+        for shard in self._shards:
+            with shard.lock:
+                out.extend((k[1], e.value) for k, e in shard.entries.items()
+                           if k[0] == ns and now - e.ts < ttl)
+        return out
+
+    def invalidate(self, ns=None, prefix=''):
+        """Drop every entry in `ns` (all namespaces if None) whose key starts with `prefix`."""
+        dropped = 0
+        for shard in self._shards:
+            with shard.lock:
+                doomed = [(k, e) for k, e in shard.entries.items()
+                          if (ns is None or k[0] == ns) and str(k[1]).startswith(prefix)]
+                for k, e in doomed:
+                    shard._drop(k, e)
+                dropped += len(doomed)
+        if self.l2 is not None:
+            # persisted rows are a superset of what L1 holds for those namespaces
+            dropped = max(dropped, self.l2.invalidate(ns, prefix))
+        return dropped
+
+    def stats(self):
+        totals = {}
+        entries = nbytes = 0
+        for shard in self._shards:
+            with shard.lock:
+                entries += len(shard.entries)
+                nbytes += shard.bytes
+                for ns, c in shard.counters.items():
+                    t = totals.setdefault(ns, dict.fromkeys(c, 0))
+                    for name, n in c.items():
+                        t[name] += n
+        with self._ns_lock:
+            for name, ns in self._namespaces.items():
+                t = totals.setdefault(name, dict.fromkeys(COUNTERS + ('entries', 'bytes'), 0))
+                t['ttl'] = ns.ttl
+                t['staleTtl'] = ns.stale_ttl
+                lookups = t['hits'] + t['stale'] + t['misses']
+                t['hitRate'] = round((t['hits'] + t['stale']) / lookups, 3) if lookups else 0
+        return {
+            'entries': entries,
+            'bytes': nbytes,
+            'maxEntries': self.max_entries,
+            'maxBytes': self.max_bytes,
+            'shards': len(self._shards),
+            'namespaces': totals,
+            'persistent': self.l2.stats() if self.l2 is not None else None,
+        }
+
+
+class Namespace:
+    """TTL-scoped view of a Cache, optionally backed by the persistent tier."""
+
+    def __init__(self, cache, name, ttl, persist=False, stale_ttl=None):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl or ttl)
+        self.persist = persist
+
+    def lookup(self, key):
+        """Return (value, is_stale) for an entry younger than stale_ttl, else None."""
+        hit = self.cache.lookup(self.name, key, self.stale_ttl, self.ttl)
+        if hit is None and self.persist:
+            hit = self.cache.l2.get(self.name, key, self.stale_ttl)
+            if hit is not None:
+                self.cache.set(self.name, key, hit[0], ts=hit[1])
+        if hit is None:
+            return None
+        value, ts = hit
+        return value, time.time() - ts >= self.ttl
+
+    def get(self, key):
+        """Fresh value (younger than ttl) or None."""
+        hit = self.lookup(key)
+        return hit[0] if hit is not None and not hit[1] else None
+
+    def last_good(self, key):
+        """Return (value, ts) for the last persisted value whatever its TTL, else None."""
+        if not self.persist:
+            return None
+        return self.cache.l2.get(self.name, key, self.cache.l2.max_age)
+
+    def set(self, key, value, size=None):
+        if self.persist:
+            encoded = json.dumps(value, default=str)
+            now = time.time()
+            self.cache.set(self.name, key, value, size=len(encoded) if size is None else size, ts=now)
+            self.cache.l2.set(self.name, key, value, now, encoded=encoded)
+        else:
+            self.cache.set(self.name, key, value, size=size)
+
+    def delete(self, key):
+        if self.persist:
+            self.cache.l2.delete(self.name, key)
+        return self.cache.delete(self.name, key)
+
+    def items(self):
+        return self.cache.items(self.name, self.stale_ttl)
+
+    def invalidate(self, prefix=''):
+        return self.cache.invalidate(self.name, prefix)
+
+
+# Process-wide instance shared by app.py and digital_routes.py
+cache = Cache(l2=_open_l2(CACHE_DB_PATH))
@@ -0,0 +1,265 @@
+"""
+backend/catalog.py — local Product Hunt catalog (SQLite + FTS5)
+
+- posts: one row per post (the parsed post as JSON, plus the columns
+  browsing orders by); post_topics: topic slug membership
+- posts_fts: FTS5 over name, tagline, tags, category, subcategory and
+  description. Keyword queries match word prefixes and rank by bm25 with
+  per-column weights (name over tagline over tags … over description)
+- posts_tri: the same columns under the trigram tokenizer, so query words
+  of 3+ characters also match inside a word ("gpt" finds "ChatGPT"), as
+  the in-memory TextIndex does; those hits rank after the prefix hits.
+  Skipped on SQLite builds without trigram support (before 3.34)
+- sync_state: per feed ('' for all posts, else a topic slug) the newest
+  createdAt / featuredAt seen, the resumable backfill cursor and the time
+  of the last completed sync. A feed counts as ready only while that sync
+  is under CATALOG_MAX_AGE old, so a stalled ingester hands requests back
+  to the network instead of serving an ever older mirror
+- Ingester: daemon thread that runs a sync coroutine on the shared aio loop
+  every CATALOG_SYNC_INTERVAL seconds
+- Queries are synchronous sqlite3 calls: async callers run them with
+  asyncio.to_thread (connections are per thread)
+Set CATALOG_DB_PATH= (empty) to disable (a path that can't be opened or
+created disables it too); callers then fetch from the network.
+"""
+import os, re, json, time, sqlite3, logging, threading
+import aio
+
+log = logging.getLogger('spark.catalog')
+
+CATALOG_DB_PATH       = os.environ.get('CATALOG_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ph_catalog.sqlite3'))
+CATALOG_SYNC_INTERVAL = float(os.environ.get('CATALOG_SYNC_INTERVAL', 15 * 60))
+CATALOG_RESULT_LIMIT  = int(os.environ.get('CATALOG_RESULT_LIMIT', 400))
+CATALOG_MAX_AGE       = float(os.environ.get('CATALOG_MAX_AGE', 4 * CATALOG_SYNC_INTERVAL))
+
+# bm25() weights per posts_fts column, the unindexed id column first
+FTS_COLUMNS = ('name', 'tagline', 'tags', 'category', 'subcategory', 'description')
+FTS_WEIGHTS = (0, 10, 6, 5, 4, 4, 2)
+MIN_OR_WORD = 3         # words shorter than this are dropped from the any-word fallback query
+MIN_INFIX_WORD = 3      # the trigram tokenizer can't match anything shorter
+
+
+def match_expr(q, any_word=False):
+    """FTS5 query for q: every word as a quoted prefix, all required (or any, for the fallback)."""
+    words = re.findall(r'\w+', q.lower())
+    if any_word:
+        words = [w for w in words if len(w) >= MIN_OR_WORD]
+    return (' OR ' if any_word else ' ').join(f'"{w}"*' for w in words)
+
+
+def infix_expr(q):
+    """Trigram query for q: every word of MIN_INFIX_WORD+ characters as a substring, all required."""
+    return ' '.join(f'"{w}"' for w in re.findall(r'\w+', q.lower()) if len(w) >= MIN_INFIX_WORD)
+
+
+class Catalog:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('searches', 'browses', 'upserts', 'errors'), 0)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        db = self._conn()
+        db.executescript(f'''
+            CREATE TABLE IF NOT EXISTS posts (
+                rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, data TEXT NOT NULL,
+                votes INTEGER NOT NULL, featured INTEGER NOT NULL,
+                created_at TEXT, featured_at TEXT, synced_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS posts_votes ON posts (votes DESC);
+            CREATE TABLE IF NOT EXISTS post_topics (
+                topic TEXT NOT NULL, post INTEGER NOT NULL, PRIMARY KEY (topic, post)) WITHOUT ROWID;
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                id UNINDEXED, {', '.join(FTS_COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+            CREATE TABLE IF NOT EXISTS sync_state (
+                feed TEXT PRIMARY KEY, newest_created TEXT, newest_featured TEXT,
+                backfill_cursor TEXT, backfill_pages INTEGER NOT NULL DEFAULT 0, synced_at REAL);
+        ''')
+        try:
+            db.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS posts_tri USING fts5({', '.join(FTS_COLUMNS)}, tokenize='trigram')")
+            # Catalogs created before posts_tri existed: index the posts it hasn't seen
+            db.execute(f'''INSERT INTO posts_tri (rowid, {', '.join(FTS_COLUMNS)})
+                           SELECT rowid, {', '.join(FTS_COLUMNS)} FROM posts_fts
+                           WHERE rowid NOT IN (SELECT rowid FROM posts_tri)''')
+            self.infix = True
+        except sqlite3.OperationalError as e:
+            log.info(f"Catalog infix matching unavailable: {e}")
+            self.infix = False
+
+    def _conn(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    # ── writes ──
+    def upsert(self, entries, topic=''):
+        """Store (post, topic slugs, featuredAt) entries, listed under `topic` as well as their own topics."""
+        now = time.time()
+        db = self._conn()
+        with db:
+            db.execute('BEGIN')
+            for post, slugs, featured_at in entries:
+                db.execute(
+                    '''INSERT INTO posts (id, data, votes, featured, created_at, featured_at, synced_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (id) DO UPDATE SET data = excluded.data, votes = excluded.votes,
+                           featured = excluded.featured, featured_at = excluded.featured_at,
+                           synced_at = excluded.synced_at''',
+                    (post['id'], json.dumps(post), post['votes'], int(post['featured']),
+                     post['createdAt'] or None, featured_at or None, now))
+                rowid = db.execute('SELECT rowid FROM posts WHERE id = ?', (post['id'],)).fetchone()[0]
+                db.execute('DELETE FROM posts_fts WHERE rowid = ?', (rowid,))
+                text = (post['name'], post['tagline'], ' '.join(post['tags']),
+                        post['category'], post['subcategory'], post['description'])
+                db.execute(f"INSERT INTO posts_fts (rowid, id, {', '.join(FTS_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (rowid, post['id'], *text))
+                if self.infix:
+                    db.execute('DELETE FROM posts_tri WHERE rowid = ?', (rowid,))
+                    db.execute(f"INSERT INTO posts_tri (rowid, {', '.join(FTS_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (rowid, *text))
+                db.executemany('INSERT OR IGNORE INTO post_topics (topic, post) VALUES (?, ?)',
+                               [(t, rowid) for t in {topic, *slugs} if t])
+        self._count('upserts', len(entries))
+
+    def state(self, feed):
+        row = self._conn().execute(
+            'SELECT newest_created, newest_featured, backfill_cursor, backfill_pages, synced_at FROM sync_state WHERE feed = ?',
+            (feed,)).fetchone()
+        keys = ('newestCreated', 'newestFeatured', 'backfillCursor', 'backfillPages', 'syncedAt')
+        return dict(zip(keys, row)) if row else dict.fromkeys(keys, None) | {'backfillPages': 0}
+
+    def set_state(self, feed, state):
+        self._conn().execute(
+            '''INSERT OR REPLACE INTO sync_state (feed, newest_created, newest_featured, backfill_cursor, backfill_pages, synced_at)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            (feed, state['newestCreated'], state['newestFeatured'], state['backfillCursor'],
+             state['backfillPages'], state['syncedAt']))
+
+    # ── reads ──
+    def ready(self, feeds, max_age=CATALOG_MAX_AGE):
+        """True while every feed in `feeds` has completed a sync in the last max_age seconds."""
+        feeds = list(feeds)
+        try:
+            n = self._conn().execute(
+                f"SELECT COUNT(*) FROM sync_state WHERE synced_at >= ? AND feed IN ({', '.join('?' * len(feeds))})",
+                [time.time() - max_age] + feeds).fetchone()[0]
+        except sqlite3.Error as e:
+            log.warning(f"Catalog read failed: {e}")
+            self._count('errors')
+            return False
+        return n == len(set(feeds))
+
+    def _posts(self, sql, params):
+        try:
+            rows = self._conn().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            log.warning(f"Catalog read failed: {e}")
+            self._count('errors')
+            return None
+        return [json.loads(r[0]) for r in rows]
+
+    def search(self, q, limit=CATALOG_RESULT_LIMIT):
+        """Posts matching every word of q (as a prefix, then inside a word), else any longer word of
+        it as a prefix, best bm25 first. None if the catalog can't be read."""
+        self._count('searches')
+        for any_word in (False, True):
+            expr = match_expr(q, any_word)
+            if not expr:
+                continue
+            posts = self._posts(
+                f'''SELECT p.data FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid
+                    WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts, {', '.join(map(str, FTS_WEIGHTS))}), p.votes DESC
+                    LIMIT ?''', (expr, limit))
+            if posts is not None and not any_word and self.infix and len(posts) < limit and infix_expr(q):
+                inner = self._posts(
+                    f'''SELECT p.data FROM posts_tri JOIN posts p ON p.rowid = posts_tri.rowid
+                        WHERE posts_tri MATCH ? ORDER BY bm25(posts_tri, {', '.join(map(str, FTS_WEIGHTS[1:]))}), p.votes DESC
+                        LIMIT ?''', (infix_expr(q), limit))
+                seen = {p['id'] for p in posts}
+                posts += [p for p in inner or () if p['id'] not in seen][:limit - len(posts)]
+            if posts is None or posts:
+                return posts
+        return []
+
+    def browse(self, topic='', limit=CATALOG_RESULT_LIMIT):
+        """Posts of a topic slug ('' for all), most votes first."""
+        self._count('browses')
+        if not topic:
+            return self._posts('SELECT data FROM posts ORDER BY votes DESC LIMIT ?', (limit,))
+        return self._posts(
+            '''SELECT p.data FROM post_topics t JOIN posts p ON p.rowid = t.post
+               WHERE t.topic = ? ORDER BY p.votes DESC LIMIT ?''', (topic, limit))
+
+    def get(self, post_id):
+        posts = self._posts('SELECT data FROM posts WHERE id = ?', (post_id,))
+        return posts[0] if posts else None
+
+    def stats(self):
+        try:
+            db = self._conn()
+            posts = db.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+            feeds = {feed: {'syncedAt': synced_at, 'newestCreated': newest, 'backfillPages': pages}
+                     for feed, synced_at, newest, pages in db.execute(
+                         'SELECT feed, synced_at, newest_created, backfill_pages FROM sync_state')}
+            size = os.path.getsize(self.path)
+        except (sqlite3.Error, OSError):
+            posts, feeds, size = 0, {}, 0
+        with self._lock:
+            return dict(self.counters, path=self.path, bytes=size, posts=posts, feeds=feeds)
+
+
+def _open(path):
+    if not path:
+        return None
+    try:
+        return Catalog(path)
+    except (sqlite3.Error, OSError) as e:
+        log.warning(f"Product Hunt catalog disabled ({path}): {e}")
+        return None
+
+
+catalog = _open(CATALOG_DB_PATH)
+
+
+# ─── Ingester ──────────────────────────────────────────────────
+class Ingester:
+    """Runs `sync` (a coroutine function) on the aio loop now and then every `interval` seconds."""
+
+    def __init__(self, name, sync, interval=CATALOG_SYNC_INTERVAL):
+        self.name = name
+        self.sync = sync
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('runs', 'failures'), 0)
+        self.last_run = None
+
+    def start(self):
+        """Start the sync thread on first call; later calls do nothing."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=f'spark-{self.name}', daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            t0 = time.monotonic()
+            try:
+                aio.run(self.sync())
+            except Exception as e:
+                log.warning(f"{self.name} sync failed: {e}")
+                self.counters['failures'] += 1
+            self.counters['runs'] += 1
+            self.last_run = time.time()
+            log.info(f"{self.name} sync took {time.monotonic() - t0:.1f}s")
+            time.sleep(self.interval)
+
+    def stats(self):
+        return dict(self.counters, running=self._thread is not None, lastRun=self.last_run, interval=self.interval)
@@ -0,0 +1,279 @@
+"""
+backend/chains.py — chain-name lists and the compiled matcher built from them
+
+- Two tiers: EXCLUDE (LARGE_CHAIN_NAMES — dropped from results) and
+  DEPRIORITISE (BIG_CHAINS — ranked after small businesses)
+- Exclude tier: character trie over the chain names; a name matches when it
+  starts with a chain followed by end-of-name or one of " #'-"
+  ("McDonald's #1234", "Costco Wholesale")
+- Deprioritise tier: Aho-Corasick automaton, i.e. "contains any BIG_CHAINS
+  name" in one pass over the name
+- Both are built once at import; classify() memoises the verdict per name,
+  so each lookup is O(len(name)) at worst and a dict hit when repeated
+
+    python chains.py    # micro-benchmark against the old linear scans
+"""
+import os
+from collections import deque
+from functools import lru_cache
+
+CHAIN_VERDICT_CACHE = int(os.environ.get('CHAIN_VERDICT_CACHE', 16384))
+
+EXCLUDE = 'exclude'
+DEPRIORITISE = 'deprioritise'
+
+# Characters that may follow a chain name in a store's display name
+BOUNDARY = frozenset(" #'-")
+
+# ─── Exclude large chains / big box — show only small businesses ─
+LARGE_CHAIN_NAMES = frozenset([
+    "costco", "costco wholesale", "sam's club", "sams club", "bj's", "bjs wholesale",
+    "walmart", "wal-mart", "target", "kmart", "meijer", "fred meyer",
+    "mcdonald's", "mcdonalds", "burger king", "wendy's", "wendys", "sonic",
+    "taco bell", "chipotle", "qdoba", "del taco", "moe's southwest grill",
+    "kfc", "kentucky fried chicken", "popeyes", "chick-fil-a", "chick fil a",
+    "panda express", "panda inn", "five guys", "in-n-out", "in n out",
+    "whataburger", "jack in the box", "carl's jr", "carls jr", "hardee's", "hardees",
+    "arbys", "arby's", "subway", "jimmy john's", "jimmy johns", "firehouse subs",
+    "pizza hut", "domino's", "dominos", "papa john's", "papa johns", "little caesars",
+    "wingstop", "buffalo wild wings", "bdubs", "applebees", "applebee's",
+    "olive garden", "red lobster", "outback", "outback steakhouse",
+    "texas roadhouse", "chili's", "chilis", "longhorn steakhouse",
+    "ihop", "i hop", "denny's", "dennys", "cracker barrel", "waffle house",
+    "starbucks", "dunkin'", "dunkin", "dunkin donuts", "caribou coffee",
+    "panera", "panera bread", "jamba juice", "smoothie king", "tropical smoothie",
+    "home depot", "lowes", "lowes's", "menards", "ace hardware",
+    "best buy", "staples", "office depot", "office max",
+    "cvs", "walgreens", "rite aid", "duane reade",
+    "kroger", "safeway", "albertsons", "publix", "whole foods", "whole foods market",
+    "trader joe's", "trader joes", "aldi", "lidl", "sprouts",
+    "dollar general", "dollar tree", "family dollar", "99 cents only",
+    "7-eleven", "7 eleven", "circle k", "speedway", "wawa", "sheetz", "quik trip", "qt",
+    "shell", "exxon", "chevron", "bp", "mobil", "conoco", "phillips 66", "valero",
+    "marriott", "hilton", "hyatt", "holiday inn", "best western", "hampton inn",
+    "fedex", "ups", "ups store", "u.s. postal service", "usps", "dhl",
+    "autozone", "oreilly", "oreilly auto", "advance auto", "napa auto",
+    "jiffy lube", "take 5 oil change", "valvoline", "firestone", "goodyear",
+    "gamestop", "petco", "petsmart", "bed bath & beyond", "bed bath and beyond",
+    "mattress firm", "ashley furniture", "la-z-boy", "lazy boy",
+    "att store", "verizon", "verizon wireless", "t-mobile", "tmobile", "sprint", "at&t",
+    "h&r block", "hr block", "jackson hewitt", "liberty tax",
+    "massage envy", "european wax center", "hand & stone", "hand and stone",
+    "great clips", "supercuts", "sport clips", "fantastic sams",
+    "dentistry", "aspen dental", "heartland dental", "comfort dental",
+    "concentra", "urgent care", "minute clinic", "cvs minute clinic",
+    "america's best", "americas best", "lenscrafters", "pearle vision",
+    "enterprise", "enterprise rent-a-car", "hertz", "avis", "budget", "national car rental",
+    "hobby lobby", "michaels", "joann", "jo-ann", "joann fabrics",
+    "dave & buster's", "dave and busters", "main event", "topgolf", "top golf",
+    "amc", "amc theatres", "regal", "cinemark", "movie tavern",
+    "planet fitness", "la fitness", "24 hour fitness", "equinox", "anytime fitness",
+    "big lots", "ross", "tj maxx", "t.j. maxx", "marshalls", "homegoods", "burlington",
+    "j.c. penney", "jcpenney", "kohl's", "kohls",
+    "dicks sporting goods", "dick's sporting goods", "academy sports", "rei ",
+    "bass pro", "cabela's", "cabelas", "scheels",
+    "apple store", "microsoft store", "samsung",
+    "ikea", "wayfair", "pottery barn", "west elm", "crate and barrel",
+    "bath & body works", "victoria's secret", "victorias secret", "ulta",
+    "sephora", "lush", "body shop",
+    "dairy queen", "dq ", "baskin-robbins", "baskin robbins", "cold stone", "ben & jerry's",
+    "cinnabon", "auntie anne's", "pretzel maker", "wetzel's", "jamba",
+    "jersey mike's", "jersey mikes", "blaze pizza", "mod pizza", "&pizza",
+    "raising cane's", "raising canes", "zaxby's", "zaxbys", "bojangles",
+    "cava", "sweetgreen", "salata", "corelife", "freshii",
+    "first watch", "another broken egg", "snooze", "black bear diner",
+    "red robin", "red robin gourmet burgers", "famous dave's", "famous daves",
+    "texas roadhouse", "longhorn", "outback steakhouse", "bloomin brands",
+    "cracker barrel", "bob evans", "perkins", "village inn", "ihop",
+    "costa vida", "cafe rio", "mo' bettahs", "mo bettahs", "swig", "fiiz",
+    "crumbl", "insomnia cookies", "great american cookies", "potbelly",
+])
+
+# ─── Big business chains to deprioritize ───────────────────────
+BIG_CHAINS = {
+    'walmart', 'costco', 'target', 'home depot', 'lowes', "lowe's",
+    'best buy', 'kroger', 'safeway', 'whole foods', 'albertsons',
+    'cvs', 'walgreens', 'rite aid', 'mcdonalds', "mcdonald's",
+    'burger king', 'wendys', "wendy's", 'taco bell', 'kfc',
+    'subway', 'starbucks', 'dunkin', "dunkin'", 'chipotle',
+    'panera', 'chick-fil-a', 'pizza hut', 'dominos', "domino's",
+    'papa johns', "papa john's", 'little caesars', 'olive garden',
+    'applebees', "applebee's", 'chilis', "chili's", 'red lobster',
+    'outback steakhouse', 'buffalo wild wings', 'ihop', 'dennys', "denny's",
+    'waffle house', 'panda express', 'five guys', 'in-n-out',
+    'shake shack', 'popeyes', 'arbys', "arby's", 'sonic',
+    'dairy queen', 'baskin robbins', 'cold stone', '7-eleven',
+    "7 eleven", 'circle k', 'shell', 'chevron', 'exxon', 'bp',
+    'mobil', 'marathon', 'speedway', 'sams club', "sam's club",
+    'kohls', "kohl's", 'jcpenney', 'macys', "macy's", 'nordstrom',
+    'tjmaxx', 'tj maxx', 'marshalls', 'ross', 'burlington',
+    'petco', 'petsmart', 'autozone', 'oreilly', "o'reilly",
+    'napa', 'jiffy lube', 'valvoline', 'discount tire',
+    'firestone', 'goodyear', 'pep boys', 'home goods',
+    'bed bath', 'bath & body', 'ulta', 'sephora', 'sally beauty',
+    'great clips', 'supercuts', 'sport clips', 'fantastic sams',
+    '24 hour fitness', 'la fitness', 'planet fitness', 'anytime fitness',
+    'gold gym', "gold's gym", 'marriott', 'hilton', 'hyatt',
+    'holiday inn', 'best western', 'comfort inn', 'hampton inn',
+    'courtyard', 'residence inn', 'springhill', 'fairfield inn',
+}
+
+
+# ─── Compiled matchers ─────────────────────────────────────────
+_END = object()
+
+
+class PrefixMatcher:
+    """Trie of names; matches a chain name at the start of the text, ending on a boundary."""
+
+    def __init__(self, names):
+        self.root = {}
+        for name in names:
+            node = self.root
+            for ch in name:
+                node = node.setdefault(ch, {})
+            node[_END] = True
+
+    def match(self, text):
+        node = self.root
+        n = len(text)
+        for i, ch in enumerate(text):
+            node = node.get(ch)
+            if node is None:
+                return False
+            if _END in node and (i + 1 == n or text[i + 1] in BOUNDARY):
+                return True
+        return False
+
+
+class SubstringMatcher:
+    """Aho-Corasick automaton: does the text contain any of the names?"""
+
+    def __init__(self, names):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [False]
+        for name in names:
+            if not name:
+                continue
+            state = 0
+            for ch in name:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(False)
+                state = nxt
+            self.out[state] = True
+        # Breadth-first fail links; a state accepts if any suffix of it does
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] or self.out[self.fail[nxt]]
+
+    def search(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+_exclude = PrefixMatcher(LARGE_CHAIN_NAMES)
+_deprioritise = SubstringMatcher(BIG_CHAINS)
+
+
+@lru_cache(maxsize=CHAIN_VERDICT_CACHE)
+def classify(name):
+    """EXCLUDE, DEPRIORITISE or None for a business display name."""
+    n = (name or '').lower().strip()
+    if not n:
+        return None
+    if _exclude.match(n):
+        return EXCLUDE
+    if _deprioritise.search(n):
+        return DEPRIORITISE
+    return None
+
+
+def stats():
+    info = classify.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxSize': info.maxsize}
+
+
+# ─── Micro-benchmark ───────────────────────────────────────────
+if __name__ == '__main__':
+    import random, timeit
+
+    def legacy_is_large_chain(display_name):
+        if not display_name or not display_name.strip():
+            return False
+        n = display_name.lower().strip()
+        if n in LARGE_CHAIN_NAMES:
+            return True
+        for chain in LARGE_CHAIN_NAMES:
+            if n == chain or n.startswith(chain + " ") or n.startswith(chain + "#") or n.startswith(chain + "'") or n.startswith(chain + "-"):
+                return True
+            if n.startswith(chain) and (len(n) == len(chain) or n[len(chain):len(chain)+1] in " #'-"):
+                return True
+        return False
+
+    def legacy_is_big_chain(name):
+        name_lower = name.lower()
+        return any(chain in name_lower for chain in BIG_CHAINS)
+
+    def legacy(names):
+        kept = [n for n in names if not legacy_is_large_chain(n)]
+        return sorted(kept, key=legacy_is_big_chain)
+
+    def compiled(names):
+        kept = [n for n in names if classify(n) != EXCLUDE]
+        return sorted(kept, key=lambda n: classify(n) == DEPRIORITISE)
+
+    rng = random.Random(42)
+    indie = ['Blue Door Bakery', 'Rosa\'s Taqueria', 'Hollow Tree Books', 'Main St Hardware',
+             'Sunrise Nail Spa', 'Golden Lotus Thai', 'Kiln & Co Pottery', 'Juniper Coffee Roasters',
+             'The Marriott Street Diner', 'Shellback Surf Shop', 'Ross Family Dental', 'Targeted Fitness']
+    chains = sorted(LARGE_CHAIN_NAMES | BIG_CHAINS)
+    sets = []
+    for _ in range(100):
+        names = []
+        for i in range(100):
+            if rng.random() < 0.3:
+                names.append(f"{rng.choice(chains).title()} #{rng.randint(1, 9999)}")
+            else:
+                names.append(f"{rng.choice(indie)} {rng.randint(1, 9999)}")
+        sets.append(names)
+
+    for names in sets:
+        assert [legacy_is_large_chain(n) for n in names] == [classify(n) == EXCLUDE for n in names]
+        assert [legacy_is_big_chain(n) for n in names if not legacy_is_large_chain(n)] == \
+               [classify(n) == DEPRIORITISE for n in names if classify(n) != EXCLUDE]
+
+    def bench(fn, cold=False):
+        def run():
+            if cold:
+                classify.cache_clear()
+            for names in sets:
+                fn(names)
+        return min(timeit.repeat(run, number=1, repeat=5)) / len(sets) * 1e6
+
+    t_legacy = bench(legacy)
+    t_cold = bench(compiled, cold=True)
+    t_warm = bench(compiled)
+    print(f"100-place result set, filter + rank ({len(LARGE_CHAIN_NAMES)} exclude / {len(BIG_CHAINS)} deprioritise names)")
+    print(f"  linear scans        {t_legacy:9.1f} µs")
+    print(f"  compiled, cold memo {t_cold:9.1f} µs  ({t_legacy / t_cold:.0f}x)")
+    print(f"  compiled, warm memo {t_warm:9.1f} µs  ({t_legacy / t_warm:.0f}x)")
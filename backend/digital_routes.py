@@ -5,13 +5,27 @@ Product Hunt API integration for digital business search.
 
 FIXES:
 - Search: PH API does NOT support 'search' arg on posts. We fetch from
-  multiple popular topics and filter client-side by keyword matching.
+  multiple popular topics and rank them client-side with a BM25 index
+  (see textindex.py), built once per fetched post set.
 - Pagination: fetches up to 8 pages (up to 400 results) per topic.
 - Subcategories: 40+ subcategories mapped to PH topic slugs.
+- Failures: a failed fetch is never cached as an empty result. It is kept
+  for DIGITAL_NEGATIVE_TTL in its own namespace, and the last good result
+  list (however old) is served instead while Product Hunt is down.
+- Local catalog: a background ingester mirrors every mapped topic into
+  SQLite / FTS5 (see catalog.py). Once the feeds a request needs have
+  synced, searches and browsing are answered from it without touching
+  the network; until then they fall back to the topic fetches above.
 """
 
-import os, time, threading, math, logging
-import requests as req
+import os, math, time, logging, asyncio
+from datetime import datetime, timedelta, timezone
+import upstream, aio, quota
+from cache import cache
+from catalog import catalog, Ingester
+from textindex import TextIndex
+from singleflight import SingleFlight
+from refresh import Refresher
 from flask import Blueprint, request, jsonify
 
 log = logging.getLogger('spark.digital')
@@ -22,19 +36,14 @@ PH_API_KEY = os.environ.get('PRODUCT_HUNT_API_KEY', '')
 PH_URL = 'https://api.producthunt.com/v2/api/graphql'
 
 # ─── Cache ──────────────────────────────────────────────────────
-_cache = {}
-_cache_lock = threading.Lock()
-CACHE_TTL = 600
-
-def _cache_get(key):
-    with _cache_lock:
-        if key in _cache and time.time() - _cache[key]['ts'] < CACHE_TTL:
-            return _cache[key]['data']
-    return None
-
-def _cache_set(key, data):
-    with _cache_lock:
-        _cache[key] = {'data': data, 'ts': time.time()}
+CACHE_TTL       = int(os.environ.get('DIGITAL_CACHE_TTL', 600))
+CACHE_STALE_TTL = int(os.environ.get('DIGITAL_CACHE_STALE_TTL', 6 * 3600))
+NEGATIVE_TTL    = int(os.environ.get('DIGITAL_NEGATIVE_TTL', 30))
+_search_cache   = cache.namespace('digital', ttl=CACHE_TTL, persist=True, stale_ttl=CACHE_STALE_TTL)
+_product_cache  = cache.namespace('digital_product', ttl=CACHE_TTL)
+_search_failed  = cache.namespace('digital_failed', ttl=NEGATIVE_TTL)
+_search_flight  = SingleFlight('digital')
+_search_refresh = Refresher('digital')
 
 
 # ─── Category → PH topic slug mapping ─────────────────────────
@@ -136,11 +145,19 @@ FALLBACK_IMG = 'https://images.unsplash.com/photo-1518770660439-4636190af475?w=4
 
 
 # ─── GraphQL query builders ────────────────────────────────────
-def _topic_query(topic_slug, first=50, after=None):
-    after_str = f', after: "{after}"' if after else ''
+ALL_POSTS_SINCE = '2022-01-01T00:00:00Z'
+
+def _posts_query(topic_slug=None, first=50, after=None, order='VOTES', posted_after=None):
+    args = f'first: {first}, order: {order}'
+    if topic_slug:
+        args = f'topic: "{topic_slug}", ' + args
+    if after:
+        args += f', after: "{after}"'
+    if posted_after:
+        args += f', postedAfter: "{posted_after}"'
     return f"""
     {{
-      posts(topic: "{topic_slug}", first: {first}{after_str}, order: VOTES) {{
+      posts({args}) {{
         pageInfo {{ hasNextPage endCursor }}
         edges {{
           node {{
@@ -155,28 +172,16 @@ def _topic_query(topic_slug, first=50, after=None):
     }}
     """
 
+def _topic_query(topic_slug, first=50, after=None):
+    return _posts_query(topic_slug, first=first, after=after)
+
 def _featured_query(first=50, after=None):
-    after_str = f', after: "{after}"' if after else ''
-    return f"""
-    {{
-      posts(first: {first}{after_str}, order: VOTES, postedAfter: "2022-01-01T00:00:00Z") {{
-        pageInfo {{ hasNextPage endCursor }}
-        edges {{
-          node {{
-            id name tagline description url
-            votesCount reviewsCount reviewsRating
-            website createdAt featuredAt
-            thumbnail {{ url }}
-            topics {{ edges {{ node {{ name slug }} }} }}
-          }}
-        }}
-      }}
-    }}
-    """
+    return _posts_query(first=first, after=after, posted_after=ALL_POSTS_SINCE)
 
 
 # ─── GraphQL request helper ────────────────────────────────────
-def _ph_request(gql_query):
+async def _ph_request(gql_query):
+    """POST a GraphQL query; raises on transport, HTTP or GraphQL errors."""
     if not PH_API_KEY:
         raise ValueError('PRODUCT_HUNT_API_KEY not set')
     headers = {
@@ -185,40 +190,53 @@ def _ph_request(gql_query):
         'Accept': 'application/json',
     }
     try:
-        resp = req.post(PH_URL, json={'query': gql_query}, headers=headers, timeout=15)
+        resp = await upstream.apost(PH_URL, json={'query': gql_query}, headers=headers, timeout=15)
+        resp.raise_for_status()
         data = resp.json()
-        if 'errors' in data:
-            # THIS IS IMPORTANT: Print the actual error message from PH
-            log.error(f"GraphQL Error: {data['errors'][0].get('message')}")
-            return None
-        return data
     except Exception as e:
         log.error(f"Network/Request Error: {e}")
-        return None
+        raise
+    if 'errors' in data:
+        # THIS IS IMPORTANT: Print the actual error message from PH
+        message = data['errors'][0].get('message')
+        log.error(f"GraphQL Error: {message}")
+        raise RuntimeError(f"Product Hunt GraphQL error: {message}")
+    return data
 
 
 # ─── Fetch all pages for a topic (up to max_pages * 50) ────────
-def _fetch_all_pages(topic_slug=None, max_pages=1):
+async def _fetch_page(gql):
+    """One page of posts: ([(post, topic slugs, featuredAt)], pageInfo). Raises like _ph_request."""
+    data = await _ph_request(gql)
+    posts_data = data.get('data', {}).get('posts', {})
+    entries = []
+    for edge in posts_data.get('edges', []):
+        node = edge.get('node')
+        parsed = _parse_post(node)
+        if parsed:
+            slugs = [e.get('node', {}).get('slug', '') for e in node.get('topics', {}).get('edges', [])]
+            entries.append((parsed, slugs, node.get('featuredAt')))
+    return entries, posts_data.get('pageInfo', {})
+
+
+async def _fetch_all_pages(topic_slug=None, max_pages=1):
+    """A failed first page raises; a later one ends paging with the posts so far."""
     all_posts = []
     cursor = None
-    for _ in range(max_pages):
+    for page in range(max_pages):
         if topic_slug:
             gql = _topic_query(topic_slug, first=20, after=cursor)
         else:
             gql = _featured_query(first=20, after=cursor)
 
-        data = _ph_request(gql)
-        if not data:
+        try:
+            entries, page_info = await _fetch_page(gql)
+        except Exception:
+            if not page:
+                raise
             break
 
-        posts_data = data.get('data', {}).get('posts', {})
-        edges = posts_data.get('edges', [])
-        page_info = posts_data.get('pageInfo', {})
-
-        for edge in edges:
-            parsed = _parse_post(edge.get('node'))
-            if parsed:
-                all_posts.append(parsed)
+        all_posts.extend(post for post, _, _ in entries)
 
         if not page_info.get('hasNextPage'):
             break
@@ -226,7 +244,7 @@ def _fetch_all_pages(topic_slug=None, max_pages=1):
         if not cursor:
             break
 
-        time.sleep(0.3)  # rate limit courtesy delay
+        await asyncio.sleep(0.3)  # rate limit courtesy delay
 
     return all_posts
 
@@ -330,151 +348,338 @@ def _parse_post(node):
     }
 
 
-# ─── Client-side keyword filter ────────────────────────────────
-def _keyword_filter(posts, query):
-    q = query.lower()
-    scored = []
-    for post in posts:
-        score = 0
-        name        = (post.get('name') or '').lower()
-        tagline     = (post.get('tagline') or '').lower()
-        tags        = ' '.join(post.get('tags') or []).lower()
-        category    = (post.get('category') or '').lower()
-        subcategory = (post.get('subcategory') or '').lower()
-        description = (post.get('description') or '').lower()
+# ─── Keyword ranking ───────────────────────────────────────────
+# (weight, BM25 length normalisation b) per post field. With lengths capped at
+# textindex.MAX_LEN_RATIO × the average, one hit in a field always outscores one
+# in any lower field: name 8.3–12.5 > tagline 5.2–7.1 > tags 5 > category /
+# subcategory 4 > description 1.4–3.3. Query words also match inside a word
+# ("gpt" → ChatGPT), like the substring scorer this replaced and the catalog's
+# trigram table; such hits count at textindex.INFIX_WEIGHT.
+POST_FIELDS = {
+    'name':        (10, 0.2),
+    'tagline':     (6, 0.15),
+    'tags':        (5, 0),
+    'category':    (4, 0),
+    'subcategory': (4, 0),
+    'description': (2, 0.4),
+}
+_corpus        = cache.namespace('digital_corpus', ttl=CACHE_TTL)
+_corpus_flight = SingleFlight('digital_corpus')
+
+
+async def _fetch_corpus():
+    all_posts = []
+    seen_ids = set()
+    per_topic = await asyncio.gather(*(
+        _fetch_all_pages(topic_slug=topic, max_pages=3) for topic in SEARCH_FEEDS
+    ), return_exceptions=True)
+    fetched = [posts for posts in per_topic if not isinstance(posts, BaseException)]
+    if not fetched:
+        raise per_topic[0]
+    for posts in fetched:
+        for p in posts:
+            if p['id'] not in seen_ids:
+                seen_ids.add(p['id'])
+                all_posts.append(p)
+    corpus = (all_posts, TextIndex(all_posts, POST_FIELDS, tiebreak='votes'))
+    # A corpus missing failed topics serves this query but isn't kept
+    if len(fetched) == len(per_topic):
+        _corpus.set('search', corpus, size=corpus[1].nbytes())
+    return corpus
+
+
+async def _search_corpus():
+    """Posts of the keyword-search topics and their text index, fetched and built once
+    per CACHE_TTL and shared by every keyword query."""
+    corpus = _corpus.get('search')
+    if corpus is None:
+        corpus = await _corpus_flight.do_async('search', _fetch_corpus)
+    return corpus
+
+
+# ─── Local catalog sync ────────────────────────────────────────
+# Feeds: '' (all posts since ALL_POSTS_SINCE) and every mapped topic slug, the
+# keyword-search topics first so search is served locally soonest. Per feed,
+# each run:
+# - backfills the most-voted posts, CATALOG_BACKFILL_PAGES pages in all
+#   (the depth topic browsing used to fetch), resuming from a stored cursor
+# - reads everything posted since the newest createdAt seen, newest first.
+#   The window reaches CATALOG_OVERLAP back, so votes and featuredAt of
+#   recent posts keep updating
+# While the Product Hunt quota is low the sync backs off, leaving it to foreground
+# requests; after CATALOG_QUOTA_WAIT seconds of that the run stops and the next
+# one picks up where it left off.
+CATALOG_BACKFILL_PAGES = int(os.environ.get('CATALOG_BACKFILL_PAGES', 8))
+CATALOG_SYNC_PAGES     = int(os.environ.get('CATALOG_SYNC_PAGES', 10))
+CATALOG_OVERLAP        = int(os.environ.get('CATALOG_OVERLAP', 2 * 24 * 3600))
+CATALOG_QUOTA_WAIT     = float(os.environ.get('CATALOG_QUOTA_WAIT', 60))
+CATALOG_PAGE_DELAY     = 0.3
+QUOTA_PAUSE = 5
+BACKFILL_DONE = '-'
+
+SEARCH_FEEDS = SEARCH_TOPICS[:6]
+CATALOG_FEEDS = list(dict.fromkeys(SEARCH_FEEDS + [''] + sorted(
+    set(CATEGORY_TOPIC_MAP.values()) | set(SUBCATEGORY_TOPIC_MAP.values()) | set(SEARCH_TOPICS))))
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _sync_since(state):
+    """postedAfter for the forward read: CATALOG_OVERLAP before the newest post seen (or now)."""
+    newest = state['newestCreated']
+    at = datetime.fromisoformat(newest.replace('Z', '+00:00')) if newest else datetime.now(timezone.utc)
+    return _iso(at - timedelta(seconds=CATALOG_OVERLAP))
+
+
+def _note_newest(state, entries):
+    for post, _, featured_at in entries:
+        if post['createdAt'] and post['createdAt'] > (state['newestCreated'] or ''):
+            state['newestCreated'] = post['createdAt']
+        if featured_at and featured_at > (state['newestFeatured'] or ''):
+            state['newestFeatured'] = featured_at
+
+
+async def _quota_clear():
+    """Wait up to CATALOG_QUOTA_WAIT for the Product Hunt quota to leave its reserve."""
+    deadline = time.monotonic() + CATALOG_QUOTA_WAIT
+    while quota.low('producthunt'):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(QUOTA_PAUSE)
+    return True
+
+
+async def _sync_feed(feed):
+    """Bring one feed up to date. Returns False if it stopped early for quota."""
+    state = await asyncio.to_thread(catalog.state, feed)
+    since = _sync_since(state)
+    while state['backfillPages'] < CATALOG_BACKFILL_PAGES and state['backfillCursor'] != BACKFILL_DONE:
+        if not await _quota_clear():
+            return False
+        entries, info = await _fetch_page(_posts_query(
+            feed, first=20, after=state['backfillCursor'], posted_after=None if feed else ALL_POSTS_SINCE))
+        await asyncio.to_thread(catalog.upsert, entries, feed)
+        state['backfillPages'] += 1
+        state['backfillCursor'] = info.get('endCursor') if info.get('hasNextPage') else BACKFILL_DONE
+        await asyncio.to_thread(catalog.set_state, feed, state)
+        await asyncio.sleep(CATALOG_PAGE_DELAY)
+
+    after = None
+    for _ in range(CATALOG_SYNC_PAGES):
+        if not await _quota_clear():
+            return False
+        entries, info = await _fetch_page(_posts_query(feed, first=20, after=after, order='NEWEST', posted_after=since))
+        await asyncio.to_thread(catalog.upsert, entries, feed)
+        _note_newest(state, entries)
+        after = info.get('endCursor')
+        if not info.get('hasNextPage') or not after:
+            break
+        await asyncio.sleep(CATALOG_PAGE_DELAY)
+    state['syncedAt'] = time.time()
+    await asyncio.to_thread(catalog.set_state, feed, state)
+    return True
+
 
-        if q in name:        score += 10
-        if q in tagline:     score += 6
-        if q in tags:        score += 5
-        if q in category:    score += 4
-        if q in subcategory: score += 4
-        if q in description: score += 2
+async def sync_catalog():
+    """One ingester run over every feed."""
+    synced = 0
+    for feed in CATALOG_FEEDS:
+        try:
+            if not await _sync_feed(feed):
+                log.info('Catalog sync paused: Product Hunt quota low')
+                break
+            synced += 1
+        except Exception as e:
+            log.warning(f"Catalog sync of {feed or 'all posts'!r} failed: {e}")
+    log.info(f'Catalog sync: {synced}/{len(CATALOG_FEEDS)} feeds up to date')
 
-        for word in q.split():
-            if len(word) > 2:
-                if word in name:    score += 3
-                if word in tagline: score += 2
-                if word in tags:    score += 2
 
-        if score > 0:
-            scored.append((score, post))
+_ingester = Ingester('ph_catalog', sync_catalog) if catalog is not None and PH_API_KEY else None
 
-    scored.sort(key=lambda x: (-x[0], -x[1].get('votes', 0)))
-    return [p for _, p in scored]
+
+def _local_posts(q, category, subcategory):
+    """The unfiltered result list from the local catalog; None unless the feeds it needs have
+    synced recently. Blocking SQLite reads: async callers run it in a worker thread."""
+    if catalog is None:
+        return None
+    if q:
+        if not catalog.ready(SEARCH_FEEDS):
+            return None
+        posts = catalog.search(q)
+        # Like the remote path: no keyword match lists everything instead
+        return catalog.browse() if posts == [] else posts
+    if subcategory and subcategory in SUBCATEGORY_TOPIC_MAP:
+        feed = SUBCATEGORY_TOPIC_MAP[subcategory]
+    elif category != 'all' and category in CATEGORY_TOPIC_MAP:
+        feed = CATEGORY_TOPIC_MAP[category]
+    else:
+        feed = ''
+    return catalog.browse(feed) if catalog.ready([feed]) else None
 
 
 # ═══════════════════════════════════════════════════════════════
 # ROUTES
 # ═══════════════════════════════════════════════════════════════
 
-@digital_bp.route('/api/digital/search', methods=['GET'])
-def digital_search():
-    q           = request.args.get('q', '', type=str).strip()
-    category    = request.args.get('category', 'all', type=str).strip().lower()
-    subcategory = request.args.get('subcategory', '', type=str).strip()
-    price       = request.args.get('price', 'All', type=str).strip()
-    sort        = request.args.get('sort', 'featured', type=str).strip()
-    page        = request.args.get('page', 1, type=int)
-    per_page    = min(request.args.get('per_page', 12, type=int), 20)
+async def _load_search(ck, q, category, subcategory, price, sort):
+    """Fetch, filter, sort, dedupe and cache a digital search result list. Failures are
+    negative-cached (and re-raised at once until that expires) instead."""
+    failed = _search_failed.get(ck)
+    if failed is not None:
+        raise RuntimeError(f'recent Product Hunt failure: {failed}')
+    try:
+        return await _fetch_search(ck, q, category, subcategory, price, sort)
+    except Exception as e:
+        _search_failed.set(ck, f'{type(e).__name__}: {e}')
+        raise
 
-    if not PH_API_KEY:
-        return jsonify({
-            'error': 'PRODUCT_HUNT_API_KEY not set. Add it to backend/.env',
-            'businesses': [], 'total': 0, 'page': 1, 'totalPages': 1
-        }), 500
 
-    ck = f"digital:{q}:{category}:{subcategory}:{price}:{sort}"
-    cached = _cache_get(ck)
+async def _fetch_remote(q, category, subcategory):
+    if q:
+        # Keyword search: the search topics' posts, ranked client-side. The corpus is
+        # shared (and indexed by position), so no match lists a copy of it
+        all_posts, index = await _search_corpus()
+        return index.search(q) or list(all_posts)
 
-    if cached is not None:
-        businesses = cached
-        log.info(f'Digital cache hit: {len(businesses)} results')
-    else:
-        log.info(f'Digital search: q={q!r} cat={category!r} sub={subcategory!r}')
-
-        if q:
-            # Keyword search: fetch from multiple topics, filter client-side
-            all_posts = []
-            seen_ids = set()
-            for topic in SEARCH_TOPICS[:6]:
-                posts = _fetch_all_pages(topic_slug=topic, max_pages=3)
-                for p in posts:
-                    if p['id'] not in seen_ids:
-                        seen_ids.add(p['id'])
-                        all_posts.append(p)
-            businesses = _keyword_filter(all_posts, q)
-            if not businesses:
-                businesses = all_posts
-
-        elif subcategory and subcategory in SUBCATEGORY_TOPIC_MAP:
-            topic_slug = SUBCATEGORY_TOPIC_MAP[subcategory]
-            businesses = _fetch_all_pages(topic_slug=topic_slug, max_pages=8)
-
-        elif category != 'all' and category in CATEGORY_TOPIC_MAP:
-            topic_slug = CATEGORY_TOPIC_MAP[category]
-            businesses = _fetch_all_pages(topic_slug=topic_slug, max_pages=8)
+    if subcategory and subcategory in SUBCATEGORY_TOPIC_MAP:
+        topic_slug = SUBCATEGORY_TOPIC_MAP[subcategory]
+        return await _fetch_all_pages(topic_slug=topic_slug, max_pages=8)
 
-        else:
-            businesses = _fetch_all_pages(topic_slug=None, max_pages=8)
-
-        # Price filter
-        if price and price != 'All':
-            businesses = [b for b in businesses if b['price'] == price]
-
-        # Sort
-        if sort == 'highest_rated':
-            businesses.sort(key=lambda b: b['rating'], reverse=True)
-        elif sort == 'most_votes':
-            businesses.sort(key=lambda b: b['votes'], reverse=True)
-        elif sort == 'most_reviews':
-            businesses.sort(key=lambda b: b['reviews'], reverse=True)
-        elif sort == 'name':
-            businesses.sort(key=lambda b: b['name'].lower())
-        else:
-            businesses.sort(key=lambda b: (not b['featured'], -b['votes']))
+    if category != 'all' and category in CATEGORY_TOPIC_MAP:
+        topic_slug = CATEGORY_TOPIC_MAP[category]
+        return await _fetch_all_pages(topic_slug=topic_slug, max_pages=8)
 
-        # Deduplicate
-        seen_names = set()
-        deduped = []
-        for b in businesses:
-            n = b['name'].lower().strip()
-            if n not in seen_names:
-                seen_names.add(n)
-                deduped.append(b)
-        businesses = deduped
+    return await _fetch_all_pages(topic_slug=None, max_pages=8)
 
-        _cache_set(ck, businesses)
-        log.info(f'Digital fetched & cached {len(businesses)} results')
+
+async def _fetch_search(ck, q, category, subcategory, price, sort):
+    log.info(f'Digital search: q={q!r} cat={category!r} sub={subcategory!r}')
+
+    businesses = await asyncio.to_thread(_local_posts, q, category, subcategory) if catalog is not None else None
+    if businesses is not None:
+        log.info(f'Digital search served from local catalog: {len(businesses)} posts')
+    else:
+        businesses = await _fetch_remote(q, category, subcategory)
+
+    # Price filter
+    if price and price != 'All':
+        businesses = [b for b in businesses if b['price'] == price]
+
+    # Sort
+    if sort == 'highest_rated':
+        businesses.sort(key=lambda b: b['rating'], reverse=True)
+    elif sort == 'most_votes':
+        businesses.sort(key=lambda b: b['votes'], reverse=True)
+    elif sort == 'most_reviews':
+        businesses.sort(key=lambda b: b['reviews'], reverse=True)
+    elif sort == 'name':
+        businesses.sort(key=lambda b: b['name'].lower())
+    else:
+        businesses.sort(key=lambda b: (not b['featured'], -b['votes']))
+
+    # Deduplicate
+    seen_names = set()
+    deduped = []
+    for b in businesses:
+        n = b['name'].lower().strip()
+        if n not in seen_names:
+            seen_names.add(n)
+            deduped.append(b)
+    businesses = deduped
+
+    _search_cache.set(ck, businesses)
+    log.info(f'Digital fetched & cached {len(businesses)} results')
+    return businesses
+
+
+@quota.tracked('/api/digital/search')
+async def digital_search_async(args):
+    """/api/digital/search handler shared by the Flask route and the ASGI app. Returns (payload, status)."""
+    q           = args.get('q', '', type=str).strip()
+    category    = args.get('category', 'all', type=str).strip().lower()
+    subcategory = args.get('subcategory', '', type=str).strip()
+    price       = args.get('price', 'All', type=str).strip()
+    sort        = args.get('sort', 'featured', type=str).strip()
+    page        = args.get('page', 1, type=int)
+    per_page    = min(args.get('per_page', 12, type=int), 20)
+
+    if not PH_API_KEY:
+        return {
+            'error': 'PRODUCT_HUNT_API_KEY not set. Add it to backend/.env',
+            'businesses': [], 'total': 0, 'page': 1, 'totalPages': 1
+        }, 500
+    if _ingester is not None:
+        _ingester.start()
+
+    ck = f"{q}:{category}:{subcategory}:{price}:{sort}"
+    hit = _search_cache.lookup(ck)
+
+    if hit is not None:
+        businesses, stale = hit
+        log.info(f'Digital cache hit: {len(businesses)} results{" (stale)" if stale else ""}')
+        if stale and quota.low('producthunt'):
+            log.info('Product Hunt quota low, serving stale without refresh')
+        elif stale:
+            # Serve stale now, refresh in the background
+            _search_refresh.submit(ck, lambda: aio.run(_search_flight.do_async(
+                ck, lambda: _load_search(ck, q, category, subcategory, price, sort))))
+    else:
+        # Concurrent misses for the same key share one Product Hunt fetch
+        stale = False
+        try:
+            businesses = await _search_flight.do_async(
+                ck, lambda: _load_search(ck, q, category, subcategory, price, sort))
+        except Exception as e:
+            log.error(f'Digital search error: {e}')
+            good = _search_cache.last_good(ck)
+            if good is None:
+                return {
+                    'error': 'Search failed. Please try again.',
+                    'businesses': [], 'total': 0, 'page': 1, 'totalPages': 1
+                }, 200
+            businesses, stale = good[0], True
+            log.warning(f'Serving last good digital results for {ck!r} ({(time.time() - good[1]) / 60:.0f} min old)')
 
     total       = len(businesses)
     total_pages = max(1, math.ceil(total / per_page))
     page        = max(1, min(page, total_pages))
     items       = businesses[(page - 1) * per_page: page * per_page]
 
-    return jsonify({
+    return {
         'businesses': items,
         'total':      total,
         'page':       page,
         'perPage':    per_page,
         'totalPages': total_pages,
-    })
+        'stale':      stale,
+    }, 200
+
+
+@digital_bp.route('/api/digital/search', methods=['GET'])
+def digital_search():
+    payload, status = aio.run(digital_search_async(request.args))
+    return jsonify(payload), status
 
 
 @digital_bp.route('/api/digital/product/<product_id>', methods=['GET'])
 def digital_product(product_id):
-    """Fetch a single digital product from cache."""
-    ck = f"digital_product:{product_id}"
-    cached = _cache_get(ck)
+    """Fetch a single digital product from cache or the local catalog."""
+    cached = _product_cache.get(product_id)
     if cached:
         return jsonify(cached)
 
-    with _cache_lock:
-        for key, val in _cache.items():
-            if key.startswith('digital:'):
-                for b in val.get('data', []):
-                    if b.get('id') == product_id:
-                        _cache_set(ck, b)
-                        return jsonify(b)
+    local = catalog.get(product_id) if catalog is not None else None
+    if local:
+        _product_cache.set(product_id, local)
+        return jsonify(local)
+
+    for _, businesses in _search_cache.items():
+        for b in businesses:
+            if b.get('id') == product_id:
+                _product_cache.set(product_id, b)
+                return jsonify(b)
 
     return jsonify({'error': 'Product not found'}), 404
 
@@ -489,4 +694,8 @@ def digital_categories():
 
 @digital_bp.route('/api/digital/health', methods=['GET'])
 def digital_health():
-    return jsonify({'status': 'ok', 'product_hunt_key_set': bool(PH_API_KEY)})
\ No newline at end of file
+    return jsonify({
+        'status': 'ok', 'product_hunt_key_set': bool(PH_API_KEY),
+        'catalog': catalog.stats() if catalog is not None else None,
+        'ingester': _ingester.stats() if _ingester is not None else None,
+    })
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+backend/gazetteer.py — in-process gazetteer for location autocomplete and reverse lookup
+
+- Places (name, admin1, country, lat, lng, population) load from a TSV: the
+  bundled data/gazetteer.tsv, or a GeoNames cities*.txt dump named by
+  GAZETTEER_PATH (detected by its column count)
+- Prefix index: sorted normalised names, plus every later word of a name
+  ("lake city" for Salt Lake City), searched with bisect. Full-name matches
+  rank first, then population; the top completions of short prefixes are
+  precomputed
+- k-d tree over unit-sphere (x, y, z) points for nearest-place lookup:
+  straight-line distance there orders places like great-circle distance
+- Benchmark: python gazetteer.py
+"""
+import os, math, time, bisect, heapq, logging, threading, unicodedata
+import numpy as np
+
+log = logging.getLogger('spark.gazetteer')
+
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.tsv'))
+GAZETTEER_REVERSE_MAX_KM = float(os.environ.get('GAZETTEER_REVERSE_MAX_KM', 30))
+PREFIX_TOP_LEN = 3      # prefixes up to this length have their completions precomputed
+PREFIX_TOP_K = 10
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def normalize(text):
+    """Lower-case, accents and punctuation stripped, whitespace collapsed ('St. George' → 'st george')."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def _unit(lat, lng):
+    phi, lam = np.radians(lat), np.radians(lng)
+    return np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+
+
+def _read(path):
+    """Rows of (name, admin1, country, lat, lng, population) from either file format."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            cols = line.rstrip('\n').split('\t')
+            try:
+                if len(cols) >= 15:
+                    # GeoNames: id, name, asciiname, alternates, lat, lng, class, code, country, cc2, admin1, …, population
+                    yield cols[1], cols[10], cols[8], float(cols[4]), float(cols[5]), int(cols[14] or 0)
+                else:
+                    yield cols[0], cols[1], cols[2], float(cols[3]), float(cols[4]), int(cols[5] or 0)
+            except (IndexError, ValueError):
+                continue
+
+
+# ─── k-d tree ──────────────────────────────────────────────────
+class KDTree:
+    """Static k-d tree stored implicitly: each [lo, hi) range of `order` has its split point at the middle."""
+
+    def __init__(self, points):
+        n = len(points)
+        order = np.arange(n)
+        axes = np.zeros(n, dtype=np.int8)
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= 1:
+                continue
+            pts = points[order[lo:hi]]
+            axis = int(np.argmax(np.ptp(pts, axis=0)))
+            mid = (lo + hi) // 2
+            order[lo:hi] = order[lo:hi][np.argpartition(pts[:, axis], mid - lo)]
+            axes[mid] = axis
+            stack += [(lo, mid), (mid + 1, hi)]
+        # Python lists: scalar indexing in the query loop is several times faster than on arrays
+        self.order = order.tolist()
+        self.axes = axes.tolist()
+        self.points = points.tolist()
+
+    def nearest(self, p):
+        """(index, squared chord distance) of the point closest to p."""
+        best_d, best_i = math.inf, -1
+        order, axes, points = self.order, self.axes, self.points
+        # (lo, hi, squared distance from p to the range's splitting plane: a lower bound)
+        stack = [(0, len(order), 0.0)]
+        while stack:
+            lo, hi, bound = stack.pop()
+            if lo >= hi or bound >= best_d:
+                continue
+            mid = (lo + hi) // 2
+            i = order[mid]
+            q = points[i]
+            d = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+            if d < best_d:
+                best_d, best_i = d, i
+            diff = p[axes[mid]] - q[axes[mid]]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            stack.append(far + (diff * diff,))
+            stack.append(near + (bound,))
+        return best_i, best_d
+
+
+# ─── Gazetteer ─────────────────────────────────────────────────
+class Gazetteer:
+    def __init__(self, rows):
+        rows = list(rows)
+        self.names = [r[0] for r in rows]
+        self.regions = [r[1] for r in rows]
+        self.countries = [r[2] for r in rows]
+        self.lat = [r[3] for r in rows]
+        self.lng = [r[4] for r in rows]
+        self.population = [r[5] for r in rows]
+        self._norm_regions = [normalize(r) for r in self.regions]
+
+        # Prefix index: (text, rank, id) with rank 1 for the full name, 0 for a later word
+        keys = []
+        self._by_label = {}
+        for i, name in enumerate(self.names):
+            words = normalize(name).split()
+            if not words:
+                continue
+            keys.append((' '.join(words), 1, i))
+            keys.extend((' '.join(words[w:]), 0, i) for w in range(1, len(words)))
+            for label in (' '.join(words), f"{' '.join(words)} {self._norm_regions[i]}"):
+                j = self._by_label.get(label)
+                if j is None or self.population[i] > self.population[j]:
+                    self._by_label[label] = i
+        keys.sort()
+        self._keys = [k[0] for k in keys]
+        self._entries = [(k[1], k[2]) for k in keys]
+        self._top = {}
+        for text, (rank, i) in zip(self._keys, self._entries):
+            for n in range(1, min(PREFIX_TOP_LEN, len(text)) + 1):
+                self._top.setdefault(text[:n], {})
+                found = self._top[text[:n]]
+                found[i] = max(found.get(i, 0), rank)
+        self._top = {p: self._rank(found.items(), PREFIX_TOP_K) for p, found in self._top.items()}
+
+        self.tree = KDTree(_unit(np.array(self.lat), np.array(self.lng))) if rows else None
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        t0 = time.perf_counter()
+        gaz = cls(_read(path))
+        log.info(f"Gazetteer: {len(gaz)} places from {os.path.basename(path)} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return gaz
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rank(self, matches, limit):
+        """Ids from (id, rank) pairs: full-name matches first, then by population."""
+        pop = self.population
+        return [i for i, _ in heapq.nlargest(limit, matches, key=lambda m: (m[1], pop[m[0]]))]
+
+    def place(self, i, distance_km=None):
+        region = self.regions[i] if self.countries[i] == 'US' else self.countries[i]
+        out = {
+            'label': f"{self.names[i]}, {region}" if region else self.names[i],
+            'name': self.names[i],
+            'region': self.regions[i],
+            'country': self.countries[i],
+            'lat': self.lat[i],
+            'lng': self.lng[i],
+            'population': self.population[i],
+        }
+        if distance_km is not None:
+            out['distanceKm'] = round(distance_km, 2)
+        return out
+
+    def suggest(self, q, limit=5):
+        """Places whose name (or a later word of it) starts with q. "name, region" narrows by region prefix."""
+        name, _, region = (q or '').partition(',')
+        prefix, region = normalize(name), normalize(region)
+        if not prefix:
+            return []
+        if not region and len(prefix) <= PREFIX_TOP_LEN and limit <= PREFIX_TOP_K:
+            ids = self._top.get(prefix, [])[:limit]
+        else:
+            lo = bisect.bisect_left(self._keys, prefix)
+            hi = bisect.bisect_left(self._keys, prefix + '\uffff', lo)
+            found = {}
+            for rank, i in self._entries[lo:hi]:
+                if region and not self._norm_regions[i].startswith(region):
+                    continue
+                found[i] = max(found.get(i, 0), rank)
+            ids = self._rank(found.items(), limit)
+        return [self.place(i) for i in ids]
+
+    def lookup(self, q):
+        """Exact "name" or "name, region" match (most populous on ties), else None."""
+        i = self._by_label.get(normalize(q))
+        return self.place(i) if i is not None else None
+
+    def nearest(self, lat, lng, max_km=GAZETTEER_REVERSE_MAX_KM):
+        """Closest place to (lat, lng) within max_km, with its distanceKm; None if there is none."""
+        if self.tree is None:
+            return None
+        i, d2 = self.tree.nearest(_unit(lat, lng)[0].tolist())
+        km = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(d2) / 2))
+        return self.place(i, km) if km <= max_km else None
+
+    def stats(self):
+        return {'places': len(self), 'prefixKeys': len(self._keys), 'precomputedPrefixes': len(self._top)}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+def get():
+    """The process-wide gazetteer, loaded from GAZETTEER_PATH on first use (empty if unreadable)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                try:
+                    _default = Gazetteer.load()
+                except OSError as e:
+                    log.warning(f"Gazetteer unavailable ({e}); location lookups fall back to Google")
+                    _default = Gazetteer([])
+    return _default
+
+
+if __name__ == '__main__':
+    import random
+    logging.basicConfig(level=logging.INFO)
+    gaz = get()
+    queries = ['s', 'sa', 'salt', 'salt lake', 'south j', 'lake', 'new', 'st g', 'provo, ut', 'springfield']
+    n = 20000
+    t0 = time.perf_counter()
+    for k in range(n):
+        gaz.suggest(queries[k % len(queries)])
+    print(f"suggest: {(time.perf_counter() - t0) / n * 1e6:.1f} µs/query")
+    rng = random.Random(1)
+    points = [(rng.uniform(25, 49), rng.uniform(-124, -67)) for _ in range(n)]
+    t0 = time.perf_counter()
+    tree_hits = [gaz.nearest(lat, lng, max_km=math.inf)['name'] for lat, lng in points[:2000]]
+    print(f"nearest (k-d tree): {(time.perf_counter() - t0) / 2000 * 1e6:.1f} µs/query")
+    # Brute force over the same unit vectors, to check the tree
+    xyz = _unit(np.array(gaz.lat), np.array(gaz.lng))
+    t0 = time.perf_counter()
+    brute = [gaz.names[int(np.argmin(((xyz - _unit(lat, lng)[0]) ** 2).sum(axis=1)))] for lat, lng in points[:2000]]
+    print(f"nearest (brute force NumPy): {(time.perf_counter() - t0) / 2000 * 1e6:.1f} µs/query")
+    print(f"tree == brute force: {tree_hits == brute}")
+    # GeoNames-sized point set (cities500 has ~200k places)
+    big = _unit(np.array([rng.uniform(-60, 70) for _ in range(200000)]), np.array([rng.uniform(-180, 180) for _ in range(200000)]))
+    tree = KDTree(big)
+    probes = [_unit(lat, lng)[0] for lat, lng in points[:500]]
+    t0 = time.perf_counter()
+    tree_hits = [tree.nearest(v.tolist())[0] for v in probes]
+    print(f"200k points, k-d tree: {(time.perf_counter() - t0) / 500 * 1e6:.1f} µs/query")
+    t0 = time.perf_counter()
+    brute = [int(np.argmin(((big - v) ** 2).sum(axis=1))) for v in probes]
+    print(f"200k points, brute force: {(time.perf_counter() - t0) / 500 * 1e6:.1f} µs/query, same: {tree_hits == brute}")
+    print(gaz.suggest('salt lake'), gaz.nearest(40.56, -111.93), gaz.lookup('Sandy, UT'), sep='\n')
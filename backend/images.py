@@ -0,0 +1,224 @@
+"""
+backend/images.py — caching, streaming image proxy backend
+
+- Bodies are kept under IMAGE_CACHE_DIR as one file per key (named by the
+  key's SHA-1) plus a small JSON sidecar with the content type; total size
+  is bounded by IMAGE_CACHE_MAX_BYTES with LRU eviction, and the index is
+  rebuilt from disk at start. Set IMAGE_CACHE_DIR= (empty) to disable;
+  a directory that can't be created disables it too (with a warning)
+- A miss is streamed to the client chunk by chunk while it is written to
+  a temp file, which is only committed once the whole body has arrived
+- ETags derive from the key: a key (deal id + geometry, photo reference +
+  size) always names the same image, so 304s need no disk access
+- warm() fetches images into the cache in the background, ahead of the
+  browser asking for them
+"""
+import os, json, time, hashlib, logging, threading
+from collections import OrderedDict
+
+import upstream
+from refresh import Refresher
+
+log = logging.getLogger('spark.images')
+
+IMAGE_CACHE_DIR        = os.environ.get('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'images'))
+IMAGE_CACHE_MAX_BYTES  = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGE_CACHE_MAX_OBJECT = int(os.environ.get('IMAGE_CACHE_MAX_OBJECT', 4 * 1024 * 1024))
+IMAGE_TIMEOUT          = float(os.environ.get('IMAGE_TIMEOUT', 10))
+CHUNK_SIZE = 64 * 1024
+
+
+def digest(key):
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def etag(key):
+    return f'"{digest(key)[:20]}"'
+
+
+class ImageCache:
+    """Size-bounded LRU of image bodies on disk: key digest → (size, content type)."""
+
+    def __init__(self, root, max_bytes=IMAGE_CACHE_MAX_BYTES, max_object=IMAGE_CACHE_MAX_OBJECT):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_object = max_object
+        self.bytes = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'misses', 'stores', 'aborted', 'evictions', 'vanished'), 0)
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _path(self, d):
+        return os.path.join(self.root, d)
+
+    def _load(self):
+        found = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            d = name[:-5]
+            try:
+                with open(path) as f:
+                    meta = json.load(f)
+                st = os.stat(self._path(d))
+            except (OSError, ValueError):
+                continue
+            found.append((st.st_mtime, d, st.st_size, meta.get('type', 'image/jpeg')))
+        for _, d, size, ctype in sorted(found):
+            self._index[d] = (size, ctype)
+            self.bytes += size
+        with self._lock:
+            self._evict()
+        if found:
+            log.info(f"Image cache: {len(self._index)} files, {self.bytes // 1024} KiB")
+
+    def _remove(self, d):
+        size, _ = self._index.pop(d)
+        self.bytes -= size
+        for path in (self._path(d), self._path(d) + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self._index and self.bytes > self.max_bytes:
+            self._remove(next(iter(self._index)))
+            self.counters['evictions'] += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return digest(key) in self._index
+
+    def get(self, key):
+        """(path, content type) for a cached key, else None."""
+        d = digest(key)
+        with self._lock:
+            entry = self._index.get(d)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._index.move_to_end(d)
+            self.counters['hits'] += 1
+        return self._path(d), entry[1]
+
+    def forget(self, key):
+        """Drop a key whose file turned out to be gone (evicted by another thread, or deleted)."""
+        d = digest(key)
+        with self._lock:
+            if d in self._index:
+                self._remove(d)
+            self.counters['vanished'] += 1
+
+    def fill(self, key, chunks, content_type):
+        """Pass `chunks` through, writing them to disk; the file is committed only if all arrive."""
+        d = digest(key)
+        tmp = self._path(f"{d}.{threading.get_ident()}.tmp")
+        size, f = 0, open(tmp, 'wb')
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if f is not None and size > self.max_object:
+                    f.close()
+                    f = None
+                elif f is not None:
+                    f.write(chunk)
+                yield chunk
+            if f is not None:
+                f.close()
+                f = None
+                with open(self._path(d) + '.json', 'w') as meta:
+                    json.dump({'type': content_type, 'at': int(time.time())}, meta)
+                os.replace(tmp, self._path(d))
+                with self._lock:
+                    if d in self._index:
+                        self.bytes -= self._index.pop(d)[0]
+                    self._index[d] = (size, content_type)
+                    self.bytes += size
+                    self.counters['stores'] += 1
+                    self._evict()
+        finally:
+            if f is not None:
+                f.close()
+                with self._lock:
+                    self.counters['aborted'] += 1
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, files=len(self._index), bytes=self.bytes, maxBytes=self.max_bytes)
+
+
+def _open(root):
+    if not root:
+        return None
+    try:
+        return ImageCache(root)
+    except OSError as e:
+        log.warning(f"Image cache disabled ({root}): {e}")
+        return None
+
+
+store = _open(IMAGE_CACHE_DIR)
+_warmer = Refresher('image_warm')
+
+
+def _read(f):
+    with f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _body(resp):
+    try:
+        yield from resp.iter_bytes(CHUNK_SIZE)
+    finally:
+        resp.close()
+
+
+def fetch(key, url, **kwargs):
+    """(status, content type, body chunks) for an image: from disk, else streamed from
+    `url` through the cache. A non-200 upstream status comes back with no body."""
+    hit = store.get(key) if store is not None else None
+    if hit is not None:
+        # Opened here, not on first read: once open, the body survives a concurrent eviction
+        try:
+            return 200, hit[1], _read(open(hit[0], 'rb'))
+        except FileNotFoundError:
+            store.forget(key)
+    resp = upstream.get(url, stream=True, timeout=IMAGE_TIMEOUT, **kwargs)
+    if resp.status_code != 200:
+        resp.close()
+        return resp.status_code, None, iter(())
+    content_type = resp.headers.get('Content-Type', 'image/jpeg')
+    body = _body(resp)
+    return 200, content_type, (store.fill(key, body, content_type) if store is not None else body)
+
+
+def warm(key, url, **kwargs):
+    """Fetch an image into the cache in the background unless it is already there."""
+    if store is None or key in store:
+        return False
+
+    def run():
+        status, _, body = fetch(key, url, **kwargs)
+        for _ in body:
+            pass
+        if status != 200:
+            log.debug(f"Warming {key!r}: HTTP {status}")
+
+    return _warmer.submit(key, run)
+
+
+def stats():
+    return store.stats() if store is not None else None
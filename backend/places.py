@@ -0,0 +1,155 @@
+"""
+backend/places.py — process-wide canonical store of parsed Google places
+
+Each place is kept once, keyed by Google place id, as a compact
+__slots__ record whose repetitive strings (category, subcategory, tag
+labels, features, price level) are interned. Search cache entries hold
+only ordered id lists plus per-query distances and are materialised
+against this store, so the same business no longer appears in dozens of
+cached result lists. Records are also written to the persistent cache
+tier (namespace 'place') so id lists loaded after a restart resolve.
+Fresh lookups read persisted rows up to PLACE_L2_TTL old; last-good
+lookups (serving a stale search through an outage) take any row the tier
+still keeps, as old as the search entries it is asked to resolve.
+"""
+import os, sys, time, threading
+from collections import OrderedDict
+
+PLACE_STORE_MAX = int(os.environ.get('PLACE_STORE_MAX', 50000))
+PLACE_L2_TTL    = int(os.environ.get('PLACE_L2_TTL', 24 * 3600))
+
+_intern = sys.intern
+
+
+class PlaceRecord:
+    __slots__ = ('id', 'name', 'category', 'subcategory', 'lat', 'lng', 'location', 'address',
+                 'phone', 'website', 'opening_hours', 'description', 'rating', 'review_count',
+                 'image', 'tag_labels', 'features', 'price_level')
+
+    @classmethod
+    def from_business(cls, biz):
+        r = cls()
+        r.id = biz['id']
+        r.name = biz['name']
+        r.category = _intern(biz['category'])
+        r.subcategory = _intern(biz['subcategory'])
+        r.lat = biz['lat']
+        r.lng = biz['lng']
+        r.location = biz['location']
+        r.address = biz['address']
+        r.phone = biz['phone']
+        r.website = biz['website']
+        r.opening_hours = biz['openingHours']
+        r.description = biz['description']
+        r.rating = biz['rating']
+        r.review_count = biz['reviewCount']
+        r.image = biz['image']
+        r.tag_labels = tuple(_intern(t) for t in biz['tagLabels'])
+        r.features = tuple(_intern(f) for f in biz['features'])
+        r.price_level = _intern(biz['priceLevel'])
+        return r
+
+    def to_business(self, distance):
+        """Same dict shape parse_google_place returns."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'subcategory': self.subcategory,
+            'lat': self.lat,
+            'lng': self.lng,
+            'location': self.location,
+            'address': self.address,
+            'phone': self.phone,
+            'website': self.website,
+            'openingHours': self.opening_hours,
+            'description': self.description,
+            'rating': self.rating,
+            'reviewCount': self.review_count,
+            'image': self.image,
+            'isVerified': True,
+            'distanceMeters': round(distance),
+            'tagLabels': list(self.tag_labels),
+            'features': list(self.features),
+            'priceLevel': self.price_level,
+        }
+
+    def nbytes(self):
+        """Approximate footprint, not counting interned strings."""
+        n = sys.getsizeof(self) + sys.getsizeof(self.tag_labels) + sys.getsizeof(self.features)
+        for attr in ('id', 'name', 'location', 'address', 'phone', 'website',
+                     'opening_hours', 'description', 'image'):
+            n += sys.getsizeof(getattr(self, attr))
+        return n
+
+
+class PlaceStore:
+    """Bounded LRU map: place id → PlaceRecord, with optional write-through to the persistent tier."""
+
+    def __init__(self, max_places=PLACE_STORE_MAX, l2=None):
+        self.max_places = max_places
+        self.l2 = l2
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('puts', 'hits', 'misses', 'l2Hits', 'evictions'), 0)
+
+    def _insert(self, record):
+        self._records[record.id] = record
+        self._records.move_to_end(record.id)
+        while len(self._records) > self.max_places:
+            self._records.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def put_many(self, businesses):
+        """Store parsed business dicts (newest data wins); returns their records in order."""
+        records = [PlaceRecord.from_business(b) for b in businesses]
+        with self._lock:
+            for record in records:
+                self._insert(record)
+            self.counters['puts'] += len(records)
+        if self.l2 is not None and records:
+            self.l2.set_many('place', [(r.id, r.to_business(0)) for r in records], time.time())
+        return records
+
+    def get(self, place_id, last_good=False):
+        with self._lock:
+            record = self._records.get(place_id)
+            if record is not None:
+                self._records.move_to_end(place_id)
+                self.counters['hits'] += 1
+                return record
+            self.counters['misses'] += 1
+        if self.l2 is None:
+            return None
+        hit = self.l2.get('place', place_id, self.l2.max_age if last_good else PLACE_L2_TTL)
+        if hit is None:
+            return None
+        record = PlaceRecord.from_business(hit[0])
+        with self._lock:
+            self._insert(record)
+            self.counters['l2Hits'] += 1
+        return record
+
+    def get_many(self, place_ids, last_good=False):
+        """Records in order, or None if any id can no longer be resolved."""
+        out = []
+        for pid in place_ids:
+            record = self.get(pid, last_good)
+            if record is None:
+                return None
+            out.append(record)
+        return out
+
+    def stats(self):
+        with self._lock:
+            records = list(self._records.values())
+            counters = dict(self.counters)
+        interned = set()
+        for r in records:
+            interned.update((r.category, r.subcategory, r.price_level) + r.tag_labels + r.features)
+        return dict(counters,
+                    places=len(records),
+                    maxPlaces=self.max_places,
+                    bytes=sum(r.nbytes() for r in records),
+                    internedStrings=len(interned),
+                    internedBytes=sum(sys.getsizeof(s) for s in interned))
@@ -0,0 +1,236 @@
+"""
+backend/quota.py — process-wide upstream quota governor
+
+- One token bucket per upstream SKU (Places searchNearby / searchText /
+  details / photo media, Geocoding, DiscountAPI, Product Hunt GraphQL), shared by every
+  thread and event loop; rates via QUOTA_<SKU>_PER_MIN / QUOTA_<SKU>_BURST
+- upstream.py takes a token before every attempt. An empty bucket queues
+  the caller for up to QUOTA_MAX_WAIT seconds, then raises QuotaExceeded
+- Callers degrade before that point: low(sku) is true once a bucket drops
+  under QUOTA_RESERVE of its burst, and is used to skip optional work
+  (extra category queries, deal photo enrichment, image warming, stale refreshes)
+- Cost ledger: calls and estimated USD per SKU, per minute (last
+  QUOTA_LEDGER_MINUTES) and per request (track())
+"""
+import os, time, asyncio, logging, functools, threading, contextvars
+from collections import Counter, deque, OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+log = logging.getLogger('spark.quota')
+
+QUOTA_MAX_WAIT       = float(os.environ.get('QUOTA_MAX_WAIT', 2.0))
+QUOTA_RESERVE        = float(os.environ.get('QUOTA_RESERVE', 0.25))
+QUOTA_LEDGER_MINUTES = int(os.environ.get('QUOTA_LEDGER_MINUTES', 60))
+QUOTA_RECENT         = int(os.environ.get('QUOTA_RECENT', 50))
+
+# sku → (calls per minute, burst, estimated USD per call)
+SKUS = {
+    'places_nearby':  (600, 60, 0.032),
+    'places_text':    (600, 60, 0.032),
+    'places_details': (600, 60, 0.017),
+    'places_photo':   (600, 60, 0.007),
+    'geocode':        (1500, 100, 0.005),
+    'discountapi':    (120, 20, 0.0),
+    'producthunt':    (60, 15, 0.0),
+}
+
+
+def _env(sku, name, default):
+    return float(os.environ.get(f'QUOTA_{sku.upper()}_{name}', default))
+
+
+def sku_for(method, url):
+    """The metered SKU an upstream URL belongs to, or None for unmetered hosts."""
+    parts = urlsplit(url)
+    host, path = parts.hostname or '', parts.path
+    if host == 'places.googleapis.com':
+        if path.endswith(':searchNearby'):
+            return 'places_nearby'
+        if path.endswith(':searchText'):
+            return 'places_text'
+        if path.startswith('/v1/places/') and path.endswith('/media'):
+            return 'places_photo'
+        if path.startswith('/v1/places/'):
+            return 'places_details'
+        return None
+    if host == 'maps.googleapis.com' and path.startswith('/maps/api/geocode'):
+        return 'geocode'
+    if host == 'api.discountapi.com' and not path.endswith('/image'):
+        return 'discountapi'
+    if host == 'api.producthunt.com':
+        return 'producthunt'
+    return None
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, sku, wait):
+        super().__init__(f"{sku} quota exhausted (next token in {wait:.1f}s)")
+        self.sku = sku
+        self.wait = wait
+
+
+# ─── Token bucket ──────────────────────────────────────────────
+class TokenBucket:
+    def __init__(self, sku, per_minute, burst, cost):
+        self.sku = sku
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.cost = cost
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('granted', 'queued', 'rejected'), 0)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        """Take a token if one is available; otherwise return seconds until the next one."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.counters['granted'] += 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def level(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens / self.burst
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return dict(self.counters, perMinute=round(self.rate * 60), burst=self.burst,
+                        tokens=round(self.tokens, 2), costPerCall=self.cost)
+
+
+_buckets = {sku: TokenBucket(sku, _env(sku, 'PER_MIN', rpm), _env(sku, 'BURST', burst), _env(sku, 'COST', cost))
+            for sku, (rpm, burst, cost) in SKUS.items()}
+
+
+def low(sku):
+    """True once `sku`'s bucket is below the reserve kept for essential calls."""
+    bucket = _buckets.get(sku)
+    return bucket is not None and bucket.level() < QUOTA_RESERVE
+
+
+# ─── Ledger ────────────────────────────────────────────────────
+_ledger_lock = threading.Lock()
+_minutes = OrderedDict()          # epoch minute → Counter(sku → calls)
+_totals = Counter()
+_recent = deque(maxlen=QUOTA_RECENT)
+_current = contextvars.ContextVar('spark_quota_request', default=None)
+
+
+def _record(sku):
+    minute = int(time.time() // 60)
+    with _ledger_lock:
+        _minutes.setdefault(minute, Counter())[sku] += 1
+        while len(_minutes) > QUOTA_LEDGER_MINUTES:
+            _minutes.popitem(last=False)
+        _totals[sku] += 1
+    calls = _current.get()
+    if calls is not None:
+        calls[sku] += 1
+
+
+def _cost(calls):
+    return round(sum(n * _buckets[sku].cost for sku, n in calls.items()), 4)
+
+
+@contextmanager
+def track(label):
+    """Attribute upstream calls made inside the block (and tasks it spawns) to one request."""
+    calls = Counter()
+    token = _current.set(calls)
+    t0 = time.perf_counter()
+    try:
+        yield calls
+    finally:
+        _current.reset(token)
+        if calls:
+            entry = {'request': label, 'calls': dict(calls), 'cost': _cost(calls),
+                     'ms': round((time.perf_counter() - t0) * 1000), 'at': int(time.time())}
+            with _ledger_lock:
+                _recent.append(entry)
+            log.info(f"{label}: {sum(calls.values())} upstream calls, est. ${entry['cost']}")
+
+
+def tracked(label):
+    """Decorator form of track() for route handlers, sync or async."""
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def inner(*args, **kwargs):
+                with track(label):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with track(label):
+                    return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ─── Acquire ───────────────────────────────────────────────────
+def acquire(method, url, max_wait=QUOTA_MAX_WAIT):
+    """Take a token for the URL's SKU, sleeping up to max_wait; raises QuotaExceeded."""
+    sku = sku_for(method, url)
+    if sku is None:
+        return None
+    bucket = _buckets[sku]
+    deadline = time.monotonic() + max_wait
+    wait = bucket.try_take()
+    if wait:
+        bucket.count('queued')
+    while wait:
+        if time.monotonic() + wait > deadline:
+            bucket.count('rejected')
+            raise QuotaExceeded(sku, wait)
+        time.sleep(wait)
+        wait = bucket.try_take()
+    _record(sku)
+    return sku
+
+
+async def aacquire(method, url, max_wait=QUOTA_MAX_WAIT):
+    """acquire() for coroutines: waits with asyncio.sleep."""
+    sku = sku_for(method, url)
+    if sku is None:
+        return None
+    bucket = _buckets[sku]
+    deadline = time.monotonic() + max_wait
+    wait = bucket.try_take()
+    if wait:
+        bucket.count('queued')
+    while wait:
+        if time.monotonic() + wait > deadline:
+            bucket.count('rejected')
+            raise QuotaExceeded(sku, wait)
+        await asyncio.sleep(wait)
+        wait = bucket.try_take()
+    _record(sku)
+    return sku
+
+
+def stats():
+    with _ledger_lock:
+        minutes = [(m, dict(c)) for m, c in _minutes.items()]
+        totals = dict(_totals)
+        recent = list(_recent)
+    return {
+        'config': {'maxWait': QUOTA_MAX_WAIT, 'reserve': QUOTA_RESERVE},
+        'skus': {sku: dict(b.stats(), calls=totals.get(sku, 0), low=low(sku)) for sku, b in _buckets.items()},
+        'estimatedCost': _cost(totals),
+        'perMinute': [{'minute': m * 60, 'calls': c, 'cost': _cost(c)} for m, c in minutes],
+        'recentRequests': recent,
+    }
@@ -0,0 +1,68 @@
+"""
+backend/refresh.py — bounded background refresh for stale-while-revalidate
+
+A stale cache entry is served immediately and its key handed to a
+Refresher, which re-runs the fetch on a small worker pool. Refreshes are
+deduplicated per key, at most `workers` run at once and at most
+`max_pending` may be queued; anything beyond that is dropped (the entry is
+simply refreshed by a later request).
+"""
+import os, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger('spark.refresh')
+
+SWR_REFRESH_WORKERS = int(os.environ.get('SWR_REFRESH_WORKERS', 4))
+SWR_MAX_PENDING     = int(os.environ.get('SWR_MAX_PENDING', 64))
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Refresher:
+    def __init__(self, name, workers=SWR_REFRESH_WORKERS, max_pending=SWR_MAX_PENDING):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'refresh-{name}')
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('scheduled', 'deduped', 'dropped', 'succeeded', 'failed'), 0)
+        with _registry_lock:
+            _registry[name] = self
+
+    def submit(self, key, fn):
+        """Schedule fn() to refresh `key` unless a refresh is already pending. Returns True if scheduled."""
+        with self._lock:
+            if key in self._pending:
+                self.counters['deduped'] += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.counters['dropped'] += 1
+                return False
+            self._pending.add(key)
+            self.counters['scheduled'] += 1
+        self._pool.submit(self._run, key, fn)
+        return True
+
+    def _run(self, key, fn):
+        try:
+            fn()
+        except Exception as e:
+            log.warning(f"{self.name} refresh failed for {key!r}: {e}")
+            outcome = 'failed'
+        else:
+            outcome = 'succeeded'
+        with self._lock:
+            self._pending.discard(key)
+            self.counters[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending), workers=self.workers)
+
+
+def stats():
+    with _registry_lock:
+        refreshers = list(_registry.values())
+    return {r.name: r.stats() for r in refreshers}
@@ -0,0 +1,167 @@
+"""
+backend/resultset.py — columnar, NumPy-backed views of cached search results
+
+A search cache entry stays a small JSON-able dict (id list + distances from
+its own centre). Alongside it, a ResultSet keeps the same places as column
+arrays — lat, lng, rating, reviewCount, price level, chain flag — so
+re-ranking from a new centre (haversine distance, radius cut, multi-key
+sort, threshold filters) runs as a handful of NumPy batch operations.
+Business dicts are only built for the page actually returned.
+
+Categorical filters (subcategory, features, price) and facet counts are
+evaluated against per-set roaring bitmap indexes, built lazily the first
+time a set is filtered; sorts are NumPy lexsorts over the columns.
+"""
+import numpy as np
+from pyroaring import BitMap
+
+EARTH_RADIUS_M = 6371008.8
+
+# parse_google_place price strings → ordinal level (-1 = unknown)
+PRICE_LEVELS = {'Free': 0, '$': 1, '$$': 2, '$$$': 3, '$$$$': 4}
+
+SORTS = ('relevance', 'distance', 'rating', 'reviews')
+# minRating thresholds reported in the rating facet
+RATING_FACETS = (3.0, 3.5, 4.0, 4.5)
+
+
+def haversine_m(lat, lng, lats, lngs):
+    """Great-circle distance in metres from one point to arrays of points."""
+    p1 = np.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lngs - lng)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class ResultSet:
+    """Column arrays over an ordered list of PlaceRecords."""
+
+    def __init__(self, records, is_chain, lat, lng, dist):
+        n = len(records)
+        self.records = records
+        self.lat = np.fromiter((r.lat for r in records), np.float64, n)
+        self.lng = np.fromiter((r.lng for r in records), np.float64, n)
+        self.rating = np.fromiter((np.nan if r.rating is None else r.rating for r in records), np.float32, n)
+        self.review_count = np.fromiter((r.review_count or 0 for r in records), np.int32, n)
+        self.price = np.fromiter((PRICE_LEVELS.get(r.price_level, -1) for r in records), np.int8, n)
+        self.chain = np.fromiter((is_chain(r.name) for r in records), np.bool_, n)
+        # Distances from the centre the set was fetched for
+        self.center = (lat, lng)
+        self.dist = np.asarray(dist, dtype=np.float64)
+        self._index = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.lat, self.lng, self.rating, self.review_count,
+                                      self.price, self.chain, self.dist)) + 8 * len(self.records)
+
+    def distances(self, lat, lng):
+        if (lat, lng) == self.center:
+            return self.dist
+        return haversine_m(lat, lng, self.lat, self.lng)
+
+    def index(self):
+        """Facet → value → BitMap of rows, built on first use."""
+        if self._index is None:
+            rows = {'subcategory': {}, 'features': {}, 'price': {}}
+            for i, r in enumerate(self.records):
+                rows['subcategory'].setdefault(r.subcategory, []).append(i)
+                for f in r.features:
+                    rows['features'].setdefault(f, []).append(i)
+                if r.price_level:
+                    rows['price'].setdefault(r.price_level, []).append(i)
+            self._index = {facet: {value: BitMap(ids) for value, ids in values.items()}
+                           for facet, values in rows.items()}
+        return self._index
+
+    def filter_bitmaps(self, filters):
+        """One BitMap per active filter; subcategory/price match any value, features all."""
+        index = self.index()
+        out = {}
+        if filters.get('minRating') is not None:
+            out['rating'] = _bitmap(self.rating >= filters['minRating'])
+        for facet in ('subcategory', 'price'):
+            if filters.get(facet):
+                out[facet] = BitMap.union(BitMap(), *(index[facet].get(v, BitMap()) for v in filters[facet]))
+        if filters.get('features'):
+            out['features'] = BitMap.intersection(*(index['features'].get(f, BitMap()) for f in filters['features']))
+        return out
+
+    def facets(self, base, selected):
+        """Facet value counts over `base` rows. Each facet ignores its own filter (so siblings stay
+        selectable) but honours all the others."""
+        def others(facet):
+            rest = [bm for name, bm in selected.items() if name != facet]
+            return BitMap.intersection(base, *rest) if rest else base
+        out = {facet: {value: others(facet).intersection_cardinality(bm) for value, bm in values.items()}
+               for facet, values in self.index().items()}
+        in_rating = others('rating')
+        out['rating'] = {f'{t:g}': in_rating.intersection_cardinality(_bitmap(self.rating >= t))
+                         for t in RATING_FACETS}
+        return {facet: {v: n for v, n in counts.items() if n} for facet, counts in out.items()}
+
+    def rank(self, lat, lng, radius, filters=None, sort='relevance', facets=False):
+        """Rows within `radius` of (lat, lng) passing `filters`, in `sort` order.
+
+        relevance: small businesses first, then by distance; rating / reviews:
+        best first, ties by distance. With facets=True the Ranking also carries
+        facet counts for the rows inside the radius.
+        """
+        dist = np.rint(self.distances(lat, lng))
+        inside = dist <= radius
+        counts = None
+        if filters or facets:
+            base = _bitmap(inside)
+            selected = self.filter_bitmaps(filters or {})
+            if facets:
+                counts = self.facets(base, selected)
+            chosen = BitMap.intersection(base, *selected.values()) if selected else base
+            rows = np.frombuffer(chosen.to_array(), dtype=np.uint32).astype(np.intp)
+        else:
+            rows = np.flatnonzero(inside)
+        # lexsort: last key is primary; stable, like the list sort it replaces
+        d = dist[rows]
+        if sort == 'distance':
+            keys = (d,)
+        elif sort == 'rating':
+            keys = (d, -self.review_count[rows], -np.nan_to_num(self.rating[rows], nan=-1.0))
+        elif sort == 'reviews':
+            keys = (d, -self.review_count[rows])
+        else:
+            keys = (d, self.chain[rows])
+        return Ranking(self, rows[np.lexsort(keys)], dist, counts)
+
+
+def _bitmap(mask):
+    return BitMap(np.flatnonzero(mask).astype(np.uint32))
+
+
+class Ranking:
+    """An ordered selection of ResultSet rows; materialises dicts a page at a time."""
+
+    __slots__ = ('rs', 'order', 'dist', 'facets')
+
+    def __init__(self, rs, order, dist, facets=None):
+        self.rs = rs
+        self.order = order
+        self.dist = dist
+        self.facets = facets
+
+    def __len__(self):
+        return len(self.order)
+
+    def ids(self):
+        records = self.rs.records
+        return [records[i].id for i in self.order.tolist()]
+
+    def distances(self):
+        return self.dist[self.order].tolist()
+
+    def page(self, start, stop):
+        records = self.rs.records
+        rows = self.order[start:stop]
+        return [records[i].to_business(d) for i, d in zip(rows.tolist(), self.dist[rows].tolist())]
@@ -0,0 +1,119 @@
+"""
+backend/search_coverage.py — reuse cached search circles that cover a new request
+
+Every cached /api/search result set is registered with the exact circle it
+was fetched for. A later search with the same q/category whose circle lies
+inside a registered one (within COVERAGE_SLACK of its radius) can be served
+from that set by re-filtering and re-ranking from the new centre, instead
+of going back to Google. Typical hits: shrinking the radius, panning the map
+a few hundred metres.
+
+Partly fetched sets (upstream streams still pending) are registered too,
+flagged partial: the caller serves what they hold and fetches further pages
+into them on demand. Complete sets are preferred where both cover.
+
+Groups are bounded too (COVERAGE_MAX_GROUPS, least recently used first):
+every distinct free-text query makes one, so an evicted group's circle keys
+go to on_evict for the caller to drop their cache entries with it.
+"""
+import os, math, threading
+from collections import OrderedDict
+
+# Fraction of the cached radius the requested circle may poke out by.
+COVERAGE_SLACK = float(os.environ.get('SEARCH_COVERAGE_SLACK', 0.1))
+# Google caps a search at ~100 places, so a very large circle is a sparse
+# sample of a small one; only reuse sets at most this many times larger.
+COVERAGE_MAX_RATIO = float(os.environ.get('SEARCH_COVERAGE_MAX_RATIO', 4))
+# Circles remembered per (q, category) group
+COVERAGE_PER_GROUP = int(os.environ.get('SEARCH_COVERAGE_PER_GROUP', 64))
+# (q, category) groups remembered in all
+COVERAGE_MAX_GROUPS = int(os.environ.get('SEARCH_COVERAGE_MAX_GROUPS', 2000))
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def grid_step(radius):
+    """Grid cell (degrees) used to snap a search centre: ~radius / 10, in powers of two.
+
+    5 km → 0.005° (the historic fixed grid), 50 km → 0.04°, 1 km → 0.00125°.
+    """
+    exp = round(math.log2(max(radius, 1) / 5000))
+    return 0.005 * 2 ** max(-3, min(4, exp))
+
+
+def snap(value, step):
+    return round(round(value / step) * step, 6)
+
+
+class CoverageIndex:
+    """(q, category) → recently cached circles, newest last; groups in LRU order."""
+
+    def __init__(self, per_group=COVERAGE_PER_GROUP, max_groups=COVERAGE_MAX_GROUPS, on_evict=None):
+        self.per_group = per_group
+        self.max_groups = max_groups
+        self.on_evict = on_evict
+        self._groups = OrderedDict()
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.evicted = 0
+
+    def add(self, group, lat, lng, radius, key, partial=False):
+        evicted = []
+        with self._lock:
+            circles = self._groups.get(group)
+            if circles is None:
+                circles = self._groups[group] = OrderedDict()
+            self._groups.move_to_end(group)
+            circles[key] = (lat, lng, radius, partial)
+            circles.move_to_end(key)
+            while len(circles) > self.per_group:
+                circles.popitem(last=False)
+            while len(self._groups) > self.max_groups:
+                evicted += self._groups.popitem(last=False)[1]
+            self.evicted += len(evicted)
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def discard(self, group, key):
+        with self._lock:
+            circles = self._groups.get(group)
+            if circles is not None:
+                circles.pop(key, None)
+                if not circles:
+                    del self._groups[group]
+
+    def covering(self, group, lat, lng, radius):
+        """Keys of cached circles covering (lat, lng, radius): complete before partial, tightest first."""
+        with self._lock:
+            circles = self._groups.get(group)
+            if circles is None:
+                return []
+            self._groups.move_to_end(group)
+            circles = list(circles.items())
+        hits = []
+        for key, (c_lat, c_lng, c_radius, partial) in circles:
+            if c_radius > radius * COVERAGE_MAX_RATIO:
+                continue
+            if haversine_m(lat, lng, c_lat, c_lng) + radius <= c_radius * (1 + COVERAGE_SLACK):
+                hits.append((partial, c_radius, key))
+        hits.sort()
+        return [key for _, _, key in hits]
+
+    def mark_reused(self):
+        with self._lock:
+            self.reused += 1
+
+    def stats(self):
+        with self._lock:
+            return {'groups': len(self._groups),
+                    'circles': sum(len(c) for c in self._groups.values()),
+                    'partial': sum(c[3] for g in self._groups.values() for c in g.values()),
+                    'reused': self.reused, 'evicted': self.evicted, 'maxGroups': self.max_groups}
@@ -0,0 +1,93 @@
+"""
+backend/singleflight.py — per-key request coalescing
+
+When many requests miss the cache for the same key at once, only the
+first (the leader) runs the upstream fetch; everyone else waits on the
+leader's result or error. The shared slot is a concurrent.futures.Future,
+so waiters may be sync threads or coroutines on any event loop. An async
+fetch runs detached from the request that started it, so cancelling that
+request (a client disconnect) doesn't fail everyone coalesced onto it.
+"""
+import asyncio, threading
+from concurrent.futures import Future
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._tasks = set()           # running async fetches, kept referenced until done
+        self.leaders = 0
+        self.coalesced = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    def _claim(self, key):
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = self._inflight[key] = Future()
+            self.leaders += 1
+            return fut, True
+
+    def _release(self, key, fut):
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def do(self, key, fn):
+        """Call fn() once per key across concurrent callers (sync)."""
+        fut, leader = self._claim(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._release(key, fut)
+
+    async def do_async(self, key, coro_fn):
+        """Await coro_fn() once per key across concurrent callers (async).
+
+        The fetch runs as a task of its own and every caller, leader included,
+        awaits it shielded: a caller that is cancelled stops waiting without
+        cancelling the fetch for the others.
+        """
+        fut, leader = self._claim(key)
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(fut))
+        task = asyncio.ensure_future(coro_fn())
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._settle(key, fut, t))
+        return await asyncio.shield(task)
+
+    def _settle(self, key, fut, task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            fut.cancel()
+        elif task.exception() is not None:
+            fut.set_exception(task.exception())
+        else:
+            fut.set_result(task.result())
+        self._release(key, fut)
+
+    def stats(self):
+        with self._lock:
+            return {'inFlight': len(self._inflight), 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+def stats():
+    with _registry_lock:
+        flights = list(_registry.values())
+    return {f.name: f.stats() for f in flights}
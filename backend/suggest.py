@@ -0,0 +1,241 @@
+"""
+backend/suggest.py — traffic-weighted completion index for /api/suggest
+
+- Terms: categories and subcategories (seeded at start), business names
+  seen in search results, and free-text queries once SUGGEST_MIN_QUERY_COUNT
+  searches have run them; until then a query is only counted (in a bounded
+  LRU), never suggested, so one odd search can't show up for everyone
+- Sorted-array prefix index over each term's normalised text and every
+  later word of it ("pizza" finds "Joe's Pizza"), searched with bisect;
+  new terms are inserted in place
+- Ranking: exponentially decayed search frequency (SUGGEST_HALF_LIFE),
+  kept as a single float per term that grows by 2^(t / half-life) on each
+  hit, so ranking never has to revisit old scores. Ties go to categories,
+  then businesses, then full-name over later-word matches
+- Bounded: past SUGGEST_MAX_TERMS the lowest-ranked unpinned terms
+  (anything but categories) are dropped
+- The best TOP_K completions of every prefix up to TOP_PREFIX_LEN chars
+  are kept ready and updated on each hit; longer prefixes match few keys
+  and are ranked on the spot
+- Benchmark: python suggest.py
+"""
+import os, time, bisect, heapq, logging, threading
+from collections import OrderedDict
+from gazetteer import normalize
+
+log = logging.getLogger('spark.suggest')
+
+SUGGEST_MAX_TERMS = int(os.environ.get('SUGGEST_MAX_TERMS', 50000))
+SUGGEST_HALF_LIFE = float(os.environ.get('SUGGEST_HALF_LIFE', 7 * 24 * 3600))
+# Searches a query not already a term needs before it becomes a suggestion
+SUGGEST_MIN_QUERY_COUNT = int(os.environ.get('SUGGEST_MIN_QUERY_COUNT', 3))
+TOP_PREFIX_LEN = 2      # prefixes up to this length have their completions kept ready
+TOP_K = 10
+
+# kind → suggestion type returned to the frontend, and tie-break rank
+KINDS = {'category': ('category', 2), 'business': ('business', 1), 'query': ('query', 0)}
+
+
+class Term:
+    __slots__ = ('label', 'kind', 'score', 'pinned')
+
+    def __init__(self, label, kind, pinned=False):
+        self.label = label
+        self.kind = kind
+        self.score = 0.0
+        self.pinned = pinned
+
+
+class CompletionIndex:
+    def __init__(self, max_terms=SUGGEST_MAX_TERMS, half_life=SUGGEST_HALF_LIFE, min_count=SUGGEST_MIN_QUERY_COUNT):
+        self.max_terms = max_terms
+        self.half_life = half_life
+        self.min_count = min_count
+        self._epoch = time.time()
+        self._terms = {}              # normalised text → Term
+        self._keys = []               # sorted (key text, normalised text)
+        self._top = {}                # prefix of ≤ TOP_PREFIX_LEN chars (and '') → best norms, in order
+        self._candidates = OrderedDict()  # normalised text → hits so far, of queries not yet terms; LRU
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('queries', 'recorded', 'held', 'added', 'evicted'), 0)
+
+    def __len__(self):
+        return len(self._terms)
+
+    # ── scoring ──
+    def _weight(self, now):
+        """Value of one hit at `now`. Scores are kept relative to the epoch, so older hits shrink
+        relative to newer ones by half every half-life without being rewritten."""
+        return 2.0 ** ((now - self._epoch) / self.half_life)
+
+    def decayed(self, term, now=None):
+        """A term's hit count, decayed to `now`."""
+        return term.score / self._weight(time.time() if now is None else now)
+
+    def _rebase(self, now):
+        # Keep weights in float range: fold the elapsed time into every score (order is unchanged)
+        w = self._weight(now)
+        for term in self._terms.values():
+            term.score /= w
+        self._epoch = now
+
+    def _rank(self, norm, prefix):
+        term = self._terms[norm]
+        return term.score, KINDS[term.kind][1], norm.startswith(prefix)
+
+    # ── top lists ──
+    @staticmethod
+    def _suffixes(norm):
+        words = norm.split()
+        return [' '.join(words[w:]) for w in range(len(words))]
+
+    def _promote(self, norm):
+        """Re-place a term in the top lists of its short prefixes after its rank went up. A hit only
+        ever raises one term's score, so the lists stay exact without rescans."""
+        prefixes = {''} | {key[:n] for key in self._suffixes(norm) for n in range(1, TOP_PREFIX_LEN + 1)}
+        for prefix in prefixes:
+            top = self._top.setdefault(prefix, [])
+            if norm in top:
+                top.remove(norm)
+            rank = self._rank(norm, prefix)
+            at = len(top)
+            while at and self._rank(top[at - 1], prefix) < rank:
+                at -= 1
+            if at < TOP_K:
+                top.insert(at, norm)
+                del top[TOP_K:]
+
+    def _scan(self, prefix, k):
+        lo = bisect.bisect_left(self._keys, (prefix,))
+        hi = bisect.bisect_left(self._keys, (prefix + '\uffff',), lo)
+        found = {norm for _, norm in self._keys[lo:hi]}
+        return heapq.nlargest(k, found, key=lambda n: self._rank(n, prefix))
+
+    # ── updates ──
+    def _insert(self, norm, label, kind, pinned):
+        term = self._terms.get(norm)
+        if term is not None:
+            term.pinned = term.pinned or pinned
+            if KINDS[kind][1] <= KINDS[term.kind][1]:
+                return term, False
+            term.label, term.kind = label, kind
+            return term, True
+        term = self._terms[norm] = Term(label, kind, pinned)
+        for key in self._suffixes(norm):
+            bisect.insort(self._keys, (key, norm))
+        self.counters['added'] += 1
+        return term, True
+
+    def add(self, labels, kind, pinned=False, prior=0.0):
+        """Make labels completable without counting a hit; prior seeds the score of new terms."""
+        with self._lock:
+            weight = self._weight(time.time())
+            for label in labels:
+                norm = normalize(label)
+                if not norm:
+                    continue
+                term, changed = self._insert(norm, label.strip(), kind, pinned)
+                if prior and not term.score:
+                    term.score, changed = prior * weight, True
+                if changed:
+                    self._promote(norm)
+            self._bound()
+
+    def record(self, label, kind='query'):
+        """Count one search for `label`. A label that isn't a term yet only becomes one
+        (with all its hits) on its min_count-th search."""
+        norm = normalize(label)
+        if not norm:
+            return
+        with self._lock:
+            now = time.time()
+            if now - self._epoch > 64 * self.half_life:
+                self._rebase(now)
+            hits = 1
+            term = self._terms.get(norm)
+            if term is None:
+                hits = self._candidates.pop(norm, 0) + 1
+                if hits < self.min_count:
+                    self._candidates[norm] = hits
+                    if len(self._candidates) > self.max_terms:
+                        self._candidates.popitem(last=False)
+                    self.counters['held'] += 1
+                    return
+                term, _ = self._insert(norm, label.strip(), kind, False)
+            term.score += hits * self._weight(now)
+            self._promote(norm)
+            self.counters['recorded'] += 1
+            self._bound()
+
+    def _bound(self):
+        if len(self._terms) <= self.max_terms:
+            return
+        # Drop the weakest unpinned terms down to 90% of the bound in one pass
+        excess = len(self._terms) - self.max_terms + self.max_terms // 10
+        unpinned = ((t.score, norm) for norm, t in self._terms.items() if not t.pinned)
+        doomed = {norm for _, norm in heapq.nsmallest(excess, unpinned)}
+        for norm in doomed:
+            del self._terms[norm]
+        self._keys = [k for k in self._keys if k[1] not in doomed]
+        # Top lists that lost an entry are refilled from the index
+        for prefix, top in list(self._top.items()):
+            if not doomed.isdisjoint(top):
+                top = self._scan(prefix, TOP_K) if prefix else heapq.nlargest(
+                    TOP_K, self._terms, key=lambda n: self._rank(n, ''))
+                if top:
+                    self._top[prefix] = top
+                else:
+                    del self._top[prefix]
+        self.counters['evicted'] += len(doomed)
+
+    # ── queries ──
+    def complete(self, q, k=6):
+        """Top-k terms with a word-start matching q, as (label, suggestion type) pairs."""
+        prefix = normalize(q)
+        with self._lock:
+            self.counters['queries'] += 1
+            if len(prefix) <= TOP_PREFIX_LEN and k <= TOP_K:
+                norms = self._top.get(prefix, [])[:k]
+            else:
+                norms = self._scan(prefix, k)
+            return [(self._terms[n].label, KINDS[self._terms[n].kind][0]) for n in norms]
+
+    def stats(self):
+        with self._lock:
+            kinds = {}
+            for t in self._terms.values():
+                kinds[t.kind] = kinds.get(t.kind, 0) + 1
+            now = time.time()
+            top = [self._terms[n] for n in self._top.get('', [])]
+            return dict(self.counters, terms=len(self._terms), keys=len(self._keys), maxTerms=self.max_terms,
+                        topLists=len(self._top), kinds=kinds, candidates=len(self._candidates),
+                        minQueryCount=self.min_count,
+                        top=[{'label': t.label, 'score': round(self.decayed(t, now), 2)} for t in top])
+
+
+if __name__ == '__main__':
+    import random, string
+    from timeit import timeit
+    rng = random.Random(7)
+    idx = CompletionIndex(max_terms=50000)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    t0 = time.perf_counter()
+    idx.add((' '.join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(60000)), 'business')
+    print(f"build: {len(idx)} terms, {len(idx._keys)} keys in {time.perf_counter() - t0:.2f} s")
+    names = list(idx._terms)
+    t0 = time.perf_counter()
+    for _ in range(20000):
+        idx.record(rng.choice(names[:2000]))
+    print(f"record: {(time.perf_counter() - t0) / 20000 * 1e6:.1f} µs/hit")
+    for n in (1, 2, 3, 6):
+        prefixes = [name[:n] for name in rng.sample(names, 1000)]
+        t0 = time.perf_counter()
+        for p in prefixes:
+            idx.complete(p)
+        avg = (time.perf_counter() - t0) / len(prefixes)
+        worst = max(timeit(lambda: idx.complete(p), number=1) for p in prefixes)
+        print(f"complete, {n}-char prefix: {avg * 1e6:.1f} µs/query avg, {worst * 1e6:.0f} µs worst")
+    # Check the maintained lists against a full rescan
+    ranks = lambda p, norms: [idx._rank(n, p) for n in norms]
+    print("top lists exact:", all(ranks(p, top) == ranks(p, idx._scan(p, TOP_K)) for p, top in idx._top.items() if p))
+    print(idx.complete('a'), idx.stats()['top'][:3], sep='\n')
@@ -0,0 +1,212 @@
+"""
+backend/textindex.py — in-memory inverted index with field-weighted BM25
+
+- Built once per document set: every field is tokenised once, and each
+  (term, document) posting stores its BM25F pseudo term frequency, the sum
+  over fields of weight × tf / length norm. Per field:
+  norm = 1 - b + b × min(len / avg len, MAX_LEN_RATIO)
+- Postings are kept CSR-style in term order, so the postings of all terms
+  starting with a prefix are one contiguous slice
+- Query words of MIN_PREFIX+ characters match anywhere inside a term, as
+  the substring filter this replaced did ("gpt" finds "chatgpt"): prefix
+  matches through the sorted terms, others through a trigram index over
+  the vocabulary, at INFIX_WEIGHT of their tf. Shorter words match
+  exactly. Each word is scored as one pseudo-term, idf over the documents
+  any expansion occurs in; word scores add up
+- Top-k: argpartition down to k candidates, then an exact sort by score and
+  the caller's tiebreak column
+- Benchmark against the per-query substring scorer: python textindex.py
+"""
+import re, bisect, math
+import numpy as np
+
+K1 = 1.2
+MIN_PREFIX = 3
+INFIX_WEIGHT = 0.5      # tf weight of a match inside a term, relative to a prefix match
+MAX_LEN_RATIO = 2.0
+
+_TOKEN = re.compile(r'\w+')
+_NONE = np.empty(0, dtype=np.int64)     # term ids of a trigram no term contains
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(map(str, value))
+    return str(value or '')
+
+
+class TextIndex:
+    """BM25F index over `docs` (dicts). fields: {key: (weight, b)}; tiebreak: key of a numeric
+    field ordering equal scores (higher first)."""
+
+    def __init__(self, docs, fields, tiebreak=None, k1=K1):
+        self.docs = docs
+        self.k1 = k1
+        n = len(docs)
+        # One entry per token occurrence: (term id, document, its field's tf unit)
+        vocab, term_ids, doc_ids, units = {}, [], [], []
+        for key, (weight, b) in fields.items():
+            tokens = [tokenize(_text(d.get(key))) for d in docs]
+            lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+            avg = lengths.mean() if lengths.any() else 1.0
+            unit = weight / (1 - b + b * np.minimum(lengths / avg, MAX_LEN_RATIO))
+            term_ids += [vocab.setdefault(t, len(vocab)) for terms in tokens for t in terms]
+            doc_ids.append(np.repeat(np.arange(n, dtype=np.int64), lengths))
+            units.append(np.repeat(unit, lengths))
+        self.terms = sorted(vocab)
+        # Renumber terms in sorted order, then sum the units of each (term, document) pair
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[vocab[t] for t in self.terms]] = np.arange(len(vocab))
+        pairs = rank[np.array(term_ids, dtype=np.int64)] * max(n, 1) + np.concatenate(doc_ids or [np.zeros(0, np.int64)])
+        pairs, inverse = np.unique(pairs, return_inverse=True)
+        self._tf = np.bincount(inverse, weights=np.concatenate(units or [np.zeros(0)]), minlength=len(pairs)).astype(np.float32)
+        self._docs = (pairs % max(n, 1)).astype(np.int32)
+        self._start = np.searchsorted(pairs // max(n, 1), np.arange(len(self.terms) + 1))
+        self._tiebreak = np.array([d.get(tiebreak) or 0 for d in docs], dtype=np.float64) if tiebreak else np.zeros(n)
+        # Trigram → ids of the terms containing it, for matches inside a term
+        grams = {}
+        for i, term in enumerate(self.terms):
+            for g in {term[j:j + 3] for j in range(len(term) - 2)}:
+                grams.setdefault(g, []).append(i)
+        self._grams = {g: np.array(ids, dtype=np.int64) for g, ids in grams.items()}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _expand(self, word):
+        """(term ids, tf weights) of the terms a query word matches."""
+        lo = bisect.bisect_left(self.terms, word)
+        if len(word) < MIN_PREFIX:
+            hi = lo + (lo < len(self.terms) and self.terms[lo] == word)
+            return np.arange(lo, hi), np.ones(hi - lo)
+        hi = bisect.bisect_left(self.terms, word + '\uffff', lo)
+        # Terms holding every trigram of the word, then checked for the word itself
+        lists = sorted((self._grams.get(word[j:j + 3], _NONE) for j in range(len(word) - 2)), key=len)
+        inner = lists[0]
+        for ids in lists[1:]:
+            if not len(inner):
+                break
+            inner = np.intersect1d(inner, ids, assume_unique=True)
+        inner = inner[(inner < lo) | (inner >= hi)]
+        if len(word) > 3:
+            inner = inner[[word in self.terms[i] for i in inner.tolist()]] if len(inner) else inner
+        ids = np.concatenate([np.arange(lo, hi), inner]).astype(np.int64)
+        return ids, np.concatenate([np.ones(hi - lo), np.full(len(inner), INFIX_WEIGHT)])
+
+    def scores(self, q):
+        """BM25F score of every document for q (0 where nothing matches)."""
+        n = len(self.docs)
+        total = np.zeros(n)
+        for word in dict.fromkeys(tokenize(q)):
+            ids, weights = self._expand(word)
+            if not len(ids):
+                continue
+            # Postings of every matched term, as one index array into the CSR columns
+            starts = self._start[ids]
+            lens = self._start[ids + 1] - starts
+            at = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+            tf = np.bincount(self._docs[at], weights=self._tf[at] * np.repeat(weights, lens), minlength=n)
+            df = np.count_nonzero(tf) if len(ids) > 1 else len(at)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            total += idf * tf / (self.k1 + tf)
+        return total
+
+    def search(self, q, k=None):
+        """Matching documents, best first; only the top k if given."""
+        scores = self.scores(q)
+        hits = np.flatnonzero(scores)
+        if k is not None and k < len(hits):
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        order = hits[np.lexsort((-self._tiebreak[hits], -scores[hits]))]
+        return [self.docs[i] for i in order.tolist()]
+
+    def nbytes(self):
+        return (self._start.nbytes + self._docs.nbytes + self._tf.nbytes + self._tiebreak.nbytes
+                + sum(len(t) + 56 for t in self.terms) + sum(ids.nbytes + 112 for ids in self._grams.values()))
+
+
+if __name__ == '__main__':
+    import time, random
+
+    FIELDS = {'name': (10, 0.2), 'tagline': (6, 0.15), 'tags': (5, 0), 'category': (4, 0),
+              'subcategory': (4, 0), 'description': (2, 0.4)}
+
+    def substring_filter(posts, query):
+        """The per-query scorer TextIndex replaces (digital_routes._keyword_filter)."""
+        q = query.lower()
+        scored = []
+        for post in posts:
+            score = 0
+            name        = (post.get('name') or '').lower()
+            tagline     = (post.get('tagline') or '').lower()
+            tags        = ' '.join(post.get('tags') or []).lower()
+            category    = (post.get('category') or '').lower()
+            subcategory = (post.get('subcategory') or '').lower()
+            description = (post.get('description') or '').lower()
+            if q in name:        score += 10
+            if q in tagline:     score += 6
+            if q in tags:        score += 5
+            if q in category:    score += 4
+            if q in subcategory: score += 4
+            if q in description: score += 2
+            for word in q.split():
+                if len(word) > 2:
+                    if word in name:    score += 3
+                    if word in tagline: score += 2
+                    if word in tags:    score += 2
+            if score > 0:
+                scored.append((score, post))
+        scored.sort(key=lambda x: (-x[0], -x[1].get('votes', 0)))
+        return [p for _, p in scored]
+
+    rng = random.Random(3)
+    vocab = [''.join(rng.choices('abcdefghijklmnoprstuvwy', k=rng.randint(3, 10))) for _ in range(8000)]
+    words = lambda lo, hi: ' '.join(rng.choices(vocab, k=rng.randint(lo, hi)))
+    cats = ['AI Tools', 'Productivity', 'Development', 'Design', 'Marketing', 'Finance', 'Media']
+    posts = [{'id': i, 'name': words(1, 3).title(), 'tagline': words(4, 12), 'tags': [words(1, 2) for _ in range(3)],
+              'category': rng.choice(cats), 'subcategory': words(1, 2).title(), 'description': words(20, 70),
+              'votes': rng.randint(0, 3000)} for i in range(30000)]
+    queries = [rng.choice(vocab) for _ in range(50)] + [rng.choice(vocab)[:4] for _ in range(25)] + \
+              [f'{rng.choice(vocab)} {rng.choice(vocab)}' for _ in range(25)]
+
+    t0 = time.perf_counter()
+    index = TextIndex(posts, FIELDS, tiebreak='votes')
+    build = time.perf_counter() - t0
+    print(f"{len(posts)} posts: index built in {build:.2f} s, {len(index.terms)} terms, {index.nbytes() / 1e6:.1f} MB")
+    t0 = time.perf_counter()
+    for q in queries:
+        substring_filter(posts, q)
+    old = (time.perf_counter() - t0) / len(queries)
+    t0 = time.perf_counter()
+    for q in queries:
+        index.search(q)
+    new = (time.perf_counter() - t0) / len(queries)
+    t0 = time.perf_counter()
+    for q in queries:
+        index.search(q, k=20)
+    top = (time.perf_counter() - t0) / len(queries)
+    print(f"substring filter: {old * 1e3:.2f} ms/query; index: {new * 1e3:.2f} ms/query (all matches), "
+          f"{top * 1e3:.2f} ms/query (top 20): {old / new:.0f}x / {old / top:.0f}x")
+    print(f"index build pays for itself after {build / (old - new):.0f} queries")
+
+    # Field precedence: one hit in a higher-weight field ranks above one in a lower field
+    # (among hits of one kind: prefix, or inside a term)
+    rank = {'name': 0, 'tagline': 1, 'tags': 2, 'category': 3, 'subcategory': 3, 'description': 4}
+    ok, infix = True, 0
+    for q in vocab[:300]:
+        fields_hit = {True: [], False: []}
+        for post in index.search(q):
+            hit = [(f, t.startswith(q)) for f in rank for t in tokenize(_text(post[f])) if q in t]
+            if len(hit) == 1:
+                fields_hit[hit[0][1]].append(rank[hit[0][0]])
+        ok &= all(fields == sorted(fields) for fields in fields_hit.values())
+        infix += len(fields_hit[False])
+    print(f"name > tagline > tags > category > description for single-field matches: {ok} ({infix} inside a term)")
+
+    # Words with a trigram no term contains still match by prefix, or nothing
+    unknown = [vocab[0] + 'qqq', 'zzzq', vocab[1][:3] + 'xqz']
+    print("unknown trigrams:", [(q, len(index.search(q))) for q in unknown])
@@ -0,0 +1,276 @@
+"""
+backend/upstream.py — shared HTTP client for every upstream API
+
+- One pooled, keep-alive httpx client per upstream host
+- HTTP/2 for hosts that support it (Google, Product Hunt)
+- gzip-encoded responses
+- Pool sizes and timeouts configurable via UPSTREAM_* env vars
+- Retry with jittered exponential backoff on transport errors / 429 / 5xx
+- Sync (get/post) and asyncio (aget/apost) APIs share config and counters;
+  async clients are created per event loop
+- Sync requests can be streamed (stream=True) for large bodies like images
+- Per-host pool and request stats for /api/admin/upstream
+- Every attempt first takes a token from the quota governor (see quota.py)
+- Per-host circuit breaker (see breaker.py): once a host keeps failing or
+  answering slowly, calls raise CircuitOpen at once instead of waiting out
+  the timeouts
+"""
+import os, time, random, threading, logging, asyncio, weakref
+from urllib.parse import urlsplit
+import httpx
+
+import quota
+from breaker import CircuitBreaker
+
+log = logging.getLogger('spark.upstream')
+
+# ─── Config ────────────────────────────────────────────────────
+POOL_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_POOL_MAX_CONNECTIONS', 20))
+POOL_MAX_KEEPALIVE   = int(os.environ.get('UPSTREAM_POOL_MAX_KEEPALIVE', 10))
+KEEPALIVE_EXPIRY     = float(os.environ.get('UPSTREAM_KEEPALIVE_EXPIRY', 60))
+CONNECT_TIMEOUT      = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+DEFAULT_TIMEOUT      = float(os.environ.get('UPSTREAM_TIMEOUT', 12))
+MAX_RETRIES          = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+BACKOFF_BASE         = float(os.environ.get('UPSTREAM_BACKOFF_BASE', 0.2))
+BACKOFF_CAP          = float(os.environ.get('UPSTREAM_BACKOFF_CAP', 2.0))
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Hosts that negotiate HTTP/2 (everything else stays on HTTP/1.1 keep-alive)
+HTTP2_HOSTS = frozenset([
+    'places.googleapis.com',
+    'maps.googleapis.com',
+    'api.producthunt.com',
+])
+
+# Google only gzips responses when the User-Agent mentions gzip
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip',
+    'User-Agent': 'SmallSpark/6 (gzip)',
+}
+
+
+# ─── Per-host client ───────────────────────────────────────────
+class HostClient:
+    """Pooled clients + counters for a single upstream host."""
+
+    def __init__(self, host):
+        self.host = host
+        self.http2 = host in HTTP2_HOSTS
+        self.limits = httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT)
+        self.transport = httpx.HTTPTransport(http2=self.http2, limits=self.limits)
+        self.client = httpx.Client(transport=self.transport, headers=DEFAULT_HEADERS, timeout=self.timeout)
+        # event loop → (transport, AsyncClient); httpx async pools are loop-bound
+        self._async = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker(host)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_ms = 0.0
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async.get(loop)
+            if entry is None:
+                transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+                client = httpx.AsyncClient(transport=transport, headers=DEFAULT_HEADERS, timeout=self.timeout)
+                entry = self._async[loop] = (transport, client)
+        return entry[1]
+
+    # ── attempt bookkeeping shared by the sync and async paths ──
+    def _start(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _finish(self, t0, ok):
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.in_flight -= 1
+            self.total_ms += ms
+        self.breaker.record(ok, ms)
+
+    def _should_retry(self, attempt, resp=None, exc=None):
+        """True if the attempt should be retried; counts the final failure otherwise."""
+        if exc is None and resp.status_code not in RETRY_STATUSES:
+            if resp.status_code >= 400:
+                with self._lock:
+                    self.errors += 1
+            return False
+        if attempt >= MAX_RETRIES:
+            with self._lock:
+                self.errors += 1
+            return False
+        reason = type(exc).__name__ if exc is not None else f"HTTP {resp.status_code}"
+        log.info(f"{self.host}: {reason}, retrying ({attempt + 1}/{MAX_RETRIES})")
+        with self._lock:
+            self.retries += 1
+        return True
+
+    @staticmethod
+    def _timeout(kwargs, timeout):
+        if timeout is not None:
+            kwargs['timeout'] = httpx.Timeout(timeout, connect=min(CONNECT_TIMEOUT, timeout))
+
+    def request(self, method, url, timeout=None, stream=False, **kwargs):
+        """With stream=True the body is left unread: iterate resp.iter_bytes(), then resp.close()."""
+        self._timeout(kwargs, timeout)
+        send = {'stream': True, 'follow_redirects': kwargs.pop('follow_redirects', False)} if stream else None
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            quota.acquire(method, url)
+            t0 = self._start()
+            ok = False
+            try:
+                if send:
+                    resp = self.client.send(self.client.build_request(method, url, **kwargs), **send)
+                else:
+                    resp = self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry(attempt, exc=e):
+                    raise
+            else:
+                ok = resp.status_code not in RETRY_STATUSES
+                if not self._should_retry(attempt, resp=resp):
+                    return resp
+                resp.close()
+            finally:
+                self._finish(t0, ok)
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def arequest(self, method, url, timeout=None, **kwargs):
+        self._timeout(kwargs, timeout)
+        client = self.async_client()
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            await quota.aacquire(method, url)
+            t0 = self._start()
+            ok = False
+            try:
+                resp = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry(attempt, exc=e):
+                    raise
+            else:
+                ok = resp.status_code not in RETRY_STATUSES
+                if not self._should_retry(attempt, resp=resp):
+                    return resp
+                await resp.aclose()
+            finally:
+                self._finish(t0, ok)
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            transports = [self.transport] + [t for t, _ in self._async.values()]
+        conns = []
+        for t in transports:
+            pool = getattr(t, '_pool', None)
+            conns.extend(getattr(pool, 'connections', None) or [])
+        with self._lock:
+            return {
+                'http2': self.http2,
+                'requests': self.requests,
+                'retries': self.retries,
+                'errors': self.errors,
+                'inFlight': self.in_flight,
+                'avgMs': round(self.total_ms / self.requests, 1) if self.requests else 0,
+                'eventLoops': len(self._async),
+                'connections': len(conns),
+                'idleConnections': sum(1 for c in conns if c.is_idle()),
+                'breaker': self.breaker.stats(),
+            }
+
+    def close(self):
+        self.client.close()
+
+    async def aclose(self):
+        """Close the async client bound to the running loop (if any)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async.pop(loop, None)
+        if entry:
+            await entry[1].aclose()
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+# ─── Registry ──────────────────────────────────────────────────
+_clients = {}
+_clients_lock = threading.Lock()
+
+def client_for(url):
+    host = urlsplit(url).hostname or ''
+    hc = _clients.get(host)
+    if hc is None:
+        with _clients_lock:
+            hc = _clients.get(host)
+            if hc is None:
+                hc = _clients[host] = HostClient(host)
+    return hc
+
+
+def request(method, url, **kwargs):
+    return client_for(url).request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    return await client_for(url).arequest(method, url, **kwargs)
+
+async def aget(url, **kwargs):
+    return await arequest('GET', url, **kwargs)
+
+async def apost(url, **kwargs):
+    return await arequest('POST', url, **kwargs)
+
+
+def stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {
+        'config': {
+            'maxConnections': POOL_MAX_CONNECTIONS,
+            'maxKeepalive': POOL_MAX_KEEPALIVE,
+            'keepaliveExpiry': KEEPALIVE_EXPIRY,
+            'connectTimeout': CONNECT_TIMEOUT,
+            'maxRetries': MAX_RETRIES,
+        },
+        'hosts': {hc.host: hc.stats() for hc in clients},
+    }
+
+
+def close_all():
+    with _clients_lock:
+        for hc in _clients.values():
+            hc.close()
+        _clients.clear()
+
+
+async def aclose_all():
+    """Close every async client bound to the running loop (ASGI shutdown)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for hc in clients:
+        await hc.aclose()
@@ -687,13 +687,20 @@ const BusinessPage = () => {
             setLoading(true);
             setError('');
             try {
-                const params = new URLSearchParams({
-                    lat: '40.56', lng: '-111.93', radius: '50000',
-                    q: id, per_page: '1'
-                });
-                const data = await apiFetch(`${API}/search?${params}`);
-                if (data.businesses && data.businesses.length > 0) {
-                    const b = data.businesses[0];
+                let b = null;
+                if (id.startsWith('ChIJ') || id.startsWith('places/')) {
+                    // Place ids resolve straight from the server's place store
+                    const data = await apiFetch(`${API}/place/${encodeURIComponent(id)}`);
+                    b = data.business;
+                } else {
+                    const params = new URLSearchParams({
+                        lat: '40.56', lng: '-111.93', radius: '50000',
+                        q: id, per_page: '1'
+                    });
+                    const data = await apiFetch(`${API}/search?${params}`);
+                    b = data.businesses?.[0] || null;
+                }
+                if (b) {
                     setBiz(b);
                     setReviews(generateReviews(b));
                     const nameWords = b.name.toLowerCase().split(/\s+/);
@@ -463,7 +463,7 @@ const AutoDrop = ({th, items, onPick, type}) => (<div style={{
         {type === 'location' ? (it.type === 'current' ? <Navigation2 size={15} color="#3b82f6"/> :
             <Clock size={14} color={th.textMuted}/>) : it.type === 'name_search' ? <ArrowRight size={14}/> :
             <Search size={14} color={th.textMuted}/>}
-        <span>{it.label}</span></button>))}</div>);
+        <span>{it.label}{it.near && <span style={{color: th.textMuted, fontWeight: '450'}}> · {it.near}</span>}</span></button>))}</div>);
 
 /* ─── Business Card ────────────────────────────────────────── */
 const FALLBACK_IMG = 'https://images.unsplash.com/photo-1441986300917-64674bd600d8?w=480&h=320&fit=crop';
@@ -828,6 +828,7 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
     const [page, setPage] = useState(1);
     const [totalPages, setTotalPages] = useState(1);
     const [total, setTotal] = useState(0);
+    const [hasMore, setHasMore] = useState(false);
     const [showSD, setShowSD] = useState(false);
     const [sSugg, setSSugg] = useState([]);
     const [showLD, setShowLD] = useState(false);
@@ -837,6 +838,8 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
     const timer = useRef(null);
     const [showAI, setShowAI] = useState(false);
     const lastSearch = useRef({});
+    // Coordinates of picked location suggestions, so searching them skips /geocode
+    const pickedLocs = useRef(new Map());
     const [flyTarget, setFlyTarget] = useState(null);
     const categoryFromUrlSearched = useRef(false);
     const [sortBy, setSortBy] = useState('relevance');
@@ -882,12 +885,13 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
     }, []);
     const fetchLocS = useCallback(async q => {
         try {
-            const d = await apiFetch(`${API}/locations?q=${encodeURIComponent(q)}`);
+            const near = uLoc ? `&lat=${uLoc.lat}&lng=${uLoc.lng}` : '';
+            const d = await apiFetch(`${API}/locations?q=${encodeURIComponent(q)}${near}`);
             setLSugg(d.locations || [])
         } catch {
             setLSugg([])
         }
-    }, []);
+    }, [uLoc]);
 
     const onSI = v => {
         setSq(v);
@@ -914,7 +918,7 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
             setLoad(true);
             setErr('');
             try {
-                const g = await apiFetch(`${API}/geocode?q=${encodeURIComponent(loc)}`);
+                const g = pickedLocs.current.get(loc) || await apiFetch(`${API}/geocode?q=${encodeURIComponent(loc)}`);
                 lat = g.lat;
                 lng = g.lng;
                 setMapC({lat, lng});
@@ -969,6 +973,7 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
 
             setBiz(businesses);
             setTotal(d.total || 0);
+            setHasMore(!!d.hasMore);
             setTotalPages(d.totalPages || 1);
             setPage(d.page || 1);
             setFlyTarget({lat, lng});
@@ -1026,6 +1031,7 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
         }
         setLq(it.label);
         if (it.lat) {
+            pickedLocs.current.set(it.label, {lat: it.lat, lng: it.lng, displayName: it.label});
             setMapC({lat: it.lat, lng: it.lng});
             setFlyTarget({lat: it.lat, lng: it.lng})
         }
@@ -1436,7 +1442,7 @@ const DiscoverContent = ({th, favs, toggleFav}) => {
                             fontWeight: '600',
                             color: th.text
                         }}>{sq ? `"${sq}"` : selCat || 'All Businesses'}</span>
-                        <span style={{fontSize: '0.7rem', color: th.textMuted, marginLeft: '0.3rem'}}>· {total} found · Page {page}/{totalPages}</span>
+                        <span style={{fontSize: '0.7rem', color: th.textMuted, marginLeft: '0.3rem'}}>· {total}{hasMore ? '+' : ''} found · Page {page}/{totalPages}</span>
                     </div>
                     <div style={{flex: 1, overflowY: 'auto'}}>{sortedBiz.map(b => <BizCard key={b.id} biz={b} th={th}
                                                                                      hov={hovBiz === b.id}